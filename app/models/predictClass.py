@@ -1,13 +1,29 @@
 import os
 import numpy as np
 import tensorflow as tf
-from tensorflow.keras.preprocessing import image
-from tensorflow.keras.applications.efficientnet import preprocess_input
+from app.utils.image_preprocessing import BatchPreprocessor, load_image_file
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
 
+def build_inference_function(predict_fn, img_size=(224, 224)):
+    """
+    Compile l'appel à la signature du modèle dans une tf.function à signature fixe
+    (None, hauteur, largeur, 3), tracée une seule fois au chargement.
+    Les noms d'entrée et de sortie sont résolus une fois pour toutes.
+    """
+    input_name = list(predict_fn.structured_input_signature[1].keys())[0]
+    output_name = list(predict_fn.structured_outputs.keys())[0]
+
+    @tf.function(input_signature=[tf.TensorSpec(shape=(None, *img_size, 3), dtype=tf.float32)])
+    def infer(images):
+        return predict_fn(**{input_name: images})[output_name]
+
+    # On trace la fonction immédiatement pour ne pas payer ce coût à la première prédiction
+    return infer.get_concrete_function()
+
+
 class predictClass:
     def __init__(self, model_path=None, test_path="./data/test", img_size=(224, 224)):
         self.img_size = img_size
@@ -40,6 +56,8 @@ class predictClass:
         try:
             self.model = tf.saved_model.load(self.model_path)
             self.predict_fn = self.model.signatures["serving_default"]
+            self.infer = build_inference_function(self.predict_fn, self.img_size)
+            self.preprocessor = BatchPreprocessor(self.img_size)
             logging.info("Modèle chargé avec succès.")
 
             # Obtenir les noms de classes à partir du dossier de test
@@ -58,29 +76,40 @@ class predictClass:
             except RuntimeError as e:
                 logging.error(f"Erreur lors de la configuration du GPU : {e}")
 
-    def predict(self, image_path):
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"L'image {image_path} n'existe pas.")
+    def predict_batch(self, image_paths):
+        """
+        Effectue la prédiction sur un lot d'images en une seule passe du modèle
+        et renvoie, pour chaque image, la meilleure classe et son score
+        """
+        if not image_paths:
+            return []
+        for image_path in image_paths:
+            if not os.path.exists(image_path):
+                raise FileNotFoundError(f"L'image {image_path} n'existe pas.")
 
         try:
-            img = image.load_img(image_path, target_size=self.img_size)
-            img_array = image.img_to_array(img)
-            img_array_expanded_dims = np.expand_dims(img_array, axis=0)
-            img_ready = preprocess_input(img_array_expanded_dims)
-
-            predictions = self.predict_fn(tf.constant(img_ready))
-            output_name = list(predictions.keys())[0]
-            prediction = predictions[output_name].numpy()
+            images = [load_image_file(image_path, self.img_size) for image_path in image_paths]
+            with self.preprocessor.lock:
+                img_ready = self.preprocessor.preprocess(images)
+                predictions = self.infer(tf.convert_to_tensor(img_ready, dtype=tf.float32)).numpy()
 
-            highest_score_index = np.argmax(prediction)
-            meilleure_classe = self.class_names[highest_score_index]
-            highest_score = float(np.max(prediction))
+            results = []
+            for prediction in predictions:
+                highest_score_index = np.argmax(prediction)
+                meilleure_classe = self.class_names[highest_score_index]
+                highest_score = float(prediction[highest_score_index])
+                results.append((meilleure_classe, highest_score))
 
-            logging.info(f"Prédiction effectuée : classe = {meilleure_classe}, score = {highest_score}")
-            return meilleure_classe, highest_score
+            logging.info(f"Prédiction effectuée sur un lot de {len(image_paths)} image(s)")
+            return results
         except Exception as e:
             logging.error(f"Erreur lors de la prédiction : {str(e)}")
             raise
 
+    def predict(self, image_path):
+        meilleure_classe, highest_score = self.predict_batch([image_path])[0]
+        logging.info(f"Prédiction effectuée : classe = {meilleure_classe}, score = {highest_score}")
+        return meilleure_classe, highest_score
+
     def get_class_names(self):
         return self.class_names
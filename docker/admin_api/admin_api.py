@@ -15,9 +15,10 @@ import os
 import json
 from dotenv import load_dotenv
 import logging
-import requests
+import httpx
 import shutil
 from alert_system import AlertSystem
+from http_client import UpstreamClient
 
 # On charge les variables d'environnement
 load_dotenv()
@@ -81,6 +82,19 @@ def load_authorized_users():
 
 AUTHORIZED_USERS = load_authorized_users()
 
+# Clients HTTP partagés vers les conteneurs d'entraînement et d'inférence
+# (connexions réutilisées, délais par route et nombre de requêtes simultanées limité)
+training_client = UpstreamClient(
+    "http://training:5500",
+    max_concurrency=int(os.getenv("TRAINING_MAX_CONCURRENCY", 4)),
+    timeouts={"/train": 30, "/results": 60},
+)
+inference_client = UpstreamClient(
+    "http://inference:5500",
+    max_concurrency=int(os.getenv("INFERENCE_MAX_CONCURRENCY", 4)),
+    timeouts={"/switchmodel": 300},
+)
+
 
 # ----------------------------------------------------------------------------------------- #
 
@@ -169,6 +183,18 @@ def update_authorized_users(users):
 # ----------------------------------------------------------------------------------------- #
 
 
+@app.on_event("startup")
+async def start_http_clients():
+    training_client.start()
+    inference_client.start()
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    await training_client.close()
+    await inference_client.close()
+
+
 # Route pour obtenir un token
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
@@ -306,15 +332,27 @@ async def get_users(
 # Route pour lancer l'entraînement d'un modèle
 @app.get("/train")
 async def train(
-    api_key: str = Depends(verify_api_key), current_user: str = Depends(verify_token)
+    frozen_features: bool = False,
+    warm_start: bool = False,
+    profile: str = "default",
+    resume: Optional[str] = None,
+    api_key: str = Depends(verify_api_key),
+    current_user: str = Depends(verify_token),
 ):
     try:
         logging.info(f"Requête /train reçue de l'utilisateur: {current_user}")
         # On fait appel au conteneur chargé de l'entraînement
-        response = requests.get("http://training:5500/train")
+        # (frozen_features : seules nos couches sont entraînées, sur les caractéristiques en cache,
+        # warm_start : reprise à partir du modèle en production avec les nouvelles images et classes,
+        # profile : précision mixte et compilation XLA,
+        # resume : run_id d'un entraînement interrompu à reprendre depuis son dernier point de reprise)
+        params = {"frozen_features": frozen_features, "warm_start": warm_start, "profile": profile}
+        if resume:
+            params["resume"] = resume
+        response = await training_client.get("/train", params=params)
         return response.json()
 
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logging.error(f"Communication avec le conteneur d'entraînement impossible: {e}")
         raise HTTPException(
             status_code=500,
@@ -332,12 +370,10 @@ async def switch_model(
     try:
         logging.info(f"Requête /switchmodel reçue de l'utilisateur: {current_user}")
         # On donne le run_id au container d'inférence qui changera le modèle utilisé
-        response = requests.post(
-            "http://inference:5500/switchmodel", data={"run_id": run_id}
-        )
+        response = await inference_client.post("/switchmodel", data={"run_id": run_id})
         return response.json()
 
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logging.error(f"Communication avec le conteneur d'inférence impossible: {e}")
         raise HTTPException(
             status_code=500,
@@ -345,6 +381,50 @@ async def switch_model(
         )
 
 
+# Route pour suivre la file d'attente des entraînements (état et avancement de chaque job)
+@app.get("/jobs")
+async def jobs(
+    status: Optional[str] = None,
+    limit: int = 50,
+    api_key: str = Depends(verify_api_key),
+    current_user: str = Depends(verify_token),
+):
+    logging.info(f"Requête /jobs reçue de l'utilisateur: {current_user}")
+    params = {"limit": limit}
+    if status:
+        params["status"] = status
+    try:
+        response = await training_client.get("/jobs", params=params, idempotent=True)
+        return response.json()
+
+    except Exception as e:
+        logging.error(f"Erreur de communication avec le conteneur training: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur de communication avec le conteneur training: {str(e)}",
+        )
+
+
+# Route pour annuler un entraînement en attente ou en cours
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(
+    job_id: int,
+    api_key: str = Depends(verify_api_key),
+    current_user: str = Depends(verify_token),
+):
+    logging.info(f"Requête /jobs/{job_id}/cancel reçue de l'utilisateur: {current_user}")
+    try:
+        response = await training_client.post(f"/jobs/{job_id}/cancel")
+        return response.json()
+
+    except Exception as e:
+        logging.error(f"Erreur de communication avec le conteneur training: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur de communication avec le conteneur training: {str(e)}",
+        )
+
+
 # Route pour récupérer les résultats de l'entraînement
 @app.get("/results")
 async def results(
@@ -353,7 +433,7 @@ async def results(
     logging.info(f"Requête /results reçue de l'utilisateur: {current_user}")
     try:
         # On interroge le container de training sur les résultats de l'entraînement
-        response = requests.get("http://training:5500/results")
+        response = await training_client.get("/results", idempotent=True)
         return response.json()
 
     except Exception as e:
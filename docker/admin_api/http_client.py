@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import httpx
+
+
+class UpstreamClient:
+    """
+    Client HTTP asynchrone partagé vers un conteneur de l'application (inference, training).
+    Les connexions sont gardées ouvertes (keep-alive) et réutilisées entre les requêtes,
+    chaque route peut avoir son propre délai maximum, les erreurs de connexion sont retentées
+    et le nombre de requêtes simultanées vers le conteneur est limité.
+    """
+
+    def __init__(self, base_url, max_concurrency=32, timeouts=None, default_timeout=30.0, retries=2, backoff=0.2):
+        """
+        base_url : adresse du conteneur (ex: http://inference:5500)
+        max_concurrency : nombre maximum de requêtes simultanées vers ce conteneur
+        timeouts : délais maximum (en secondes) par route, ex: {"/predict": 30}
+        default_timeout : délai maximum pour les routes non renseignées
+        retries : nombre de nouvelles tentatives en cas d'échec
+        backoff : attente (en secondes) avant la première nouvelle tentative, doublée à chaque essai
+        """
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.client = None
+        self.semaphore = None
+
+    def start(self):
+        """
+        Crée le pool de connexions (doit être appelé dans la boucle d'événements)
+        """
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.default_timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+                keepalive_expiry=60,
+            ),
+        )
+        logging.info(f"Client HTTP vers {self.base_url} démarré ({self.max_concurrency} requêtes simultanées max)")
+
+    async def close(self):
+        """
+        Ferme les connexions ouvertes
+        """
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def request(self, method, path, idempotent=False, **kwargs):
+        """
+        Envoie une requête en respectant la limite de requêtes simultanées.
+        Les erreurs de connexion (requête jamais reçue) sont toujours retentées.
+        Si la requête est idempotente, on retente aussi après un dépassement de délai
+        ou une réponse 502/503/504.
+        """
+        timeout = self.timeouts.get(path, self.default_timeout)
+        async with self.semaphore:
+            for attempt in range(self.retries + 1):
+                last_attempt = attempt == self.retries
+                try:
+                    response = await self.client.request(method, path, timeout=timeout, **kwargs)
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                    if last_attempt:
+                        raise
+                    logging.warning(f"Connexion à {self.base_url}{path} impossible ({e}), nouvelle tentative...")
+                except httpx.TimeoutException as e:
+                    if not idempotent or last_attempt:
+                        raise
+                    logging.warning(f"Délai dépassé pour {self.base_url}{path} ({e}), nouvelle tentative...")
+                else:
+                    if idempotent and not last_attempt and response.status_code in (502, 503, 504):
+                        logging.warning(
+                            f"{self.base_url}{path} a répondu {response.status_code}, nouvelle tentative..."
+                        )
+                    else:
+                        return response
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
@@ -0,0 +1,183 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+class QueueFullError(Exception):
+    """
+    Levée quand la file d'attente du modèle est pleine et que la requête doit être refusée
+    """
+
+
+class BatchPredictor:
+    """
+    Regroupe les requêtes de prédiction concurrentes en lots afin de n'effectuer
+    qu'une seule passe du modèle par lot, puis renvoie chaque résultat à son appelant.
+    Les lots sont exécutés par un unique thread dédié au modèle, alimenté par une file bornée.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=16, max_wait_ms=10, max_queue_size=0, history_size=1000):
+        """
+        predict_batch : fonction qui reçoit une liste d'éléments et renvoie une liste de résultats
+        max_batch_size : nombre maximum d'éléments regroupés dans un même lot
+        max_wait_ms : temps maximum d'attente (en ms) après le premier élément avant de lancer le lot
+        max_queue_size : nombre maximum d'éléments en attente (0 pour une file illimitée)
+        history_size : nombre de lots conservés pour le calcul des métriques
+        """
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.max_queue_size = max(0, int(max_queue_size))
+        self.queue = None
+        self.worker = None
+        self.executor = None
+
+        # On garde un historique glissant pour les métriques
+        self.batch_sizes = deque(maxlen=history_size)
+        self.queue_waits = deque(maxlen=history_size)
+        self.batch_durations = deque(maxlen=history_size)
+        self.total_batches = 0
+        self.total_items = 0
+        self.rejected = 0
+
+    def start(self):
+        """
+        Démarre la tâche qui vide la file d'attente (doit être appelé dans la boucle d'événements)
+        """
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        # Un seul thread exécute le modèle : les passes ne se concurrencent pas entre elles
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")
+        self.worker = asyncio.create_task(self.run())
+        logging.info(
+            f"Micro-batching démarré (taille max : {self.max_batch_size}, "
+            f"attente max : {self.max_wait * 1000} ms, file max : {self.max_queue_size or 'illimitée'})"
+        )
+
+    async def stop(self):
+        """
+        Arrête la tâche de traitement des lots
+        """
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def is_full(self):
+        """
+        Indique si la file d'attente du modèle est pleine
+        """
+        return self.queue is not None and self.queue.full()
+
+    async def submit(self, item):
+        """
+        Ajoute un élément dans la file et attend le résultat de son lot.
+        Si la file est pleine, la requête est refusée immédiatement plutôt que d'attendre.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((item, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"File d'attente du modèle pleine ({self.max_queue_size} éléments)")
+        return await future
+
+    async def collect_batch(self):
+        """
+        Attend un premier élément puis complète le lot jusqu'à la taille maximum
+        ou jusqu'à l'expiration du temps d'attente
+        """
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # On prend d'abord tout ce qui est déjà disponible sans attendre
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        """
+        Boucle principale : un lot à la fois, exécuté hors de la boucle d'événements
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self.collect_batch()
+            start_time = time.perf_counter()
+            items = [item for item, _, _ in batch]
+            waits = [start_time - enqueued_at for _, _, enqueued_at in batch]
+
+            try:
+                # On lance la passe du modèle dans son thread pour ne pas bloquer les autres requêtes
+                results = await loop.run_in_executor(self.executor, self.predict_batch, items)
+            except Exception as e:
+                logging.error(f"Erreur lors de la prédiction d'un lot de {len(batch)} image(s) : {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+
+            self.record(len(batch), waits, time.perf_counter() - start_time)
+
+    def record(self, batch_size, waits, duration):
+        """
+        Enregistre les métriques d'un lot
+        """
+        self.total_batches += 1
+        self.total_items += batch_size
+        self.batch_sizes.append(batch_size)
+        self.queue_waits.extend(waits)
+        self.batch_durations.append(duration)
+
+    def get_stats(self):
+        """
+        Renvoie les métriques de taille de lot et d'attente dans la file (en ms)
+        """
+        stats = {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_size": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "rejected_requests": self.rejected,
+            "total_batches": self.total_batches,
+            "total_requests": self.total_items,
+        }
+        if self.batch_sizes:
+            sizes = np.array(self.batch_sizes)
+            waits = np.array(self.queue_waits) * 1000
+            durations = np.array(self.batch_durations) * 1000
+            stats.update(
+                {
+                    "batch_size_mean": float(sizes.mean()),
+                    "batch_size_max": int(sizes.max()),
+                    "batch_size_histogram": {
+                        str(size): int(count) for size, count in zip(*np.unique(sizes, return_counts=True))
+                    },
+                    "queue_wait_ms_mean": float(waits.mean()),
+                    "queue_wait_ms_p50": float(np.percentile(waits, 50)),
+                    "queue_wait_ms_p95": float(np.percentile(waits, 95)),
+                    "queue_wait_ms_max": float(waits.max()),
+                    "batch_duration_ms_mean": float(durations.mean()),
+                    "batch_duration_ms_p95": float(np.percentile(durations, 95)),
+                }
+            )
+        return stats
@@ -0,0 +1,64 @@
+import io
+import threading
+import numpy as np
+from PIL import Image
+from tensorflow.keras.applications.efficientnet import preprocess_input
+
+# Au-delà de ce rapport entre la taille de l'image source et la taille cible,
+# on laisse le décodeur JPEG réduire l'image (mode draft) avant le redimensionnement
+DRAFT_MIN_RATIO = 2
+
+
+def decode_image(content, img_size=(224, 224)):
+    """
+    Décode une image JPEG/PNG directement depuis ses octets et la met à la taille du modèle.
+    Renvoie un tableau uint8 (hauteur, largeur, 3).
+    """
+    height, width = img_size
+    img = Image.open(io.BytesIO(content))
+    # Pour un grand JPEG, le décodeur peut travailler à 1/2, 1/4 ou 1/8 de la résolution,
+    # ce qui évite de décoder des millions de pixels qui seront ensuite jetés
+    if img.format == "JPEG" and img.width >= DRAFT_MIN_RATIO * width and img.height >= DRAFT_MIN_RATIO * height:
+        img.draft("RGB", (width, height))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if img.size != (width, height):
+        # Même interpolation que image.load_img de Keras, utilisée à l'entraînement
+        img = img.resize((width, height), Image.NEAREST)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def load_image_file(image_path, img_size=(224, 224)):
+    """
+    Lit une image sur le disque et la décode à la taille du modèle
+    """
+    with open(image_path, "rb") as file:
+        return decode_image(file.read(), img_size)
+
+
+class BatchPreprocessor:
+    """
+    Prépare un lot d'images pour EfficientNet dans un tableau float32 alloué une seule fois.
+    Les images peuvent être fournies sous forme d'octets (décodés ici) ou déjà décodées.
+    Le lot renvoyé est réutilisé à l'appel suivant : il doit être consommé avant.
+    """
+
+    def __init__(self, img_size=(224, 224), max_batch_size=16):
+        self.img_size = img_size
+        self.buffer = np.empty((max(1, max_batch_size), *img_size, 3), dtype=np.float32)
+        self.lock = threading.Lock()
+
+    def preprocess(self, images):
+        """
+        Remplit le tableau avec les images puis applique le preprocessing d'EfficientNet
+        sur tout le lot en une seule fois
+        """
+        # Si le lot est plus grand que prévu, on agrandit le tableau une fois pour toutes
+        if len(images) > len(self.buffer):
+            self.buffer = np.empty((len(images), *self.img_size, 3), dtype=np.float32)
+        batch = self.buffer[: len(images)]
+        for index, img in enumerate(images):
+            if isinstance(img, (bytes, bytearray, memoryview)):
+                img = decode_image(bytes(img), self.img_size)
+            batch[index] = img
+        return preprocess_input(batch)
@@ -1,16 +1,26 @@
 import os
 import numpy as np
-from fastapi import FastAPI, HTTPException, Body
-from tensorflow.keras.preprocessing import image
-from tensorflow.keras.applications.efficientnet import preprocess_input
+from fastapi import FastAPI, HTTPException, Body, Request
+from fastapi.responses import JSONResponse
+from typing import Optional, Dict
+from pydantic import BaseModel
 from tensorflow.keras.models import load_model
 import logging
 import tensorflow as tf
 import time
 import json
-import csv
+import hashlib
+import asyncio
+import threading
+import random
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from alert_system import AlertSystem
+from batcher import BatchPredictor, QueueFullError
+from image_preprocessing import BatchPreprocessor, decode_image, load_image_file
+from prediction_cache import PredictionCache
+from model_registry import ModelRegistry
+from inference_log import InferenceLogWriter
 
 # On lance le serveur FastAPI
 app = FastAPI()
@@ -24,6 +34,7 @@ log_folder = os.path.join(volume_path, "logs")
 mlruns_path = os.path.join(volume_path, "mlruns")
 prod_model_id_path = os.path.join(mlruns_path, "prod_model_id.txt")
 temp_folder = os.path.join(volume_path, "temp_images")
+canary_folder = os.path.join(volume_path, "dataset_clean", "test")
 
 # On créer le dossier si nécessaire
 os.makedirs(log_folder, exist_ok=True)
@@ -39,6 +50,47 @@ logging.basicConfig(
 # Cette variable s'incrémente dès que le temps d'inférence est trop long
 too_long_inference = 0
 
+# Paramètres du micro-batching : taille maximum d'un lot et attente maximum avant son lancement
+batch_max_size = int(os.getenv("BATCH_MAX_SIZE", 16))
+batch_max_wait_ms = float(os.getenv("BATCH_MAX_WAIT_MS", 10))
+
+# Nombre de threads qui décodent et redimensionnent les images, en parallèle de la passe du modèle
+decode_workers = int(os.getenv("DECODE_WORKERS", os.cpu_count() or 1))
+# Nombre maximum d'images en attente de décodage, et d'images décodées en attente du modèle.
+# Au-delà, les requêtes sont refusées (503) plutôt que d'allonger indéfiniment l'attente
+queue_max_size = int(os.getenv("QUEUE_MAX_SIZE", 64))
+
+# Paramètres du cache des prédictions (indexé par hash de l'image et run_id du modèle)
+cache_max_entries = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", 10000))
+cache_max_mb = float(os.getenv("PREDICTION_CACHE_MAX_MB", 32))
+# Le second niveau du cache, sur le volume, est optionnel
+cache_disk_path = (
+    os.path.join(volume_path, "prediction_cache") if os.getenv("PREDICTION_CACHE_DISK", "0") == "1" else None
+)
+
+# Validation d'un nouveau modèle avant sa mise en production : nombre d'images de contrôle
+# prises dans le jeu de test et précision minimum attendue sur ces images
+canary_images = int(os.getenv("CANARY_IMAGES", 8))
+canary_min_accuracy = float(os.getenv("CANARY_MIN_ACCURACY", 0.5))
+
+# Modèles gardés en mémoire en même temps (production, runs testés en A/B ou en shadow)
+registry_max_models = int(os.getenv("MODEL_REGISTRY_MAX_MODELS", 3))
+registry_max_mb = float(os.getenv("MODEL_REGISTRY_MAX_MB", 2048))
+# Nombre maximum de lots en attente d'évaluation par le modèle shadow (les suivants sont ignorés)
+shadow_max_pending = int(os.getenv("SHADOW_MAX_PENDING_BATCHES", 4))
+
+# Historique des inférences : les prédictions sont écrites par lots en arrière-plan,
+# dans des fichiers CSV qui ne dépassent pas une taille maximum
+inference_log_flush_size = int(os.getenv("INFERENCE_LOG_FLUSH_SIZE", 100))
+inference_log_flush_seconds = float(os.getenv("INFERENCE_LOG_FLUSH_SECONDS", 1))
+inference_log_max_mb = float(os.getenv("INFERENCE_LOG_MAX_MB", 50))
+
+# Les 3 meilleures classes et leurs scores sont enregistrés dans des colonnes séparées,
+# les scores sous forme de nombres
+inference_log_columns = ["timestamp", "id_model", "image_name", "mode"]
+for rank in range(1, 4):
+    inference_log_columns += [f"class_{rank}", f"score_{rank}"]
+
 # ----------------------------------------------------------------------------------------- #
 
 
@@ -47,32 +99,10 @@ class predictClass:
     Cette classe permet d'effectuer des prédictions à partir d'un modèle .h5 (Keras)
     """
 
-    def __init__(self, model_path, img_size=(224, 224)):
+    def __init__(self, model_path, run_id=None, img_size=(224, 224)):
         self.img_size = img_size
         self.model_path = model_path
-
-        # region On créer un dossier pour stocker l'historique des inférences
-        volume_path = "volume_data"
-        hist_inferences_dir = os.path.join(volume_path, "logs/inferences")
-        os.makedirs(hist_inferences_dir, exist_ok=True)
-
-        self.csv_filename = os.path.join(
-            hist_inferences_dir, f'inferences_{datetime.now().strftime("%d%m%Y_%H%M")}.csv'
-        )
-        with open(self.csv_filename, "w", newline="") as csvfile:
-            writer = csv.writer(csvfile)
-
-            columns = [
-                "timestamp",
-                "id_model",
-                "image_name",
-                "classes",
-                "scores"
-            ]
-
-            writer.writerow(columns)
-
-        # endregion
+        self.run_id = run_id
 
         # Configurer GPU si disponible
         self.configure_gpu()
@@ -80,6 +110,12 @@ class predictClass:
         try:
             # On charge le model Keras
             self.model = load_model(os.path.join(model_path, "saved_model.h5"))
+            # On compile la passe avant une seule fois, avec une signature fixe
+            self.infer = self.build_inference_function()
+            # Mémoire occupée par les poids (float32), utilisée pour le budget du registre de modèles
+            self.memory_bytes = sum(int(np.prod(weight.shape)) for weight in self.model.weights) * 4
+            # Tableau des lots alloué une seule fois, à la taille maximum d'un lot
+            self.preprocessor = BatchPreprocessor(self.img_size, max_batch_size=batch_max_size)
             # On charge les labels des classes utilisées durant l'entraînement
             with open(os.path.join(model_path, "classes.json"), "r") as file:
                 self.class_names = json.load(file)
@@ -109,28 +145,55 @@ class predictClass:
                 message=f"Erreur lors de la configuration du GPU : {e}",
             )
 
-    def predict(self, image_path):
-
+    def build_inference_function(self):
+        """
+        Compile la passe avant du modèle dans une tf.function à signature fixe
+        (None, 224, 224, 3), tracée une seule fois au chargement.
+        Cela évite le pipeline tf.data et les callbacks créés par Model.predict à chaque appel.
+        """
+        @tf.function(input_signature=[tf.TensorSpec(shape=(None, *self.img_size, 3), dtype=tf.float32)])
+        def infer(images):
+            return self.model(images, training=False)
+
+        # On trace la fonction immédiatement pour ne pas payer ce coût à la première prédiction
+        return infer.get_concrete_function()
+
+    def preprocess(self, image_path):
+        """
+        Charge une image et la met à la taille attendue par le modèle
+        """
+        return load_image_file(image_path, self.img_size)
+
+    def preprocess_bytes(self, content):
+        """
+        Décode une image reçue en mémoire et la met à la taille attendue par le modèle
+        """
+        return decode_image(content, self.img_size)
+
+    def predict_batch(self, images):
+        """
+        Effectue la prédiction sur un lot d'images déjà chargées
+        et renvoie, pour chaque image, les 3 meilleures classes et leurs scores
+        """
         try:
-            # On charge l'image et on effectue le preprocessing pour EfficientNet
-            img = image.load_img(image_path, target_size=self.img_size)
-            img_array = image.img_to_array(img)
-            img_array_expanded_dims = np.expand_dims(img_array, axis=0)
-            img_ready = preprocess_input(img_array_expanded_dims)
-
-            # On lance la prédiction sur l'image
-            prediction = self.model.predict(img_ready)
-
-            # On récupère la liste des 3 meilleurs scores
-            meilleurs_scores = np.flip(np.sort(prediction[0])[-3:])
-            # On récupère la liste des index des 3 meilleures classes
-            meilleures_classes_index = np.flip(np.argsort(prediction[0])[-3:])
-            meilleures_classes = []
-            # On récupère les labels des classes
-            for index in meilleures_classes_index:
-                meilleures_classes.append(self.class_names[str(index)])
-            logging.info("Prédiction effectuée avec succès.")
-            return meilleures_classes, meilleurs_scores
+            with self.preprocessor.lock:
+                # On copie les images dans le tableau du lot et on effectue le preprocessing pour EfficientNet
+                img_ready = self.preprocessor.preprocess(images)
+
+                # On lance la prédiction sur tout le lot en une seule passe
+                predictions = self.infer(tf.convert_to_tensor(img_ready, dtype=tf.float32)).numpy()
+
+            # On récupère, pour chaque image, les index des 3 meilleures classes et leurs scores
+            meilleures_classes_index = np.flip(np.argsort(predictions, axis=1)[:, -3:], axis=1)
+            meilleurs_scores = np.take_along_axis(predictions, meilleures_classes_index, axis=1)
+
+            results = []
+            for classes_index, scores in zip(meilleures_classes_index, meilleurs_scores):
+                # On récupère les labels des classes
+                meilleures_classes = [self.class_names[str(index)] for index in classes_index]
+                results.append((meilleures_classes, scores))
+            logging.info(f"Prédiction effectuée avec succès sur un lot de {len(images)} image(s).")
+            return results
         except Exception as e:
             logging.error(f"Erreur lors de la prédiction : {str(e)}")
             alert_system.send_alert(
@@ -139,6 +202,12 @@ class predictClass:
             )
             raise
 
+    def predict(self, image_path):
+        """
+        Effectue la prédiction sur une seule image
+        """
+        return self.predict_batch([self.preprocess(image_path)])[0]
+
 
 def load_classifier(run_id):
     """
@@ -149,13 +218,71 @@ def load_classifier(run_id):
         volume_path, f"mlruns/157975935045122495/{run_id}/artifacts/model/"
     )
     # On instancie de classifier
-    classifier = predictClass(model_path=model_path)
+    start_time = time.perf_counter()
+    classifier = predictClass(model_path=model_path, run_id=run_id)
+    load_seconds = time.perf_counter() - start_time
     # On fais la prédiction d'une image pour charger le modèle
     # et accélérer les prochaines inférences
+    start_time = time.perf_counter()
     classifier.predict("./load_image.jpg")
+    warmup_seconds = time.perf_counter() - start_time
+    classifier.load_stats = {"load_seconds": load_seconds, "warmup_seconds": warmup_seconds}
+    logging.info(f"Modèle {run_id} chargé en {load_seconds:.2f} s, préchauffé en {warmup_seconds:.2f} s")
     return classifier
 
 
+def get_canary_set():
+    """
+    Renvoie les images de contrôle : l'image de chargement, puis la première image
+    de quelques classes du jeu de test si le dataset est présent dans le volume
+    """
+    canaries = [("./load_image.jpg", None)]
+    if os.path.isdir(canary_folder):
+        class_folders = [
+            class_name
+            for class_name in sorted(os.listdir(canary_folder))
+            if os.path.isdir(os.path.join(canary_folder, class_name))
+        ]
+        for class_name in class_folders[:canary_images]:
+            files = sorted(os.listdir(os.path.join(canary_folder, class_name)))
+            if files:
+                canaries.append((os.path.join(canary_folder, class_name, files[0]), class_name))
+    return canaries
+
+
+def validate_classifier(candidate):
+    """
+    Vérifie qu'un nouveau modèle donne des prédictions cohérentes sur les images de contrôle
+    avant de le mettre en production. Lève une exception sinon.
+    """
+    # Le modèle doit avoir autant de sorties que de classes dans classes.json
+    nb_outputs = candidate.model.output_shape[-1]
+    if nb_outputs != len(candidate.class_names):
+        raise ValueError(
+            f"Le modèle a {nb_outputs} sorties mais classes.json contient {len(candidate.class_names)} classes"
+        )
+
+    canaries = get_canary_set()
+    images = [candidate.preprocess(image_path) for image_path, _ in canaries]
+    results = candidate.predict_batch(images)
+
+    nb_labelled = 0
+    nb_correct = 0
+    for (image_path, label), (meilleures_classes, meilleurs_scores) in zip(canaries, results):
+        if not np.all(np.isfinite(meilleurs_scores)) or np.any(meilleurs_scores < 0) or np.any(meilleurs_scores > 1):
+            raise ValueError(f"Scores invalides pour l'image de contrôle {image_path} : {meilleurs_scores}")
+        if label is not None:
+            nb_labelled += 1
+            nb_correct += meilleures_classes[0] == label
+
+    accuracy = nb_correct / nb_labelled if nb_labelled else None
+    if accuracy is not None and accuracy < canary_min_accuracy:
+        raise ValueError(
+            f"Précision de {accuracy:.2f} sur les images de contrôle, inférieure au minimum {canary_min_accuracy}"
+        )
+    return {"canary_images": len(canaries), "canary_accuracy": accuracy}
+
+
 # ----------------------------------------------------------------------------------------- #
 
 
@@ -170,94 +297,486 @@ with open(prod_model_id_path, "r") as file:
 classifier = load_classifier(run_id)
 
 
+# Les modèles chargés sont gardés dans un registre, dans la limite d'un budget mémoire
+model_registry = ModelRegistry(
+    load_classifier, max_bytes=registry_max_mb * 1024 * 1024, max_models=registry_max_models
+)
+model_registry.add(classifier)
+model_registry.pin([classifier.run_id])
+
+# Répartition du trafic : pourcentage des requêtes envoyé à d'autres runs que celui en production,
+# et run qui évalue en parallèle (shadow) les mêmes lots que le modèle qui répond
+traffic = {"split": {}, "shadow": None}
+
+# Le modèle shadow évalue les lots dans son propre thread, hors du chemin critique
+shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+shadow_lock = threading.Lock()
+pending_shadow_batches = 0
+dropped_shadow_batches = 0
+
+
+# L'historique est alimenté par les requêtes et par le modèle shadow
+inference_log = InferenceLogWriter(
+    os.path.join(log_folder, "inferences"),
+    inference_log_columns,
+    flush_size=inference_log_flush_size,
+    flush_interval=inference_log_flush_seconds,
+    max_bytes=inference_log_max_mb * 1024 * 1024,
+)
+
+
+def make_log_row(timestamp, run_id, file_name, mode, meilleures_classes, meilleurs_scores):
+    """
+    Construit une ligne de l'historique des inférences
+    """
+    row = [timestamp, run_id, file_name, mode]
+    for classe, score in zip(meilleures_classes, meilleurs_scores):
+        row += [classe, float(score)]
+    return row
+
+
+def run_shadow(shadow_classifier, items):
+    """
+    Évalue un lot avec le modèle shadow et enregistre ses prédictions pour comparaison
+    """
+    global pending_shadow_batches
+    try:
+        predictions = shadow_classifier.predict_batch([img_array for img_array, _, _ in items])
+        timestamp = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
+        inference_log.log(
+            [
+                make_log_row(
+                    timestamp, shadow_classifier.run_id, file_name, "shadow", meilleures_classes, meilleurs_scores
+                )
+                for (_, _, file_name), (meilleures_classes, meilleurs_scores) in zip(items, predictions)
+            ]
+        )
+    except Exception as e:
+        logging.error(f"Erreur lors de l'évaluation shadow du run {shadow_classifier.run_id} : {e}")
+    finally:
+        with shadow_lock:
+            pending_shadow_batches -= 1
+
+
+def submit_shadow(items):
+    """
+    Confie le lot au modèle shadow s'il y en a un, sans attendre le résultat
+    """
+    global pending_shadow_batches, dropped_shadow_batches
+    shadow_run_id = traffic["shadow"]
+    shadow_classifier = model_registry.get(shadow_run_id) if shadow_run_id else None
+    if shadow_classifier is None:
+        return
+    with shadow_lock:
+        # Si le modèle shadow prend du retard, on ignore le lot plutôt que d'accumuler les images
+        if pending_shadow_batches >= shadow_max_pending:
+            dropped_shadow_batches += 1
+            return
+        pending_shadow_batches += 1
+    shadow_executor.submit(run_shadow, shadow_classifier, items)
+
+
+def predict_batch(items):
+    """
+    Prédiction d'un lot. Chaque élément contient l'image, le modèle ciblé
+    (None pour le modèle en production, qui peut changer via /switchmodel) et le nom du fichier.
+    Les images sont regroupées par modèle et chaque résultat indique le run_id
+    du modèle qui a réellement effectué la prédiction.
+    """
+    production_classifier = classifier
+    groups = {}
+    for index, (_, target, _) in enumerate(items):
+        target = target or production_classifier
+        groups.setdefault(target.run_id, (target, []))[1].append(index)
+
+    results = [None] * len(items)
+    for target, indexes in groups.values():
+        predictions = target.predict_batch([items[index][0] for index in indexes])
+        for index, (meilleures_classes, meilleurs_scores) in zip(indexes, predictions):
+            results[index] = (meilleures_classes, meilleurs_scores, target.run_id)
+
+    submit_shadow(items)
+    return results
+
+
+# On regroupe les requêtes concurrentes pour n'effectuer qu'une passe du modèle par lot
+batch_predictor = BatchPredictor(
+    predict_batch, max_batch_size=batch_max_size, max_wait_ms=batch_max_wait_ms, max_queue_size=queue_max_size
+)
+
+# Le décodage des images se fait dans un pool de threads, séparé du thread qui exécute le modèle
+decode_executor = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="decode")
+pending_decodes = 0
+rejected_decodes = 0
+
+# Le nouveau modèle est chargé dans un thread à part, l'ancien continue de répondre jusqu'au changement
+model_loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model_loader")
+switch_lock = threading.Lock()
+switch_status = {"status": "ready", "run_id": run_id, **classifier.load_stats}
+
+# On garde les dernières prédictions pour ne pas refaire l'inférence d'une image déjà vue
+prediction_cache = PredictionCache(
+    max_entries=cache_max_entries, max_bytes=cache_max_mb * 1024 * 1024, disk_path=cache_disk_path
+)
+
+
 # ----------------------------------------------------------------------------------------- #
 
 
+@app.on_event("startup")
+async def start_batch_predictor():
+    batch_predictor.start()
+
+
+@app.on_event("shutdown")
+async def stop_batch_predictor():
+    await batch_predictor.stop()
+    decode_executor.shutdown(wait=False)
+    model_loader.shutdown(wait=False)
+    shadow_executor.shutdown(wait=False)
+    inference_log.close()
+
+
 @app.get("/")
 def read_root():
     return {"Status": "OK"}
 
 
-# Cette route permet d'effectuer une prédiction sur une image
+# Cette route permet de suivre la taille des lots et le temps d'attente dans la file
+@app.get("/metrics")
+def metrics():
+    return {
+        "decoding": {
+            "workers": decode_workers,
+            "pending": pending_decodes,
+            "max_pending": queue_max_size,
+            "rejected_requests": rejected_decodes,
+        },
+        "batching": batch_predictor.get_stats(),
+        "prediction_cache": prediction_cache.get_stats(),
+        "models": model_registry.get_stats(),
+        "inference_log": inference_log.get_stats(),
+        "shadow": {
+            "run_id": traffic["shadow"],
+            "pending_batches": pending_shadow_batches,
+            "dropped_batches": dropped_shadow_batches,
+        },
+    }
+
+
+async def get_target_classifier(run_id=None):
+    """
+    Renvoie le modèle qui doit traiter la requête (None pour le modèle en production)
+    et le mode de routage : run demandé explicitement, répartition du trafic ou production
+    """
+    if run_id is not None:
+        mode = "routed"
+    else:
+        # On tire la requête au sort selon les pourcentages de la répartition du trafic
+        draw = random.uniform(0, 100)
+        for split_run_id, percentage in traffic["split"].items():
+            if draw < percentage:
+                run_id = split_run_id
+                mode = "split"
+                break
+            draw -= percentage
+        else:
+            return None, "production"
+
+    target = model_registry.get(run_id)
+    if target is None:
+        # Le modèle est chargé dans le thread de chargement, sans bloquer les autres requêtes
+        try:
+            target = await asyncio.get_running_loop().run_in_executor(model_loader, model_registry.load, run_id)
+        except Exception as e:
+            raise HTTPException(status_code=404, detail=f"Impossible de charger le modèle du run {run_id} : {e}")
+    return target, mode
+
+
+async def run_prediction(content, file_name, start_time, run_id=None):
+    """
+    Cherche la prédiction dans le cache, sinon décode l'image dans le pool de décodage et la place
+    dans la file de micro-batching, puis enregistre la prédiction et surveille le temps d'inférence
+    """
+    global too_long_inference, pending_decodes, rejected_decodes
+    # On choisit le modèle qui traite la requête et on en garde une référence pour toute sa durée
+    target, mode = await get_target_classifier(run_id)
+    current_classifier = target or classifier
+    served_run_id = current_classifier.run_id
+    content_hash = hashlib.sha256(content).hexdigest()
+    result = prediction_cache.get(content_hash, served_run_id)
+    if result is None:
+        # Si le service est déjà saturé, on refuse la requête avant de décoder l'image
+        if pending_decodes >= queue_max_size or batch_predictor.is_full():
+            rejected_decodes += 1
+            raise QueueFullError("Trop d'images en attente de traitement")
+        # On décode l'image en mémoire dans le pool de threads, sans bloquer la boucle d'événements
+        pending_decodes += 1
+        try:
+            img_array = await asyncio.get_running_loop().run_in_executor(
+                decode_executor, current_classifier.preprocess_bytes, content
+            )
+        finally:
+            pending_decodes -= 1
+        # On attend le résultat du lot dans lequel l'image a été placée
+        # (si le modèle a changé entre temps, c'est le nouveau qui a effectué la prédiction)
+        meilleures_classes, meilleurs_scores, served_run_id = await batch_predictor.submit(
+            (img_array, target, file_name)
+        )
+        result = {"predictions": meilleures_classes, "scores": meilleurs_scores.tolist()}
+        prediction_cache.put(content_hash, served_run_id, result, time.time() - start_time)
+
+    # On enregistre la prédiction (l'écriture se fait en arrière-plan)
+    inference_log.log(
+        [
+            make_log_row(
+                datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
+                served_run_id,
+                file_name,
+                mode,
+                result["predictions"],
+                result["scores"],
+            )
+        ]
+    )
+
+    # On calcule temps qui a été nécessaire
+    end_time = time.time()
+    total_time = end_time - start_time
+    logging.info(f"Temps pour l'inférence : {total_time}")
+    if total_time > 1:
+        too_long_inference += 1
+    if too_long_inference > 3:
+        # On envoie un email pour indiquer que les 4 dernières inférences étaient trop longues
+        too_long_inference = 0
+        logging.error("Lenteur détectée pour l'inférence...")
+        alert_system.send_alert(
+            subject="Lenteur du container d'inférence",
+            message="""Les 4 dernières inférences ont pris plus de
+                                1 seconde à s'éxectuer, il y a un problème de performance.
+                                Merci de vous reporter aux logs.""",
+        )
+
+    return {
+        "predictions": result["predictions"],
+        "scores": result["scores"],
+        "filename": file_name,
+        "run_id": served_run_id,
+    }
+
+
+def overloaded_error(e):
+    """
+    Renvoie l'erreur HTTP indiquant au client que le service est saturé et quand réessayer
+    """
+    logging.warning(f"Requête refusée, service d'inférence saturé : {e}")
+    return HTTPException(
+        status_code=503,
+        detail=f"Service d'inférence saturé, merci de réessayer : {e}",
+        headers={"Retry-After": "1"},
+    )
+
+
+def inference_error(e):
+    """
+    Journalise une erreur d'inférence, prévient par email et renvoie l'erreur HTTP associée
+    """
+    logging.error(f"Un problème est survenu lors de l'inférence: {e}")
+    alert_system.send_alert(
+        subject="Erreur lors de l'inférence",
+        message=f"Un problème est survenu lors de l'inférence: {e}",
+    )
+    return HTTPException(
+        status_code=500, detail=f"Un problème est survenu lors de l'inférence: {e}"
+    )
+
+
+# Cette route permet d'effectuer une prédiction sur une image présente dans le volume
+# (run_id permet de choisir un autre modèle que celui en production)
 @app.get("/predict")
-async def predict(file_name: str):
+async def predict(file_name: str, run_id: Optional[str] = None):
     try:
-        global too_long_inference
         # Permet de calculer le temps d'inférence
         start_time = time.time()
         # On récupère la bonne image dans le volume
-        image_path = os.path.join(temp_folder, file_name)
-        # On lance la prédiction
-        meilleures_classes, meilleurs_scores = classifier.predict(image_path)
-
-        # On enregistre la prédiction
-        with open(classifier.csv_filename, "a", newline="") as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(
-                [
-                    datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
-                    run_id,
-                    file_name,
-                    meilleures_classes,
-                    meilleurs_scores
-                ]
-            )
-
-        # On calcule temps qui a été nécessaire
-        end_time = time.time()
-        total_time = end_time - start_time
-        logging.info(f"Temps pour l'inférence : {total_time}")
-        if total_time > 1:
-            too_long_inference += 1
-        if too_long_inference > 3:
-            # On envoie un email pour indiquer que les 4 dernières inférences étaient trop longues
-            too_long_inference = 0
-            logging.error("Lenteur détectée pour l'inférence...")
-            alert_system.send_alert(
-                subject="Lenteur du container d'inférence",
-                message="""Les 4 dernières inférences ont pris plus de
-                                    1 seconde à s'éxectuer, il y a un problème de performance.
-                                    Merci de vous reporter aux logs.""",
-            )
+        with open(os.path.join(temp_folder, file_name), "rb") as image_file:
+            content = image_file.read()
+        return await run_prediction(content, file_name, start_time, run_id)
+
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise overloaded_error(e)
+    except Exception as e:
+        raise inference_error(e)
 
-        return {
-            "predictions": meilleures_classes,
-            "scores": meilleurs_scores.tolist(),
-            "filename": file_name,
-        }
 
+# Cette route permet d'effectuer une prédiction sur une image envoyée directement
+# (formulaire multipart avec un champ "file" ou image brute dans le corps de la requête),
+# sans passer par le volume
+@app.post("/predict")
+async def predict_bytes(request: Request, file_name: Optional[str] = None, run_id: Optional[str] = None):
+    try:
+        # Permet de calculer le temps d'inférence
+        start_time = time.time()
+        # On récupère le contenu de l'image selon le format de la requête
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form["file"]
+            content = await upload.read()
+        else:
+            content = await request.body()
+        if not content:
+            raise HTTPException(status_code=400, detail="Aucune image n'a été envoyée.")
+        # Sans nom fourni, on utilise le hash de l'image comme le fait l'API utilisateur
+        if file_name is None:
+            file_name = hashlib.sha256(content).hexdigest() + ".jpg"
+        # L'image sera décodée directement en mémoire
+        return await run_prediction(content, file_name, start_time, run_id)
+
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise overloaded_error(e)
     except Exception as e:
-        logging.error(f"Un problème est survenu lors de l'inférence: {e}")
-        alert_system.send_alert(
-            subject="Erreur lors de l'inférence",
-            message=f"Un problème est survenu lors de l'inférence: {e}",
-        )
-        raise HTTPException(
-            status_code=500, detail=f"Un problème est survenu lors de l'inférence: {e}"
-        )
+        raise inference_error(e)
 
 
-@app.post("/switchmodel")
-async def switch_model(run_id: str = Body(...)):
+def switch_classifier(run_id):
+    """
+    Charge, préchauffe et valide le nouveau modèle, puis le met en production d'un seul coup.
+    Exécuté dans le thread de chargement : l'ancien modèle répond aux requêtes jusqu'au changement.
+    """
+    global classifier
     try:
-        global classifier
-        # On récupère le run_id et on l'enregistre
-        run_id = run_id.removeprefix("run_id=")
-        # On recharge le classifier avec le nouveau modèle
-        classifier = load_classifier(run_id)
-        with open(os.path.join(mlruns_path, "prod_model_id.txt"), "w") as file:
+        # Si le modèle est déjà chargé (A/B, shadow), on le réutilise
+        candidate = model_registry.get(run_id) or load_classifier(run_id)
+        switch_status.update(candidate.load_stats)
+
+        switch_status["status"] = "validating"
+        start_time = time.perf_counter()
+        switch_status.update(validate_classifier(candidate))
+        switch_status["validation_seconds"] = time.perf_counter() - start_time
+
+        with open(prod_model_id_path, "w") as file:
             file.write(run_id)
-        logging.info("Changement de modèle effectué !")
-        return {
-            f"Le nouveau modèle utilisé provient maintenant du run id suivant : {run_id}"
-        }
+        previous_run_id = classifier.run_id
+        # Une seule affectation : les requêtes utilisent soit l'ancien, soit le nouveau modèle
+        classifier = candidate
+        # Le nouveau modèle est épinglé avant son ajout : le registre ne peut pas le décharger
+        # L'ancien modèle reste chargé tant que le budget mémoire le permet
+        pin_traffic_models([run_id])
+        model_registry.add(candidate)
+        # Les prédictions de l'ancien modèle ne sont plus utiles
+        prediction_cache.clear()
+
+        switch_status.update(
+            {"status": "ready", "previous_run_id": previous_run_id, "finished_at": datetime.now().isoformat()}
+        )
+        logging.info(f"Changement de modèle effectué : {previous_run_id} -> {run_id}")
+        return dict(switch_status)
 
     except Exception as e:
+        switch_status.update({"status": "failed", "error": str(e), "finished_at": datetime.now().isoformat()})
         logging.error(f"Le changement de modèle n'a pas fonctionné : {e}")
         alert_system.send_alert(
             subject="Erreur lors de l'inférence",
             message=f"Le changement de modèle n'a pas fonctionné : {e}",
         )
+        raise
+    finally:
+        switch_lock.release()
+
+
+# Cette route lance le changement de modèle en arrière-plan. Par défaut, elle attend la fin
+# du changement pour renvoyer son résultat (wait=false pour répondre immédiatement)
+@app.post("/switchmodel")
+async def switch_model(run_id: str = Body(...), wait: bool = True):
+    # On récupère le run_id
+    run_id = run_id.removeprefix("run_id=")
+    if not switch_lock.acquire(blocking=False):
+        raise HTTPException(
+            status_code=409, detail=f"Un changement de modèle est déjà en cours : {switch_status.get('run_id')}"
+        )
+    switch_status.clear()
+    switch_status.update({"status": "loading", "run_id": run_id, "started_at": datetime.now().isoformat()})
+    try:
+        future = model_loader.submit(switch_classifier, run_id)
+    except Exception:
+        switch_lock.release()
+        raise
+
+    if not wait:
+        return JSONResponse(status_code=202, content=dict(switch_status))
+
+    try:
+        status = await asyncio.wrap_future(future)
+    except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Le changement de modèle n'a pas fonctionné : {e}"
         )
+    return {
+        "message": f"Le nouveau modèle utilisé provient maintenant du run id suivant : {run_id}",
+        **status,
+    }
+
+
+# Cette route permet de suivre le changement de modèle en cours ou le dernier effectué
+@app.get("/switchmodel/status")
+def switch_model_status():
+    return {"current_run_id": classifier.run_id, **switch_status}
+
+
+class TrafficConfig(BaseModel):
+    # Pourcentage des requêtes envoyé à chaque run (le reste va au modèle en production)
+    split: Dict[str, float] = {}
+    # Run qui évalue les mêmes lots que le modèle qui répond, sans effet sur les réponses
+    shadow: Optional[str] = None
+
+
+def pin_traffic_models(run_ids=()):
+    """
+    Empêche le déchargement du modèle en production et des modèles qui reçoivent du trafic
+    """
+    model_registry.pin([classifier.run_id, traffic["shadow"], *traffic["split"], *run_ids])
+
+
+def load_and_validate(run_id):
+    """
+    Charge un modèle dans le registre et le valide sur les images de contrôle
+    """
+    validate_classifier(model_registry.load(run_id))
+
+
+def get_traffic():
+    return {"production": classifier.run_id, **traffic, "models": model_registry.get_stats()}
+
+
+# Cette route configure la répartition du trafic (A/B) et le modèle shadow
+@app.post("/traffic")
+async def set_traffic(config: TrafficConfig):
+    split = {split_run_id: percentage for split_run_id, percentage in config.split.items() if percentage > 0}
+    if any(percentage < 0 for percentage in config.split.values()) or sum(split.values()) > 100:
+        raise HTTPException(status_code=400, detail="Les pourcentages doivent être positifs et de somme <= 100")
+
+    # Les modèles sont chargés et validés avant de recevoir du trafic
+    run_ids = set(split) | ({config.shadow} if config.shadow else set())
+    pin_traffic_models(run_ids)
+    try:
+        for traffic_run_id in run_ids:
+            await asyncio.get_running_loop().run_in_executor(model_loader, load_and_validate, traffic_run_id)
+    except Exception as e:
+        pin_traffic_models()
+        logging.error(f"Configuration du trafic refusée : {e}")
+        raise HTTPException(status_code=400, detail=f"Configuration du trafic refusée : {e}")
+
+    traffic["split"] = split
+    traffic["shadow"] = config.shadow
+    pin_traffic_models()
+    logging.info(f"Nouvelle répartition du trafic : {traffic}")
+    return get_traffic()
+
+
+@app.get("/traffic")
+def traffic_status():
+    return get_traffic()
@@ -0,0 +1,118 @@
+import os
+import csv
+import logging
+import threading
+from datetime import datetime
+
+
+class InferenceLogWriter:
+    """
+    Écrit l'historique des inférences en arrière-plan : les prédictions sont gardées en mémoire
+    puis écrites par lots, dès que le lot est plein ou que le délai est écoulé.
+    Un nouveau fichier est créé quand le fichier courant dépasse la taille maximum.
+    """
+
+    def __init__(self, folder, columns, flush_size=100, flush_interval=1.0, max_bytes=50 * 1024 * 1024):
+        """
+        folder : dossier des fichiers CSV
+        columns : colonnes des fichiers CSV
+        flush_size : nombre de prédictions en mémoire qui déclenche l'écriture
+        flush_interval : délai maximum (en secondes) avant l'écriture des prédictions en mémoire
+        max_bytes : taille maximum d'un fichier avant d'en commencer un nouveau
+        """
+        self.folder = folder
+        self.columns = columns
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.buffer = []
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.file = None
+        self.writer = None
+        self.filename = None
+        self.written = 0
+        self.flushes = 0
+        self.rotations = 0
+
+        os.makedirs(self.folder, exist_ok=True)
+        self.open_new_file()
+        self.worker = threading.Thread(target=self.run, name="inference_log", daemon=True)
+        self.worker.start()
+
+    def open_new_file(self):
+        """
+        Ferme le fichier courant et en commence un nouveau avec la ligne d'en-tête
+        """
+        if self.file is not None:
+            self.file.close()
+            self.rotations += 1
+        timestamp = datetime.now().strftime("%d%m%Y_%H%M%S")
+        self.filename = os.path.join(self.folder, f"inferences_{timestamp}.csv")
+        index = 1
+        while os.path.exists(self.filename):
+            self.filename = os.path.join(self.folder, f"inferences_{timestamp}_{index}.csv")
+            index += 1
+        self.file = open(self.filename, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.columns)
+        self.file.flush()
+
+    def log(self, rows):
+        """
+        Ajoute des prédictions à écrire, sans attendre l'écriture
+        """
+        with self.condition:
+            self.buffer.extend(rows)
+            if len(self.buffer) >= self.flush_size:
+                self.condition.notify()
+
+    def run(self):
+        """
+        Boucle du thread d'écriture
+        """
+        while True:
+            with self.condition:
+                if not self.stopped and len(self.buffer) < self.flush_size:
+                    self.condition.wait(self.flush_interval)
+                rows, self.buffer = self.buffer, []
+                stopped = self.stopped
+            if rows:
+                self.write(rows)
+            if stopped:
+                break
+
+    def write(self, rows):
+        """
+        Écrit un lot de prédictions, puis change de fichier si la taille maximum est atteinte
+        """
+        try:
+            self.writer.writerows(rows)
+            self.file.flush()
+            self.written += len(rows)
+            self.flushes += 1
+            if self.file.tell() >= self.max_bytes:
+                self.open_new_file()
+        except Exception as e:
+            logging.error(f"Erreur lors de l'écriture de l'historique des inférences : {e}")
+
+    def close(self):
+        """
+        Écrit les prédictions restantes et ferme le fichier
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.worker.join()
+        self.file.close()
+
+    def get_stats(self):
+        with self.condition:
+            pending = len(self.buffer)
+        return {
+            "file": self.filename,
+            "pending_rows": pending,
+            "written_rows": self.written,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+        }
@@ -0,0 +1,100 @@
+import gc
+import logging
+import threading
+from collections import OrderedDict
+
+
+class ModelRegistry:
+    """
+    Garde plusieurs modèles chargés en mémoire (un par run MLflow) dans la limite d'un budget.
+    Les modèles les moins récemment utilisés sont déchargés en premier, sauf les modèles épinglés
+    (modèle en production, modèles qui reçoivent du trafic).
+    """
+
+    def __init__(self, load_model, max_bytes=2048 * 1024 * 1024, max_models=3):
+        """
+        load_model : fonction qui charge le modèle d'un run_id (renvoie un objet avec run_id et memory_bytes)
+        max_bytes : mémoire maximum occupée par les poids des modèles chargés
+        max_models : nombre maximum de modèles chargés en même temps
+        """
+        self.load_model = load_model
+        self.max_bytes = max_bytes
+        self.max_models = max(1, max_models)
+        self.models = OrderedDict()
+        self.pinned = set()
+        self.lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, run_id):
+        """
+        Renvoie le modèle s'il est déjà chargé, sinon None
+        """
+        with self.lock:
+            model = self.models.get(run_id)
+            if model is not None:
+                self.models.move_to_end(run_id)
+            return model
+
+    def load(self, run_id):
+        """
+        Renvoie le modèle, en le chargeant s'il ne l'est pas encore (appel bloquant)
+        """
+        model = self.get(run_id)
+        if model is None:
+            model = self.load_model(run_id)
+            self.loads += 1
+            self.add(model)
+        return model
+
+    def add(self, model):
+        """
+        Ajoute un modèle déjà chargé, puis décharge les plus anciens si le budget est dépassé
+        """
+        with self.lock:
+            self.models[model.run_id] = model
+            self.models.move_to_end(model.run_id)
+        self.evict()
+
+    def pin(self, run_ids):
+        """
+        Définit les modèles qui ne doivent pas être déchargés
+        """
+        with self.lock:
+            self.pinned = {run_id for run_id in run_ids if run_id}
+        self.evict()
+
+    def memory_bytes(self):
+        return sum(model.memory_bytes for model in self.models.values())
+
+    def evict(self):
+        """
+        Décharge les modèles non épinglés les moins récemment utilisés tant que le budget est dépassé
+        """
+        evicted = []
+        with self.lock:
+            while len(self.models) > self.max_models or self.memory_bytes() > self.max_bytes:
+                candidates = [run_id for run_id in self.models if run_id not in self.pinned]
+                if not candidates:
+                    break
+                self.models.pop(candidates[0])
+                evicted.append(candidates[0])
+                self.evictions += 1
+        if evicted:
+            # On libère la mémoire des modèles déchargés
+            gc.collect()
+            logging.info(f"Modèle(s) déchargé(s) de la mémoire : {evicted}")
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "models": {
+                    run_id: {"memory_mb": model.memory_bytes / (1024 * 1024), "pinned": run_id in self.pinned}
+                    for run_id, model in self.models.items()
+                },
+                "memory_mb": self.memory_bytes() / (1024 * 1024),
+                "max_memory_mb": self.max_bytes / (1024 * 1024),
+                "max_models": self.max_models,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,146 @@
+import os
+import json
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Cache des prédictions, indexé par (hash du contenu de l'image, run_id du modèle).
+    Les entrées les moins récemment utilisées sont supprimées dès que le nombre d'entrées
+    ou la mémoire occupée dépasse la limite. Un second niveau optionnel sur disque permet
+    de retrouver les prédictions après un redémarrage.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=32 * 1024 * 1024, disk_path=None):
+        """
+        max_entries : nombre maximum de prédictions gardées en mémoire
+        max_bytes : mémoire maximum (estimée) occupée par les prédictions
+        disk_path : dossier du cache sur disque (désactivé si None)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+        # Compteurs pour suivre l'efficacité du cache
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Temps de calcul économisé grâce aux prédictions retrouvées dans le cache
+        self.saved_seconds = 0.0
+
+        if self.disk_path is not None:
+            os.makedirs(self.disk_path, exist_ok=True)
+
+    @staticmethod
+    def entry_size(key, value):
+        """
+        Estime la mémoire occupée par une entrée
+        """
+        return len(json.dumps(value)) + len(key[0]) + len(key[1]) + 200
+
+    def get_disk_file(self, content_hash, run_id):
+        return os.path.join(self.disk_path, run_id, f"{content_hash}.json")
+
+    def get(self, content_hash, run_id):
+        """
+        Renvoie la prédiction en cache, ou None si elle n'y est pas
+        """
+        key = (content_hash, run_id)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                result, compute_time, _ = self.entries[key]
+                self.saved_seconds += compute_time
+                return result
+
+        # Si la prédiction n'est pas en mémoire, on regarde sur le disque
+        if self.disk_path is not None:
+            disk_file = self.get_disk_file(content_hash, run_id)
+            if os.path.exists(disk_file):
+                try:
+                    with open(disk_file, "r") as file:
+                        entry = json.load(file)
+                    self.store(key, entry["result"], entry["compute_time"])
+                    with self.lock:
+                        self.disk_hits += 1
+                        self.saved_seconds += entry["compute_time"]
+                    return entry["result"]
+                except Exception as e:
+                    logging.warning(f"Entrée du cache illisible {disk_file} : {e}")
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, content_hash, run_id, result, compute_time=0.0):
+        """
+        Ajoute une prédiction (doit être sérialisable en JSON) et le temps qu'elle a coûté
+        """
+        key = (content_hash, run_id)
+        self.store(key, result, compute_time)
+
+        if self.disk_path is not None:
+            disk_file = self.get_disk_file(content_hash, run_id)
+            try:
+                os.makedirs(os.path.dirname(disk_file), exist_ok=True)
+                with open(disk_file, "w") as file:
+                    json.dump({"result": result, "compute_time": compute_time}, file)
+            except Exception as e:
+                logging.warning(f"Écriture du cache sur disque impossible {disk_file} : {e}")
+
+    def store(self, key, result, compute_time):
+        """
+        Ajoute une entrée en mémoire et supprime les plus anciennes si nécessaire
+        """
+        size = self.entry_size(key, result)
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[2]
+            self.entries[key] = (result, compute_time, size)
+            self.total_bytes += size
+            while len(self.entries) > 1 and (
+                len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes
+            ):
+                _, (_, _, old_size) = self.entries.popitem(last=False)
+                self.total_bytes -= old_size
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Vide le cache (mémoire et disque), par exemple lors d'un changement de modèle
+        """
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+        if self.disk_path is not None and os.path.exists(self.disk_path):
+            shutil.rmtree(self.disk_path, ignore_errors=True)
+            os.makedirs(self.disk_path, exist_ok=True)
+        logging.info("Cache des prédictions vidé.")
+
+    def get_stats(self):
+        """
+        Renvoie les compteurs du cache
+        """
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "memory_bytes": self.total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "disk_enabled": self.disk_path is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "saved_seconds": self.saved_seconds,
+            }
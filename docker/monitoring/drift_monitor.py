@@ -9,7 +9,7 @@ import schedule
 from alert_system import AlertSystem
 from tensorflow.keras.models import load_model
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
-from sklearn.metrics import confusion_matrix
+from metrics import confusion_dataframe
 
 # region Configuration
 
@@ -88,12 +88,8 @@ class DriftMonitor:
             true_classes = test_generator.classes
             class_labels = list(test_generator.class_indices.keys())
 
-            # Créer la matrice de confusion
-            conf_matrix = confusion_matrix(true_classes, predicted_classes)
-
-            # Ajout des metriques au DataFrame
-            confusion_df = pd.DataFrame(conf_matrix, index=class_labels, columns=class_labels)
-            confusion_df = self.add_metrics(confusion_df)
+            # Créer la matrice de confusion et ajout des metriques au DataFrame
+            confusion_df = confusion_dataframe(true_classes, predicted_classes, class_labels)
 
         except Exception as e:
 
@@ -135,36 +131,6 @@ class DriftMonitor:
                 shutil.move(os.path.join(temp_test_folder, classes), os.path.join(test_set_path, classes))
             os.rmdir(temp_test_folder)
 
-    def add_metrics(self, df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Ajout au DataFrame des métriques de precision, recall et f1-score
-        """
-        # On calcule la precision (VP/VP+FP) pour chaque classe et ajoute la colonne
-        df["Precision"] = df.apply(
-            lambda row: df.loc[row.name, row.name] / df[row.name].sum()
-            if df[row.name].sum() != 0
-            else 0,
-            axis=1
-        )
-
-        # On calcule le recall (VP/VP+FN) pour chaque classe et ajoute la colonne
-        df["Recall"] = df.apply(
-            lambda row: df.loc[row.name, row.name] / df.loc[row.name].sum()
-            if df.loc[row.name].sum() != 0
-            else 0,
-            axis=1
-        )
-
-        # On calcule le f1-score ((2*Rec*Pre)/(Rec+Pre)) pour chaque classe et ajoute la colonne
-        df["f1-score"] = df.apply(
-            lambda row: (2 * row["Precision"] * row["Recall"]) / (row["Precision"] + row["Recall"])
-            if (row["Precision"] + row["Recall"]) != 0
-            else 0,
-            axis=1
-        )
-
-        return df
-
     def compare_confusion_matrix(self, new_matrix: pd.DataFrame):
         """
         Ajoute au DataFrame des colonnes de comparaison des métriques avec la matrice de confusion initiale
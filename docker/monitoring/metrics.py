@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Au-delà de ce nombre de classes, la matrice de confusion est gardée sous forme creuse
+# et seules les métriques par classe sont conservées dans le DataFrame
+SPARSE_MIN_CLASSES = 1000
+
+
+def confusion_matrix(true_classes, predicted_classes, nb_classes, sparse_matrix=False):
+    """
+    Construit la matrice de confusion (lignes : vraies classes, colonnes : classes prédites)
+    avec une ligne et une colonne pour chaque classe, même absente des prédictions
+    """
+    true_classes = np.asarray(true_classes, dtype=np.int64)
+    predicted_classes = np.asarray(predicted_classes, dtype=np.int64)
+    if sparse_matrix:
+        # Seules les cases non nulles sont stockées
+        values = np.ones(len(true_classes), dtype=np.int64)
+        return sparse.coo_matrix(
+            (values, (true_classes, predicted_classes)), shape=(nb_classes, nb_classes)
+        ).tocsr()
+    counts = np.bincount(true_classes * nb_classes + predicted_classes, minlength=nb_classes * nb_classes)
+    return counts.reshape(nb_classes, nb_classes)
+
+
+def confusion_metrics(matrix):
+    """
+    Calcule la precision, le recall et le f1-score de chaque classe à partir
+    d'une matrice de confusion dense (NumPy) ou creuse (scipy.sparse)
+    """
+    if sparse.issparse(matrix):
+        matrix = sparse.csr_matrix(matrix)
+        true_positives = matrix.diagonal().astype(np.float64)
+        predicted_totals = np.asarray(matrix.sum(axis=0), dtype=np.float64).ravel()
+        true_totals = np.asarray(matrix.sum(axis=1), dtype=np.float64).ravel()
+    else:
+        matrix = np.asarray(matrix)
+        true_positives = np.diagonal(matrix).astype(np.float64)
+        predicted_totals = matrix.sum(axis=0, dtype=np.float64)
+        true_totals = matrix.sum(axis=1, dtype=np.float64)
+
+    # Precision : VP / (VP + FP), Recall : VP / (VP + FN), 0 si le dénominateur est nul
+    precision = np.divide(
+        true_positives, predicted_totals, out=np.zeros_like(true_positives), where=predicted_totals != 0
+    )
+    recall = np.divide(true_positives, true_totals, out=np.zeros_like(true_positives), where=true_totals != 0)
+    # f1-score : (2 * Rec * Pre) / (Rec + Pre)
+    denominator = precision + recall
+    f1_score = np.divide(
+        2 * precision * recall, denominator, out=np.zeros_like(true_positives), where=denominator != 0
+    )
+    return precision, recall, f1_score
+
+
+def add_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ajout au DataFrame de la matrice de confusion des métriques de precision, recall et f1-score
+    """
+    precision, recall, f1_score = confusion_metrics(df.to_numpy())
+    df["Precision"] = precision
+    df["Recall"] = recall
+    df["f1-score"] = f1_score
+    return df
+
+
+def confusion_dataframe(true_classes, predicted_classes, class_labels) -> pd.DataFrame:
+    """
+    Renvoie la matrice de confusion et les métriques de chaque classe dans un DataFrame.
+    Avec un grand nombre de classes, la matrice n'est pas stockée : seules les métriques le sont.
+    """
+    nb_classes = len(class_labels)
+    if nb_classes >= SPARSE_MIN_CLASSES:
+        matrix = confusion_matrix(true_classes, predicted_classes, nb_classes, sparse_matrix=True)
+        precision, recall, f1_score = confusion_metrics(matrix)
+        return pd.DataFrame(
+            {"Precision": precision, "Recall": recall, "f1-score": f1_score}, index=class_labels
+        )
+    matrix = confusion_matrix(true_classes, predicted_classes, nb_classes)
+    return add_metrics(pd.DataFrame(matrix, index=class_labels, columns=class_labels))
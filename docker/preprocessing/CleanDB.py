@@ -2,15 +2,21 @@ import os
 import random
 import shutil
 import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
-from UnderSampling import UnderSamplerImages
+from UnderSampling import UnderSamplerImages, seeded_order
 from SizeManager import SizeManager
 
 
 class CleanDB:
-    def __init__(self, db_to_clean, treshold=160, random_state=True, test_mode: bool = False):
+    def __init__(self, db_to_clean, treshold=160, random_state=True, test_mode: bool = False, manifest=None,
+                 workers=None, seed=None):
         """
         On initialise les chemins, le seuil, la variable aléatoire ainsi que la possibilité d'activer le mode test.
+        manifest : PreprocessingManifest où enregistrer les étapes terminées (pour reprendre après un arrêt)
+        workers : nombre de processus pour le travail par classe (PREPROCESSING_WORKERS ou nombre de coeurs)
+        seed : graine aléatoire à réutiliser (par défaut 12 si random_state, sinon tirée puis enregistrée)
         """
         # Chemin vers la base de données à nettoyer
         self.db_to_clean_path = db_to_clean
@@ -22,6 +28,28 @@ class CleanDB:
         self.test_mode = test_mode
         # Chemin vers les dossiers fusionnés pour la re répartition des classes
         self.all_file_path = os.path.join(self.db_to_clean_path, "all_files")
+        # Étapes terminées, pour la reprise (optionnel)
+        self.manifest = manifest
+        # Nombre de processus pour le travail par classe
+        self.workers = workers or int(os.getenv("PREPROCESSING_WORKERS", os.cpu_count() or 1))
+        # Graine des tirages aléatoires (sous-échantillonnage et split)
+        self.seed = seed
+
+    def run_per_class(self, function, tasks, desc):
+        """
+        Exécute function(*task) pour chaque classe, en parallèle dans un pool de processus.
+        Les classes sont indépendantes (chacune a ses propres dossiers), l'ordre d'exécution n'a pas d'importance.
+        """
+        tasks = list(tasks)
+        if self.workers <= 1 or len(tasks) <= 1:
+            for task in tqdm(tasks, desc):
+                function(*task)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(function, *task) for task in tasks]
+            for future in tqdm(as_completed(futures), desc, total=len(futures)):
+                # On relance ici l'erreur d'une classe
+                future.result()
 
     def rm_set_dir(self):
         """
@@ -35,26 +63,15 @@ class CleanDB:
             if os.path.isdir(set_dir_path):
                 shutil.rmtree(set_dir_path)
 
-    def manage_unique_set(self, set_dir):
+    def fuse_class(self, bird_name, bird_dirs):
         """
-        Fusionne les sets test, train et valid vers le dossier 'all_files'.
+        Fusionne les dossiers d'une classe (un par set test, train et valid) vers le dossier 'all_files'.
         On renomme les fichiers s'il y a des conflits.
         """
-        if set_dir == "all_files":
-            return
-        complete_set_dir = os.path.join(self.db_to_clean_path, set_dir)
-        # Si le dossier n'existe pas, on stop
-        if not os.path.isdir(complete_set_dir):
-            return
-        # On parcours chaque classe
-        for bird_dir in tqdm(os.listdir(complete_set_dir), desc="Parcours set " + set_dir):
-            # On retire les espaces en trop dans le chemin du dossier
-            new_bird_dir = " ".join(os.path.join(self.all_file_path, bird_dir).split())
-
-            # On créer un dossier pour la classe dans all_files s'il n'existe pas
-            if not os.path.isdir(new_bird_dir):
-                os.mkdir(new_bird_dir)
-            complete_bird_dir = os.path.join(complete_set_dir, bird_dir)
+        new_bird_dir = os.path.join(self.all_file_path, bird_name)
+        # On créer un dossier pour la classe dans all_files s'il n'existe pas
+        os.makedirs(new_bird_dir, exist_ok=True)
+        for complete_bird_dir in bird_dirs:
             # Parcours de chaque image dans la classe
             for file in os.listdir(complete_bird_dir):
                 # Si ce n'est pas une image, on continue
@@ -92,9 +109,19 @@ class CleanDB:
             print("Les dossiers sont déjà fusionnés")
             return
 
-        # Fusion de chaque set
+        # On regroupe les dossiers de chaque classe de tous les sets
+        # (les espaces en trop sont retirés du nom de la classe)
+        bird_dirs = {}
         for set_dir in os.listdir(self.db_to_clean_path):
-            self.manage_unique_set(set_dir)
+            complete_set_dir = os.path.join(self.db_to_clean_path, set_dir)
+            if set_dir == "all_files" or not os.path.isdir(complete_set_dir):
+                continue
+            for bird_dir in os.listdir(complete_set_dir):
+                bird_name = " ".join(bird_dir.split())
+                bird_dirs.setdefault(bird_name, []).append(os.path.join(complete_set_dir, bird_dir))
+
+        # Fusion de chaque classe, en parallèle
+        self.run_per_class(self.fuse_class, bird_dirs.items(), "Fusion des sets")
         # Suppression des dossiers test, train et valid une fois la fusion faite
         self.rm_set_dir()
 
@@ -103,47 +130,29 @@ class CleanDB:
         Split des données entre test et valid, avec un pourcentage donné.
         """
         print("Debut du split pour les set test et valid")
-        # Calcul du nombre de fichiers à déplacer
-        percent_number_of_files = self.calcul_percent_number(percent)
+        train_path = os.path.join(self.db_to_clean_path, "train")
+        # Split déjà terminé (arrêt juste après le renommage)
+        if not os.path.isdir(self.all_file_path) and os.path.isdir(train_path):
+            return
+        # Calcul du nombre de fichiers à déplacer (enregistré : une reprise utilise le même nombre,
+        # calculé avant que des images ne soient déplacées)
+        if self.manifest is not None:
+            percent_number_of_files = self.manifest.get_param(
+                "split_percent_number", lambda: self.calcul_percent_number(percent)
+            )
+        else:
+            percent_number_of_files = self.calcul_percent_number(percent)
 
         # On réalise la répartition
-        self.split_set_class_balancing("test", percent_number_of_files)
-        self.split_set_class_balancing("valid", percent_number_of_files)
+        self.split_set_class_balancing(percent_number_of_files)
         # On renomme le dossier all_files en train
-        os.rename(self.all_file_path, os.path.join(self.db_to_clean_path, "train"))
-
-    def move_one_random_file(self, nb_classes, all_classes, set_path):
-        """
-        Déplace un fichier aléatoire d'une classe choisie au hasard vers un set donné.
-        """
-        # On sélectionne une classe au hasard
-        rand_dir = random.randint(0, nb_classes - 1)
-        # On récupère son nom
-        dir_class_name = all_classes[rand_dir]
-        choosen_class_path = os.path.join(self.all_file_path, dir_class_name)
-
-        # On liste les images de la classe
-        files_class = os.listdir(choosen_class_path)
-        # On choisis une image au hasard
-        rand_file = random.randint(0, len(files_class) - 1)
-        file_name = files_class[rand_file]
-        choosen_file_path = os.path.join(choosen_class_path, file_name)
-        new_class_path = os.path.join(set_path, dir_class_name)
-
-        # On créer le dossier cible s'il n'existe pas
-        if not os.path.isdir(new_class_path):
-            os.mkdir(new_class_path)
-        # On déplace l'image
-        os.rename(choosen_file_path, os.path.join(new_class_path, file_name))
+        os.rename(self.all_file_path, train_path)
 
     def split_set_random_pull(self, set_name, percent=15):
         """
         Répartition aléatoire d'un pourcentage total d'images (par défaut 15%) dans un set.
         Ce split n'est pas équilibré entre les classes.
         """
-        # On choisi un état aléatoire
-        if self.random_state:
-            random.seed(12)
         # Si le nom n'est pas valide, on stop
         if set_name not in ["valid", "test"]:
             print("Erreur de nom de set")
@@ -154,19 +163,25 @@ class CleanDB:
         if not os.path.isdir(set_path):
             os.mkdir(set_path)
 
-        # On récupère le nombre total de fichiers
-        nb_files = sum([len(files) for r, c, files in os.walk(self.all_file_path)])
-        # On liste les classes
-        all_classes = os.listdir(self.all_file_path)
-        # On récupère le nombre de classes
-        nb_classes = len(all_classes)
+        # On liste une seule fois les images de chaque classe, y compris celles déjà déplacées dans le set
+        # (preprocessing repris) : la répartition est calculée sur la liste d'origine
+        all_files = [
+            (classe, file)
+            for path in (self.all_file_path, set_path)
+            for classe in sorted(os.listdir(path))
+            for file in sorted(os.listdir(os.path.join(path, classe)))
+        ]
         # On calcul le nombre d'images à déplacer
         if percent < 100:
-            percent = int((nb_files / 100) * percent)
+            percent = int((len(all_files) / 100) * percent)
 
-        # On déplace aléatoiement des images jusuq'à atteindre le pourcentage voulu
-        for i in tqdm(range(percent), "Split du set " + set_name):
-            self.move_one_random_file(nb_classes, all_classes, all_classes, set_path)
+        # Les images du set sont les premières dans un ordre aléatoire (graine enregistrée)
+        selected = seeded_order([f"{classe}/{file}" for classe, file in all_files], self.get_seed(), set_name)
+        plan = dict()
+        for classe, file in (image.split("/") for image in selected[:percent]):
+            if os.path.exists(os.path.join(self.all_file_path, classe, file)):
+                plan.setdefault(classe, []).append((file, set_name))
+        self.run_per_class(self.apply_class_plan, plan.items(), "Split du set " + set_name)
         return percent
 
     def calcul_percent_number(self, percent):
@@ -182,71 +197,102 @@ class CleanDB:
         percent_number_of_files = int((len(files_class) / 100) * percent)
         return percent_number_of_files
 
-    def extract_percent_from_one_class(self, classe_index, all_classes, set_path, percent):
+    def get_seed(self):
         """
-        Déplace un pourcentage d'images d'une seule classe vers un set donné. Les images sont choisies au hasard.
+        Graine aléatoire du preprocessing (12 si random_state), enregistrée dans le manifeste :
+        un preprocessing repris, ou relancé avec cette graine, fait les mêmes tirages
         """
-        # On récupère le nom de la classe et son chemin
-        dir_class_name = all_classes[classe_index]
-        dir_class_path = os.path.join(self.all_file_path, dir_class_name)
-        # On liste les fichiers de la classe
-        files_class = os.listdir(dir_class_path)
-        # On déplace les images en fonction du pourcentage défini
-        for i in range(percent):
-            # On sélectionne une image au hasard
-            rand_file = random.randint(0, len(files_class) - 1)
-            file_name = files_class[rand_file]
-            choosen_file_path = os.path.join(dir_class_path, file_name)
-            new_class_path = os.path.join(set_path, dir_class_name)
+        if self.seed is None:
+            def new_seed():
+                return 12 if self.random_state else random.randrange(2 ** 32)
+            self.seed = self.manifest.get_param("seed", new_seed) if self.manifest is not None else new_seed()
+            print("Graine aléatoire : ", self.seed)
+        return self.seed
+
+    def plan_class_split(self, dir_class_name, percent):
+        """
+        Plan de répartition d'une classe : les images à déplacer vers test puis valid, (fichier, set).
+        Les images sont prises dans un ordre aléatoire calculé sur toute la classe, y compris les images
+        déjà déplacées avant un arrêt : un preprocessing repris aboutit à la même répartition.
+        """
+        class_paths = {
+            set_name: os.path.join(self.db_to_clean_path, set_name, dir_class_name) for set_name in ("test", "valid")
+        }
+        class_paths["all_files"] = os.path.join(self.all_file_path, dir_class_name)
+        current = {
+            file_name: set_name
+            for set_name, class_path in class_paths.items() if os.path.isdir(class_path)
+            for file_name in os.listdir(class_path)
+        }
+        # Ordre propre à la classe : le plan ne dépend pas de l'ordre de traitement des classes
+        files_class = seeded_order(current, self.get_seed(), dir_class_name)
+        targets = [(file_name, "test") for file_name in files_class[:percent]]
+        targets += [(file_name, "valid") for file_name in files_class[percent:2 * percent]]
+        # Seules les images encore dans all_files sont déplacées
+        return [(file_name, set_name) for file_name, set_name in targets if current[file_name] == "all_files"]
 
+    def apply_class_plan(self, dir_class_name, plan):
+        """
+        Déplace les images d'une classe selon le plan, (fichier, set)
+        """
+        dir_class_path = os.path.join(self.all_file_path, dir_class_name)
+        for set_name in {set_name for _, set_name in plan}:
             # On créer le dossier de destination s'il n'existe pas
-            if not os.path.isdir(new_class_path):
-                os.mkdir(new_class_path)
-            # On déplace le l'image
-            os.rename(choosen_file_path, os.path.join(new_class_path, file_name))
-            # On supprime l'image de la liste
-            del files_class[rand_file]
+            os.makedirs(os.path.join(self.db_to_clean_path, set_name, dir_class_name), exist_ok=True)
+        for file_name, set_name in plan:
+            os.rename(
+                os.path.join(dir_class_path, file_name),
+                os.path.join(self.db_to_clean_path, set_name, dir_class_name, file_name),
+            )
 
-    def split_set_class_balancing(self, set_name, percent):
+    def split_class(self, dir_class_name, percent):
+        self.apply_class_plan(dir_class_name, self.plan_class_split(dir_class_name, percent))
+
+    def split_set_class_balancing(self, percent):
         """
-        Répartition équilibrée de chaque classe dans un set.
-        On déplace un pourcentage d'images pour chaque classe.
+        Répartition équilibrée de chaque classe dans les sets test et valid.
+        On déplace le même nombre d'images de chaque classe vers chaque set.
         """
-        # On fixe l'état aléatoire pour la reproductibilité
-        if self.random_state:
-            random.seed(12)
-        # Si le set n'est pas valide, on s'arrête
-        if set_name not in ["valid", "test"]:
-            print("Erreur de nom de set")
-            return
-        set_path = os.path.join(self.db_to_clean_path, set_name)
-        # On créer le set s'il n'existe pas
-        if not os.path.isdir(set_path):
-            os.mkdir(set_path)
+        # On créer les sets s'ils n'existent pas
+        for set_name in ("test", "valid"):
+            os.makedirs(os.path.join(self.db_to_clean_path, set_name), exist_ok=True)
+        # La graine est fixée avant de répartir le travail entre les processus
+        self.get_seed()
 
-        # On liste toutes les classes
-        all_classes = os.listdir(self.all_file_path)
-        # On récupère le nombre total d'images
-        nb_classes = len(all_classes)
+        # On fait la répartition des images, classe par classe en parallèle
+        tasks = [(classe, percent) for classe in os.listdir(self.all_file_path)]
+        self.run_per_class(self.split_class, tasks, "Split des sets test et valid")
 
-        # On fait la répartition des images
-        for classe_index in tqdm(range(nb_classes), "Split du set " + set_name):
-            self.extract_percent_from_one_class(classe_index, all_classes, set_path, percent)
+    def manage_size(self):
+        """
+        Ajuste la taille des images si nécessaire
+        """
+        # On instancie la classe
+        sizeManager = SizeManager(db_to_clean_path=self.db_to_clean_path, workers=self.workers)
+        sizeManager.manage()
 
     def start_clean(self):
         """
         Démarre la procédure complète de nettoyage du dataset.
+        Avec un manifeste, les étapes déjà terminées (preprocessing interrompu) ne sont pas refaites.
         """
-        # On instancie la classe
-        sizeManager = SizeManager(db_to_clean_path=self.db_to_clean_path)
-        # On ajuste la taille des images si nécessaire
-        sizeManager.manage()
-        # On fusionne les sets
-        self.sets_fusion()
-        # On sous échantillonne les classes si nécessaire
-        self.under_sample()
-        # On crée les sets de train, test et valid
-        self.split_train_test_valid()
+        stages = [
+            # On ajuste la taille des images si nécessaire
+            ("size", self.manage_size),
+            # On fusionne les sets
+            ("fusion", self.sets_fusion),
+            # On sous échantillonne les classes si nécessaire
+            ("under_sample", self.under_sample),
+            # On crée les sets de train, test et valid
+            ("split", self.split_train_test_valid),
+        ]
+        for stage, function in stages:
+            if self.manifest is not None and self.manifest.is_done(stage):
+                logging.info(f"Étape {stage} déjà terminée, on passe à la suivante")
+                continue
+            function()
+            if self.manifest is not None:
+                self.manifest.mark_done(stage)
         # On vérifie les pourcentages pour la répartition
         self.check_percents()
 
@@ -255,13 +301,14 @@ class CleanDB:
         Applique un sous-échantillonnage pour retirer les classes avec un nombre d'images inférieur au seuil défini.
         """
         # On instancie la classe
-        underSampler = UnderSamplerImages(self.db_to_clean_path, treshold=self.treshold)
+        underSampler = UnderSamplerImages(self.db_to_clean_path, treshold=self.treshold, seed=self.get_seed())
         # On vérifie la distribution des classes
         underSampler.check_distribution()
         # On supprime les classes sous représentées
         underSampler.del_under_treshold_classes()
-        # On applique le sous échantillonnage
-        underSampler.under_sample()
+        # On applique le sous échantillonnage, classe par classe en parallèle
+        tasks = [(classe,) for classe in os.listdir(underSampler.all_files_path)]
+        self.run_per_class(underSampler.under_sample_class, tasks, "Sous échantillonnage")
         # On vérifie la distribution
         underSampler.check_distribution()
 
@@ -0,0 +1,214 @@
+import os
+import json
+import random
+import shutil
+import logging
+from CleanDB import CleanDB
+from SizeManager import resize_image, resize_backend
+from RawManifest import RawManifest, IMAGE_SETS
+
+
+class IncrementalCleanDB(CleanDB):
+    """
+    Nettoyage incrémental : dataset_clean est mis à jour à partir du manifeste de dataset_raw au lieu d'être
+    recopié et retraité entièrement. Seules les classes dont les images ont changé sont retraitées
+    (vérification du ratio, redimensionnement, doublons, sous-échantillonnage et split).
+    Les images de dataset_clean sont nommées par le hash de l'image brute : une image déjà répartie garde son set.
+    """
+
+    def __init__(self, db_to_clean, dataset_raw_path, raw_manifest_path, index_path, excluded_classes=(),
+                 treshold=False, percent=15, target_size=(224, 224), random_state=True, workers=None):
+        """
+        raw_manifest_path : manifeste adressé par contenu de dataset_raw
+        index_path : état de dataset_clean (hashes et validité de chaque classe, seuil utilisé)
+        excluded_classes : nouvelles classes à ne pas traiter (trop peu d'images)
+        treshold : nombre d'images par classe (False : nombre d'images de la plus petite classe)
+        """
+        super().__init__(db_to_clean, treshold=treshold, random_state=random_state, workers=workers)
+        self.dataset_raw_path = dataset_raw_path
+        self.raw_manifest_path = raw_manifest_path
+        self.index_path = index_path
+        self.excluded_classes = list(excluded_classes)
+        self.percent = percent
+        self.target_size = tuple(target_size)
+        self.backend = resize_backend()
+
+    def params(self):
+        """
+        Paramètres du nettoyage : s'ils changent, dataset_clean est reconstruit entièrement
+        """
+        return {
+            "treshold": self.treshold,
+            "percent": self.percent,
+            "target_size": list(self.target_size),
+            "random_state": self.random_state,
+        }
+
+    def load_index(self):
+        """
+        Charge l'état de dataset_clean (None s'il n'existe pas ou ne correspond plus à dataset_clean)
+        """
+        if not os.path.isfile(self.index_path):
+            return None
+        with open(self.index_path, "r") as file:
+            index = json.load(file)
+        if index.get("params") != self.params():
+            return None
+        # dataset_clean a été vidé ou remplacé depuis
+        if index["classes"] and not all(
+            os.path.isdir(os.path.join(self.db_to_clean_path, set_name)) for set_name in IMAGE_SETS
+        ):
+            return None
+        return index
+
+    def save_index(self, index):
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(index, file)
+        os.replace(temp_path, self.index_path)
+
+    def check_class_ratio(self, images):
+        """
+        Même règle que SizeManager : une classe dont moins de 80% des images à redimensionner
+        ont un ratio proche de 1:1 n'est pas exploitable
+        """
+        ratios_ok = [
+            1 - height / width < 0.2
+            for _, width, height in images.values()
+            if (width, height) != self.target_size
+        ]
+        if not ratios_ok:
+            return True
+        return sum(ratios_ok) / len(ratios_ok) >= 0.8
+
+    def remove_class(self, class_name):
+        for set_name in IMAGE_SETS:
+            shutil.rmtree(os.path.join(self.db_to_clean_path, set_name, class_name), ignore_errors=True)
+
+    def write_image(self, raw_path, destination):
+        """
+        Copie une image brute dans dataset_clean, redimensionnée si nécessaire.
+        Le fichier est écrit à côté puis renommé : une image présente est toujours complète.
+        """
+        temp_destination = destination + ".tmp"
+        # Une image déjà à la bonne taille est simplement copiée
+        resize_image(raw_path, self.target_size, temp_destination, format="JPEG", backend=self.backend)
+        os.replace(temp_destination, destination)
+
+    def update_class(self, class_name, images, treshold, percent_number):
+        """
+        Met à jour une classe de dataset_clean : les images retirées de dataset_raw sont supprimées,
+        les images déjà réparties restent dans leur set et les nouvelles complètent les sets
+        (test et valid : percent_number images, train : le reste jusqu'au seuil). Les images en trop
+        sont écartées (sous-échantillonnage).
+        """
+        # On fixe l'état aléatoire de la classe pour la reproductibilité
+        rand = random.Random(f"{self.get_seed()}-{class_name}")
+        # Images déjà réparties, retrouvées par leur nom (hash de l'image brute)
+        current = dict()
+        for set_name in IMAGE_SETS:
+            class_path = os.path.join(self.db_to_clean_path, set_name, class_name)
+            os.makedirs(class_path, exist_ok=True)
+            for file in os.listdir(class_path):
+                image_hash, extension = os.path.splitext(file)
+                # Image supprimée de dataset_raw ou écriture interrompue
+                if image_hash not in images or extension != ".jpg":
+                    os.remove(os.path.join(class_path, file))
+                    continue
+                current[image_hash] = set_name
+
+        targets = {"test": percent_number, "valid": percent_number, "train": treshold - 2 * percent_number}
+        # Nouvelles images, dans un ordre aléatoire
+        candidates = sorted(image_hash for image_hash in images if image_hash not in current)
+        rand.shuffle(candidates)
+        members = dict()
+        for set_name in IMAGE_SETS:
+            members[set_name] = sorted(image_hash for image_hash in current if current[image_hash] == set_name)
+            rand.shuffle(members[set_name])
+            # L'excédent d'un set (seuil diminué) est réparti en priorité, avant les nouvelles images
+            candidates = members[set_name][targets[set_name]:] + candidates
+            members[set_name] = members[set_name][:targets[set_name]]
+
+        for set_name in ("test", "valid", "train"):
+            needed = max(0, targets[set_name] - len(members[set_name]))
+            for image_hash in candidates[:needed]:
+                destination = os.path.join(self.db_to_clean_path, set_name, class_name, image_hash + ".jpg")
+                if image_hash in current:
+                    # Image déplacée depuis un autre set
+                    os.rename(
+                        os.path.join(self.db_to_clean_path, current[image_hash], class_name, image_hash + ".jpg"),
+                        destination,
+                    )
+                else:
+                    raw_path = images[image_hash][0]
+                    self.write_image(os.path.join(self.dataset_raw_path, raw_path), destination)
+            candidates = candidates[needed:]
+
+        # Images écartées par le sous-échantillonnage
+        for image_hash in candidates:
+            if image_hash in current:
+                os.remove(os.path.join(self.db_to_clean_path, current[image_hash], class_name, image_hash + ".jpg"))
+
+    def start_clean(self):
+        """
+        Met à jour dataset_clean à partir des changements de dataset_raw.
+        """
+        # Les hashes ne sont recalculés que pour les fichiers modifiés
+        raw_manifest = RawManifest(self.dataset_raw_path, self.raw_manifest_path)
+        updated = raw_manifest.scan()
+        raw_manifest.save()
+        print("Image(s) nouvelle(s) ou modifiée(s) dans dataset_raw : ", updated)
+        classes = raw_manifest.classes(self.excluded_classes)
+
+        index = self.load_index()
+        if index is None:
+            print("Aucun état valide pour dataset_clean : reconstruction complète")
+            shutil.rmtree(self.db_to_clean_path)
+            os.makedirs(self.db_to_clean_path)
+            index = {"classes": {}, "treshold": None}
+        previous = index["classes"]
+
+        # Classes dont les images ont changé (ajout, suppression ou modification)
+        changed = [name for name in classes if sorted(classes[name]) != previous.get(name, {}).get("hashes")]
+        # Le ratio des images n'est vérifié que pour les classes modifiées
+        usable = {name: previous[name]["usable"] for name in classes if name not in changed}
+        for name in changed:
+            usable[name] = self.check_class_ratio(classes[name])
+        usable_classes = [name for name in classes if usable[name]]
+
+        if not self.treshold and not usable_classes:
+            # Sans classe exploitable, le seuil ne peut pas être calculé : dataset_clean est vidé
+            logging.warning("Aucune classe exploitable dans dataset_raw, dataset_clean ne contient aucune classe")
+            for name in set(previous) | set(classes):
+                self.remove_class(name)
+            self.save_index({
+                "params": self.params(),
+                "treshold": None,
+                "classes": {name: {"hashes": sorted(classes[name]), "usable": usable[name]} for name in classes},
+            })
+            return
+        treshold = self.treshold or min(len(classes[name]) for name in usable_classes)
+        # Si le seuil change, toutes les classes sont sous-échantillonnées à nouveau
+        if treshold != index["treshold"]:
+            changed = list(classes)
+        percent_number = int((treshold / 100) * self.percent)
+
+        # Classes supprimées de dataset_raw, non exploitables ou sous le seuil
+        removed = [name for name in previous if name not in classes]
+        removed += [name for name in classes if not usable[name] or len(classes[name]) < treshold]
+        for name in removed:
+            self.remove_class(name)
+
+        tasks = [(name, classes[name], treshold, percent_number) for name in changed if name not in removed]
+        # La graine est fixée avant de répartir le travail entre les processus
+        self.get_seed()
+        self.run_per_class(self.update_class, tasks, "Mise à jour des classes")
+        print("Classe(s) mise(s) à jour : ", len(tasks), " - Classe(s) retirée(s) : ", len(removed))
+
+        self.save_index({
+            "params": self.params(),
+            "treshold": treshold,
+            "classes": {name: {"hashes": sorted(classes[name]), "usable": usable[name]} for name in classes},
+        })
+        # On vérifie les pourcentages pour la répartition
+        self.check_percents()
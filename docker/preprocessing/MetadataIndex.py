@@ -0,0 +1,105 @@
+import os
+import sqlite3
+import logging
+from contextlib import contextmanager
+import pandas as pd
+from PIL import Image
+
+
+class MetadataIndex:
+    """
+    Index des métadonnées des images du dataset (set, classe, fichier, hauteur, largeur, format, mode),
+    enregistré dans une base SQLite à côté du dataset. À chaque mise à jour, seules les images nouvelles
+    ou modifiées (taille ou date de modification différentes) sont relues ; les images disparues sont retirées.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with self.connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS images (
+                    set_name TEXT NOT NULL,
+                    bird_name TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    file_size INTEGER NOT NULL,
+                    mtime INTEGER NOT NULL,
+                    height INTEGER,
+                    width INTEGER,
+                    format TEXT,
+                    mode TEXT,
+                    PRIMARY KEY (set_name, bird_name, filename)
+                )
+                """
+            )
+
+    @contextmanager
+    def connect(self):
+        """
+        Connexion fermée à la sortie du bloc, la transaction est validée à la fin (annulée en cas d'erreur)
+        """
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def probe(image_path):
+        """
+        Dimensions, format et mode d'une image (seul l'en-tête est lu)
+        """
+        try:
+            with Image.open(image_path) as image:
+                return image.height, image.width, image.format, image.mode
+        except Exception as e:
+            logging.warning(f"Image illisible {image_path} : {e}")
+            return None, None, None, None
+
+    def update(self, dataset_path):
+        """
+        Met à jour l'index avec le contenu actuel de dataset_path (un dossier par set, puis par classe).
+        Renvoie le nombre d'images relues et le nombre d'images retirées.
+        """
+        with self.connect() as connection:
+            stored = {
+                (set_name, bird_name, filename): (file_size, mtime)
+                for set_name, bird_name, filename, file_size, mtime in connection.execute(
+                    "SELECT set_name, bird_name, filename, file_size, mtime FROM images"
+                )
+            }
+            seen = set()
+            rows = []
+            for set_name in os.listdir(dataset_path):
+                set_path = os.path.join(dataset_path, set_name)
+                if not os.path.isdir(set_path):
+                    continue
+                for bird_name in os.listdir(set_path):
+                    bird_path = os.path.join(set_path, bird_name)
+                    if not os.path.isdir(bird_path):
+                        continue
+                    for filename in os.listdir(bird_path):
+                        key = (set_name, bird_name, filename)
+                        seen.add(key)
+                        image_path = os.path.join(bird_path, filename)
+                        stat = os.stat(image_path)
+                        if stored.get(key) != (stat.st_size, stat.st_mtime_ns):
+                            rows.append((*key, stat.st_size, stat.st_mtime_ns, *self.probe(image_path)))
+            connection.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            removed = [key for key in stored if key not in seen]
+            connection.executemany(
+                "DELETE FROM images WHERE set_name = ? AND bird_name = ? AND filename = ?", removed
+            )
+        return len(rows), len(removed)
+
+    def dataframe(self):
+        """
+        Métadonnées de toutes les images lisibles, avec la hauteur et la largeur en colonnes numériques
+        """
+        with self.connect() as connection:
+            return pd.read_sql_query(
+                'SELECT set_name AS "set", bird_name AS birdName, filename, height, width, format, mode '
+                "FROM images WHERE height IS NOT NULL",
+                connection,
+            )
@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import hashlib
+
+
+def dataset_signature(dataset_path, excluded_classes=()):
+    """
+    Empreinte rapide d'un dataset (set/classe et nombre d'images) et des classes exclues :
+    elle change dès que des images ou des classes sont ajoutées ou supprimées
+    """
+    digest = hashlib.sha1()
+    for set_name in sorted(os.listdir(dataset_path)):
+        set_path = os.path.join(dataset_path, set_name)
+        if not os.path.isdir(set_path):
+            continue
+        for class_name in sorted(os.listdir(set_path)):
+            class_path = os.path.join(set_path, class_name)
+            if os.path.isdir(class_path):
+                digest.update(f"{set_name}/{class_name}:{len(os.listdir(class_path))};".encode())
+    digest.update(("excluded:" + ",".join(sorted(excluded_classes))).encode())
+    return digest.hexdigest()
+
+
+class PreprocessingManifest:
+    """
+    Manifeste d'un preprocessing : les étapes terminées et leurs paramètres, enregistrés au fil de l'eau.
+    Après un arrêt brutal, un preprocessing sur les mêmes données (même empreinte) reprend
+    après la dernière étape terminée au lieu de tout recommencer.
+    """
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.signature = signature
+        self.data = {"signature": signature, "completed": [], "params": {}, "finished": False}
+        if os.path.isfile(path):
+            with open(path, "r") as file:
+                previous = json.load(file)
+            # On ne reprend qu'un preprocessing interrompu, sur les mêmes données
+            if previous.get("signature") == signature and not previous.get("finished"):
+                self.data = previous
+
+    @property
+    def resuming(self):
+        return bool(self.data["completed"])
+
+    def is_done(self, stage):
+        return stage in self.data["completed"]
+
+    def mark_done(self, stage):
+        self.data["completed"].append(stage)
+        self.save()
+
+    def get_param(self, name, compute):
+        """
+        Renvoie un paramètre de l'étape en cours, calculé et enregistré au premier appel
+        (une étape reprise utilise les mêmes valeurs qu'avant l'arrêt)
+        """
+        if name not in self.data["params"]:
+            self.data["params"][name] = compute()
+            self.save()
+        return self.data["params"][name]
+
+    def finish(self):
+        self.data["finished"] = True
+        self.save()
+
+    def save(self):
+        self.data["updated_at"] = time.time()
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(self.data, file, indent=4)
+        os.replace(temp_path, self.path)
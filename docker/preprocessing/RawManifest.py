@@ -0,0 +1,105 @@
+import os
+import json
+import hashlib
+import logging
+from PIL import Image
+
+# Sets d'images du dataset
+IMAGE_SETS = ("train", "test", "valid")
+
+
+def file_hash(path):
+    """
+    Empreinte (sha1) du contenu d'un fichier
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RawManifest:
+    """
+    Manifeste de dataset_raw adressé par contenu : pour chaque image, sa taille, sa date de modification,
+    le hash de son contenu et ses dimensions. Le hash et les dimensions ne sont recalculés que pour
+    les fichiers dont la taille ou la date de modification ont changé.
+    """
+
+    def __init__(self, dataset_path, path):
+        self.dataset_path = dataset_path
+        self.path = path
+        # Chemin relatif de l'image -> {"size", "mtime", "hash", "width", "height"}
+        self.files = {}
+        if os.path.isfile(path):
+            with open(path, "r") as file:
+                self.files = json.load(file)["files"]
+
+    @staticmethod
+    def describe(image_path, stat):
+        """
+        Hash et dimensions d'une image (seul l'en-tête est lu pour les dimensions)
+        """
+        try:
+            with Image.open(image_path) as image:
+                width, height = image.size
+        except Exception as e:
+            logging.warning(f"Image illisible {image_path} : {e}")
+            width, height = None, None
+        return {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "hash": file_hash(image_path),
+            "width": width,
+            "height": height,
+        }
+
+    def scan(self):
+        """
+        Met à jour le manifeste avec le contenu actuel de dataset_raw.
+        Renvoie le nombre d'images nouvelles ou modifiées.
+        """
+        files = dict()
+        updated = 0
+        for set_name in IMAGE_SETS:
+            set_path = os.path.join(self.dataset_path, set_name)
+            if not os.path.isdir(set_path):
+                continue
+            for class_name in os.listdir(set_path):
+                class_path = os.path.join(set_path, class_name)
+                if not os.path.isdir(class_path):
+                    continue
+                for file in os.listdir(class_path):
+                    image_path = os.path.join(class_path, file)
+                    relative_path = "/".join((set_name, class_name, file))
+                    stat = os.stat(image_path)
+                    entry = self.files.get(relative_path)
+                    # Fichier inchangé : on garde son hash
+                    if entry is None or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns:
+                        entry = self.describe(image_path, stat)
+                        updated += 1
+                    files[relative_path] = entry
+        self.files = files
+        return updated
+
+    def classes(self, excluded_classes=()):
+        """
+        Regroupe les images par classe, tous sets confondus (les espaces en trop sont retirés du nom) :
+        {classe: {hash: (chemin relatif, largeur, hauteur)}}. Les doublons d'une classe n'apparaissent qu'une fois.
+        Les classes exclues (nouvelles classes pas encore retenues) sont ignorées dans train.
+        """
+        classes = dict()
+        for relative_path in sorted(self.files):
+            entry = self.files[relative_path]
+            set_name, class_name, _ = relative_path.split("/")
+            if entry["width"] is None or (set_name == "train" and class_name in excluded_classes):
+                continue
+            images = classes.setdefault(" ".join(class_name.split()), dict())
+            images.setdefault(entry["hash"], (relative_path, entry["width"], entry["height"]))
+        return classes
+
+    def save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"files": self.files}, file)
+        os.replace(temp_path, self.path)
@@ -1,181 +1,183 @@
-import pandas as pd
-import shutil
-import os
-import csv
-from tqdm import tqdm
-from PIL import Image
-import numpy as np
-
-
-class SizeManager:
-    """
-    Cette classe `SizeManager` gère le redimensionnement et le nettoyage du dataset.
-    On génère un CSV avec les métadonnées des images, supprime certaines classes et
-    redimensionne les images en 224x224px.
-    """
-    def __init__(self, db_to_clean_path, target_size=(224, 224)):
-        # On définit les chemins et la taille cible
-        self.db_to_clean_path = db_to_clean_path
-        self.target_size = target_size
-        # Liste pour stocker les classes à supprimer plus tard
-        self.classes_to_del_list = list()
-
-    def getImagesInfos(self, imagePath):
-        """
-        Permet de récupérer les métadonnées d'une image
-        """
-        image = Image.open(imagePath)
-        info_dict = {
-            "Filename": image.filename,
-            "Size": image.size,
-            "Height": image.height,
-            "Width": image.width,
-            "Format": image.format,
-            "Mode": image.mode,
-        }
-        return info_dict
-
-    def get_one_bird_infos(self, birdName, fullSetPath, setPath, writer):
-        """
-        # Récupère et inscrit dans le CSV les infos pour un oiseau
-        """
-        bird_path = os.path.join(fullSetPath, birdName)
-        # On supprime les espaces et on corrige le chemin
-        new_bird_path = " ".join(bird_path.split())
-        shutil.move(bird_path, new_bird_path)
-        bird_path = new_bird_path
-        # On liste les images de l'oiseau
-        birdImagesList = os.listdir(bird_path)
-        for file in birdImagesList:
-            # On supprime les espaces
-            birdName = " ".join(birdName.split())
-            # On récupère les infos de l'image
-            infos = self.getImagesInfos(os.path.join(bird_path, file))
-            # On écrit ces infos dans le CSV
-            writer.writerow(
-                [
-                    setPath,
-                    birdName,
-                    file,
-                    infos["Size"],
-                    infos["Height"],
-                    infos["Width"],
-                    infos["Format"],
-                    infos["Mode"],
-                ]
-            )
-
-    def generate_metadata_csv(self, filename):
-        """
-        Génère un CSV avec les métadonnées des images dans les différents sets (train, test, valid)
-        """
-        print("Génération du csv de référence")
-        with open(filename, "w", newline="") as f:
-            writer = csv.writer(f, delimiter=",")
-            # On ajoute les colonnes au CSV
-            writer.writerow(["set", "birdName", "filename", "size", "height", "width", "format", "mode"])
-            # On parcourt les différents dossiers du dataset
-            for setPath in os.listdir(self.db_to_clean_path):
-                fullSetPath = os.path.join(self.db_to_clean_path, setPath)
-                # Si c'est un fichier, on passe
-                if os.path.isfile(fullSetPath):
-                    continue
-                if os.path.isfile(fullSetPath):
-                    os.remove(fullSetPath)
-                for birdName in tqdm(os.listdir(fullSetPath), "Generation csv : " + fullSetPath):
-                    # Pour chaque oiseau dans le dataset, on récupère les infos des images
-                    self.get_one_bird_infos(birdName, fullSetPath, setPath, writer)
-        return filename
-
-    def get_df_csv(self):
-        """
-        On charge le CSV si déjà existant, sinon on le génère
-        """
-        filename = self.db_to_clean_path + ".csv"
-        if not os.path.isfile(filename):
-            return self.generate_metadata_csv(filename)
-        return filename
-
-    def check_images_size(self, df):
-        """
-        Vérifie si les images sont à la bonne taille et identifie les classes à supprimer
-        """
-        # On filtre les images qui n'ont pas la taille souhaitée
-        df_to_resize = df[df["size"] != str(self.target_size)]
-        # On passe sur chaque oiseau
-        for birdName in df_to_resize["birdName"].unique():
-            df_birdName = df_to_resize[df_to_resize["birdName"] == birdName]
-            # Ajout d'une colonne avec le ratio True or False pour savoir
-            # si le ratio est proche de 1:1
-            df_birdName["ratio_size"] = np.abs(df_birdName["height"] / df_birdName["width"])
-            df_birdName["ratio_size_close_to_1"] = 1 - df_birdName["ratio_size"] < 0.2
-
-            # On compte combien d'images sont proches d'un ratio 1:1
-            nb_true = df_birdName['ratio_size_close_to_1'].values.sum()
-            nb_false = (~df_birdName['ratio_size_close_to_1']).values.sum()
-            total_images = nb_false + nb_true
-
-            # Si moins de 80% des images ont un bon ratio, on ajoute cette classe à supprimer
-            if nb_true / total_images < 0.8:
-                print("Classe à supprimer : ", birdName)
-                self.classes_to_del_list.append(birdName)
-            else:
-                # Sinon, on redimensionnera les images
-                print("Classe à redimensionner : ", birdName)
-
-    def resize_images(self, df):
-        """
-        Redimensionne les images qui ne sont pas à la bonne taille
-        """
-
-        print("Début du redimensionnement vers la dimension : ", str(self.target_size))
-        # On filtre les images qui ne sont pas 224x224
-        df_to_resize = df[df["size"] != str((224, 224))]
-        count = 0
-        # On passe sur chaque image à redimensionner
-        for set_name, birdname, filename in zip(
-            df_to_resize["set"], df_to_resize["birdName"], df_to_resize["filename"]
-        ):
-
-            img_path = os.path.join(self.db_to_clean_path, set_name, birdname, filename)
-            # Si le fichier n'existe pas, on passe
-            if not os.path.isfile(img_path):
-                continue
-            # On ouvre l'image
-            img = Image.open(img_path)
-            # On la redimensionne
-            img_resize = img.resize(self.target_size)
-            # On sauvegarde l'image redimensionnée
-            img_resize_path = os.path.join(self.db_to_clean_path, set_name, birdname, filename)
-            img_resize.save(img_resize_path)
-        print("Image(s) redimensionnée(s) : ", count)
-
-    def del_classes(self, df):
-        """
-        Supprime les classes d'oiseaux non exploitables
-        """
-
-        print("Début de la suppression des classes non exploitables")
-        # On vérifie d'abord les tailles des images
-        self.check_images_size(df)
-        # On filtre les classes à supprimer
-        df_to_delete = df[df["birdName"].isin(self.classes_to_del_list)]
-        # On parcours les classes à supprimer
-        for dir in os.listdir(self.db_to_clean_path):
-            for birdName in df_to_delete["birdName"].unique():
-                pathToDel = os.path.join(self.db_to_clean_path, dir, birdName)
-                print("Suppression : ", pathToDel)
-                # Si c'est un dossier, on supprime
-                if os.path.isdir(pathToDel):
-                    shutil.rmtree(pathToDel)
-
-    def manage(self):
-        """
-        Fonction principale qui gère tout le processus
-        """
-        # On charge le CSV
-        df = pd.read_csv(os.path.join(self.get_df_csv()))
-        # On commence par la suppression des classes
-        self.del_classes(df)
-        # On redimensionne ensuite les images
-        self.resize_images(df)
+import shutil
+import os
+import logging
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+import PIL
+from PIL import Image
+import numpy as np
+from MetadataIndex import MetadataIndex
+
+
+def resize_backend(name=None):
+    """
+    Backend de redimensionnement : "pillow" par défaut (accéléré automatiquement si pillow-simd,
+    qui remplace Pillow avec le même import, est installé) ou "opencv" (RESIZE_BACKEND) s'il est installé
+    """
+    name = name or os.getenv("RESIZE_BACKEND", "pillow")
+    if name == "opencv":
+        try:
+            import cv2  # noqa: F401
+            return "opencv"
+        except ImportError:
+            logging.warning("OpenCV n'est pas installé, redimensionnement avec Pillow")
+    return "pillow"
+
+
+def is_pillow_simd():
+    # pillow-simd publie ses versions sous la forme x.y.z.postN
+    return ".post" in PIL.__version__
+
+
+def resize_image(image_path, target_size, destination=None, format=None, backend="pillow"):
+    """
+    Redimensionne une image vers target_size (dans destination, sinon à la place de l'image).
+    Un JPEG est décodé directement à échelle réduite (mode draft : 1/2, 1/4 ou 1/8) en gardant au moins
+    deux fois la taille cible, puis redimensionné. Renvoie False si l'image avait déjà la bonne taille.
+    """
+    target_size = tuple(target_size)
+    destination = destination or image_path
+    # Seul l'en-tête est lu à l'ouverture : la taille est connue sans décoder l'image
+    with Image.open(image_path) as image:
+        if image.size == target_size:
+            if destination != image_path:
+                shutil.copyfile(image_path, destination)
+            return False
+        image.draft(image.mode, (target_size[0] * 2, target_size[1] * 2))
+        if backend == "opencv":
+            import cv2
+            array = cv2.resize(np.asarray(image.convert("RGB")), target_size, interpolation=cv2.INTER_AREA)
+            image_resize = Image.fromarray(array)
+        else:
+            image_resize = image.resize(target_size)
+    if format == "JPEG" and image_resize.mode not in ("RGB", "L"):
+        image_resize = image_resize.convert("RGB")
+    image_resize.save(destination, format=format)
+    return True
+
+
+class SizeManager:
+    """
+    Cette classe `SizeManager` gère le redimensionnement et le nettoyage du dataset.
+    On met à jour l'index des métadonnées des images, supprime certaines classes et
+    redimensionne les images en 224x224px.
+    """
+    def __init__(self, db_to_clean_path, target_size=(224, 224), workers=None):
+        # On définit les chemins et la taille cible
+        self.db_to_clean_path = db_to_clean_path
+        self.target_size = target_size
+        # Nombre de processus pour le redimensionnement et backend utilisé
+        self.workers = workers or int(os.getenv("PREPROCESSING_WORKERS", os.cpu_count() or 1))
+        self.backend = resize_backend()
+        # Liste pour stocker les classes à supprimer plus tard
+        self.classes_to_del_list = list()
+
+    def normalize_bird_names(self):
+        """
+        Retire les espaces en trop dans le nom des dossiers des oiseaux
+        """
+        for setPath in os.listdir(self.db_to_clean_path):
+            fullSetPath = os.path.join(self.db_to_clean_path, setPath)
+            # Si c'est un fichier, on passe
+            if not os.path.isdir(fullSetPath):
+                continue
+            for birdName in os.listdir(fullSetPath):
+                new_bird_name = " ".join(birdName.split())
+                if new_bird_name != birdName:
+                    shutil.move(os.path.join(fullSetPath, birdName), os.path.join(fullSetPath, new_bird_name))
+
+    def get_metadata(self):
+        """
+        Met à jour l'index des métadonnées (seules les images nouvelles ou modifiées sont relues)
+        et renvoie les métadonnées de toutes les images
+        """
+        self.normalize_bird_names()
+        metadata_index = MetadataIndex(self.db_to_clean_path + "_metadata.db")
+        updated, removed = metadata_index.update(self.db_to_clean_path)
+        print("Index des métadonnées : ", updated, " image(s) relue(s), ", removed, " retirée(s)")
+        return metadata_index.dataframe()
+
+    def off_size(self, df):
+        """
+        Images qui n'ont pas la taille souhaitée
+        """
+        return df[(df["width"] != self.target_size[0]) | (df["height"] != self.target_size[1])]
+
+    def check_images_size(self, df):
+        """
+        Vérifie si les images sont à la bonne taille et identifie les classes à supprimer
+        """
+        # On filtre les images qui n'ont pas la taille souhaitée
+        df_to_resize = self.off_size(df)
+        # Pour chaque image, le ratio est-il proche de 1:1 ?
+        ratio_size_close_to_1 = 1 - np.abs(df_to_resize["height"] / df_to_resize["width"]) < 0.2
+        # Part des images proches d'un ratio 1:1, pour chaque oiseau
+        share_close_to_1 = ratio_size_close_to_1.groupby(df_to_resize["birdName"]).mean()
+
+        # Si moins de 80% des images ont un bon ratio, on ajoute cette classe à supprimer
+        to_delete = share_close_to_1[share_close_to_1 < 0.8].index.tolist()
+        for birdName in to_delete:
+            print("Classe à supprimer : ", birdName)
+        self.classes_to_del_list.extend(to_delete)
+        # Sinon, on redimensionnera les images
+        print("Classe(s) à redimensionner : ", len(share_close_to_1) - len(to_delete))
+
+    def resize_images(self, df):
+        """
+        Redimensionne les images qui ne sont pas à la bonne taille
+        """
+
+        print("Début du redimensionnement vers la dimension : ", str(self.target_size))
+        if self.backend == "pillow" and is_pillow_simd():
+            print("Redimensionnement avec pillow-simd")
+        # On filtre les images qui ne sont pas à la taille cible (taille lue dans l'index)
+        df_to_resize = self.off_size(df)
+        img_paths = [
+            os.path.join(self.db_to_clean_path, set_name, birdname, filename)
+            for set_name, birdname, filename in zip(
+                df_to_resize["set"], df_to_resize["birdName"], df_to_resize["filename"]
+            )
+        ]
+        # Si le fichier n'existe pas (classe supprimée), on passe
+        img_paths = [img_path for img_path in img_paths if os.path.isfile(img_path)]
+        # Les images déjà redimensionnées (preprocessing repris) sont ignorées par resize_image
+        args = (img_paths, repeat(self.target_size), repeat(None), repeat(None), repeat(self.backend))
+        if self.workers <= 1:
+            resized = map(resize_image, *args)
+            count = sum(tqdm(resized, "Redimensionnement", total=len(img_paths)))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                resized = pool.map(resize_image, *args, chunksize=32)
+                count = sum(tqdm(resized, "Redimensionnement", total=len(img_paths)))
+        print("Image(s) redimensionnée(s) : ", count)
+
+    def del_classes(self, df):
+        """
+        Supprime les classes d'oiseaux non exploitables
+        """
+
+        print("Début de la suppression des classes non exploitables")
+        # On vérifie d'abord les tailles des images
+        self.check_images_size(df)
+        # On filtre les classes à supprimer
+        df_to_delete = df[df["birdName"].isin(self.classes_to_del_list)]
+        # On parcours les classes à supprimer
+        for dir in os.listdir(self.db_to_clean_path):
+            for birdName in df_to_delete["birdName"].unique():
+                pathToDel = os.path.join(self.db_to_clean_path, dir, birdName)
+                print("Suppression : ", pathToDel)
+                # Si c'est un dossier, on supprime
+                if os.path.isdir(pathToDel):
+                    shutil.rmtree(pathToDel)
+
+    def manage(self):
+        """
+        Fonction principale qui gère tout le processus
+        """
+        # On charge les métadonnées
+        df = self.get_metadata()
+        # On commence par la suppression des classes
+        self.del_classes(df)
+        # On redimensionne ensuite les images
+        self.resize_images(df)
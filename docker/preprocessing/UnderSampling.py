@@ -2,6 +2,21 @@ import os
 import sys
 import random
 import shutil
+import hashlib
+
+
+def seeded_order(files, seed, name):
+    """
+    Ordre aléatoire reproductible des fichiers d'une classe (ou d'un set) : chaque fichier reçoit une clé
+    tirée de la graine, du nom de la classe et de son nom. L'ordre de deux fichiers ne dépend pas des autres,
+    un traitement repris après le déplacement ou la suppression d'une partie des fichiers garde donc le même
+    ordre pour les fichiers restants. Sans graine, l'ordre n'est pas reproductible.
+    """
+    if seed is None:
+        files = list(files)
+        random.shuffle(files)
+        return files
+    return sorted(files, key=lambda file: hashlib.sha1(f"{seed}-{name}-{file}".encode()).hexdigest())
 
 
 class UnderSamplerImages:
@@ -11,8 +26,11 @@ class UnderSamplerImages:
     en supprimant les images en trop. Si à l'inverse une classe a trop
     peu d'images, on la supprime.
     """
-    def __init__(self, root_dir, treshold=False):
+    def __init__(self, root_dir, treshold=False, seed=None):
         self.root_dir = root_dir
+        # Graine des tirages (None : tirages non reproductibles)
+        self.seed = seed
+        self.all_files_path = os.path.join(root_dir, "all_files")
         # Si aucun seuil n'est défini, on récupère le nombre d'images de la classe la plus petite
         if treshold is False:
             self.treshold = self.get_min_size()
@@ -40,19 +58,22 @@ class UnderSamplerImages:
         """
         On réduit le nombre d'images par classe si elles dépassent le seuil défini
         """
-        all_files_path = os.path.join(self.root_dir, "all_files")
         # On parcours chaque classe
-        for classe in os.listdir(all_files_path):
-            classe_path = os.path.join(all_files_path, classe)
-            files = os.listdir(classe_path)
-            # Tant qu'une classe a plus d'images que le seuil, on en supprime
-            while len(files) > self.treshold:
-                # On choisit une image au hasard
-                index_to_del = random.randint(0, len(files) - 1)
-                # On supprime l'image
-                os.remove(os.path.join(classe_path, files[index_to_del]))
-                # On met à jour la liste
-                del files[index_to_del]
+        for classe in os.listdir(self.all_files_path):
+            self.under_sample_class(classe)
+
+    def under_sample_class(self, classe):
+        """
+        On réduit le nombre d'images d'une classe si elle dépasse le seuil défini
+        (les classes sont indépendantes, elles peuvent être traitées en parallèle)
+        """
+        classe_path = os.path.join(self.all_files_path, classe)
+        files = os.listdir(classe_path)
+        # Si une classe a plus d'images que le seuil, on garde les premières dans un ordre aléatoire
+        # (une reprise après un arrêt garde les mêmes images)
+        if len(files) > self.treshold:
+            for file in seeded_order(files, self.seed, classe)[self.treshold:]:
+                os.remove(os.path.join(classe_path, file))
 
     def del_under_treshold_classes(self):
         """
@@ -7,13 +7,24 @@ from datetime import datetime
 import json
 import schedule
 from CleanDB import CleanDB
+from IncrementalCleanDB import IncrementalCleanDB
 from DatasetCorrection import DatasetCorrection
 from alert_system import AlertSystem
+from image_shards import write_shards
+from PreprocessingManifest import PreprocessingManifest, dataset_signature
 
 # On créer les différents chemins
 volume_path = "volume_data"
 dataset_raw_path = os.path.join(volume_path, "dataset_raw")
 dataset_clean_path = os.path.join(volume_path, "dataset_clean")
+dataset_shards_path = os.path.join(volume_path, "dataset_shards")
+# Étapes terminées du preprocessing en cours (hors de dataset_clean, qui est supprimé au début)
+manifest_path = os.path.join(volume_path, "dataset_clean_manifest.json")
+# Manifeste adressé par contenu de dataset_raw et état de dataset_clean (preprocessing incrémental)
+raw_manifest_path = os.path.join(volume_path, "dataset_raw_manifest.json")
+clean_index_path = os.path.join(volume_path, "dataset_clean_index.json")
+# Preprocessing incrémental (seules les classes modifiées sont retraitées) ou complet (copie de dataset_raw)
+incremental_preprocessing = os.getenv("PREPROCESSING_INCREMENTAL", "1") == "1"
 dataset_version_path = os.path.join(dataset_raw_path, "dataset_version.json")
 classes_tracking_path = os.path.join(dataset_raw_path, "classes_tracking.json")
 state_folder = os.path.join(volume_path, "containers_state")
@@ -86,35 +97,77 @@ def start_cleaning(new_classes_to_track=[]):
     with open(state_path, "w") as file:
         file.write("1")
 
-    # On instancie la classe qui s'occupe de tout le nettoyage (code créé dans un autre projet)
-    cleanDB = CleanDB(dataset_clean_path, treshold=False)
+    # Manifeste des étapes terminées : si le précédent preprocessing a été interrompu sur les mêmes
+    # données, on reprend après la dernière étape terminée
+    manifest = PreprocessingManifest(
+        manifest_path, dataset_signature(dataset_raw_path, new_classes_to_track)
+    )
+    if manifest.resuming:
+        logging.info(f"Reprise du preprocessing interrompu (étapes terminées : {manifest.data['completed']})")
+
+    if incremental_preprocessing:
+        # On met à jour dataset_clean avec les seules classes modifiées dans dataset_raw
+        if not manifest.is_done("incremental"):
+            IncrementalCleanDB(
+                dataset_clean_path,
+                dataset_raw_path,
+                raw_manifest_path,
+                clean_index_path,
+                excluded_classes=new_classes_to_track,
+            ).cleanAll()
+            manifest.mark_done("incremental")
+    else:
+        start_full_cleaning(manifest, new_classes_to_track)
+
+    # On enregistre les images décodées pour que l'entraînement n'ait plus à décoder les fichiers.
+    # En cas d'échec, l'entraînement lit simplement les images depuis dataset_clean
+    if not manifest.is_done("shards"):
+        try:
+            write_shards(dataset_clean_path, dataset_shards_path)
+        except Exception as e:
+            logging.error(f"Erreur lors de l'enregistrement des images décodées : {e}")
+        manifest.mark_done("shards")
+    manifest.finish()
 
-    # On supprime ce qui est présent dans dataset_clean et on copie le contenu brut
-    shutil.rmtree(dataset_clean_path)
-    os.makedirs(dataset_clean_path)
+    # On indique que le container n'est plus actif
     time.sleep(5)
-    shutil.copytree(dataset_raw_path, dataset_clean_path, dirs_exist_ok=True)
+    with open(state_path, "w") as file:
+        file.write("0")
 
-    # On supprime tous les fichiers qui sont en double avec dataset_raw
-    if os.path.exists(os.path.join(dataset_clean_path, "dataset_version.json")):
-        os.remove(os.path.join(dataset_clean_path, "dataset_version.json"))
-    os.remove(os.path.join(dataset_clean_path, "birds.csv"))
-    os.remove(os.path.join(dataset_clean_path, "birds_list.csv"))
 
-    # On récupère les nouvelles classes et on les supprime, car elles ne doivent pas être traitées
-    # tant qu'elles sont condisérées comme nouvelles (trop peu d'images)
-    if new_classes_to_track:
-        for classe in new_classes_to_track:
-            shutil.rmtree(os.path.join(dataset_clean_path, "train", classe))
+def start_full_cleaning(manifest, new_classes_to_track):
+    """
+    Preprocessing complet : dataset_raw est recopié dans dataset_clean puis entièrement retraité.
+    """
+    # On instancie la classe qui s'occupe de tout le nettoyage (code créé dans un autre projet)
+    cleanDB = CleanDB(dataset_clean_path, treshold=False, manifest=manifest)
+
+    if not manifest.is_done("copy"):
+        # On supprime ce qui est présent dans dataset_clean et on copie le contenu brut
+        shutil.rmtree(dataset_clean_path)
+        os.makedirs(dataset_clean_path)
+        # dataset_clean ne correspond plus à l'état du preprocessing incrémental
+        if os.path.exists(clean_index_path):
+            os.remove(clean_index_path)
+        time.sleep(5)
+        shutil.copytree(dataset_raw_path, dataset_clean_path, dirs_exist_ok=True)
+
+        # On supprime tous les fichiers qui sont en double avec dataset_raw
+        if os.path.exists(os.path.join(dataset_clean_path, "dataset_version.json")):
+            os.remove(os.path.join(dataset_clean_path, "dataset_version.json"))
+        os.remove(os.path.join(dataset_clean_path, "birds.csv"))
+        os.remove(os.path.join(dataset_clean_path, "birds_list.csv"))
+
+        # On récupère les nouvelles classes et on les supprime, car elles ne doivent pas être traitées
+        # tant qu'elles sont condisérées comme nouvelles (trop peu d'images)
+        if new_classes_to_track:
+            for classe in new_classes_to_track:
+                shutil.rmtree(os.path.join(dataset_clean_path, "train", classe))
+        manifest.mark_done("copy")
 
     # On lance le preprocessing
     cleanDB.cleanAll()
 
-    # On indique que le container n'est plus actif
-    time.sleep(5)
-    with open(state_path, "w") as file:
-        file.write("0")
-
 
 def auto_update_dataset(dataset_name, destination, first_launch=False):
     """
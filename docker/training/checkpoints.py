@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import shutil
+import logging
+from tensorflow.keras.callbacks import Callback
+from tensorflow.keras.models import load_model
+
+MODEL_FILE = "model.keras"
+STATE_FILE = "state.json"
+
+
+def has_checkpoint(folder):
+    """
+    Vérifie qu'un point de reprise complet (modèle et état) existe dans le dossier
+    """
+    return os.path.isfile(os.path.join(folder, MODEL_FILE)) and os.path.isfile(os.path.join(folder, STATE_FILE))
+
+
+def load_checkpoint(folder):
+    """
+    Charge le dernier point de reprise : le modèle compilé (poids et état de l'optimiseur) et l'état
+    de l'entraînement (époque à reprendre, durée déjà passée, métriques de la dernière époque).
+    Renvoie (None, None) s'il n'y en a pas.
+    """
+    if not has_checkpoint(folder):
+        return None, None
+    with open(os.path.join(folder, STATE_FILE), "r") as file:
+        state = json.load(file)
+    model = load_model(os.path.join(folder, MODEL_FILE))
+    logging.info(f"Reprise de l'entraînement à l'époque {state['epoch'] + 1} depuis {folder}")
+    return model, state
+
+
+def remove_checkpoint(folder):
+    shutil.rmtree(folder, ignore_errors=True)
+
+
+class TrainingCheckpoint(Callback):
+    """
+    Enregistre régulièrement le modèle et l'état de l'optimiseur pendant l'entraînement :
+    à la fin de chaque époque et, si every_batches > 0, tous les every_batches lots
+    (l'époque interrompue est alors recommencée à partir de ces poids).
+    Les fichiers sont écrits à côté puis remplacent les anciens d'un seul coup.
+    """
+
+    def __init__(self, folder, every_batches=0, state=None):
+        """
+        state : état du point de reprise chargé, pour cumuler la durée d'entraînement
+        """
+        super().__init__()
+        self.folder = folder
+        self.every_batches = every_batches
+        self.previous_seconds = state["training_seconds"] if state else 0.0
+        self.last_logs = state["logs"] if state else {}
+        os.makedirs(folder, exist_ok=True)
+
+    def on_train_begin(self, logs=None):
+        self.start_time = time.monotonic()
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch = epoch
+
+    def on_train_batch_end(self, batch, logs=None):
+        if self.every_batches and (batch + 1) % self.every_batches == 0:
+            self.save(self.epoch)
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.last_logs = {name: float(value) for name, value in (logs or {}).items()}
+        self.save(epoch + 1)
+
+    def training_seconds(self):
+        """
+        Durée d'entraînement depuis le début de la run, reprises comprises
+        """
+        return self.previous_seconds + time.monotonic() - self.start_time
+
+    def save(self, epoch):
+        """
+        epoch : époque à reprendre (les époques précédentes sont terminées)
+        """
+        model_path = os.path.join(self.folder, MODEL_FILE)
+        state_path = os.path.join(self.folder, STATE_FILE)
+        # L'extension .keras est nécessaire à model.save : le fichier temporaire la garde
+        temp_model_path = os.path.join(self.folder, "tmp_" + MODEL_FILE)
+        self.model.save(temp_model_path)
+        os.replace(temp_model_path, model_path)
+        state = {"epoch": epoch, "training_seconds": self.training_seconds(), "logs": self.last_logs}
+        with open(state_path + ".tmp", "w") as file:
+            json.dump(state, file)
+        os.replace(state_path + ".tmp", state_path)
@@ -0,0 +1,236 @@
+import os
+import glob
+import math
+import hashlib
+import logging
+import numpy as np
+import tensorflow as tf
+from image_shards import ImageShards
+
+AUTOTUNE = tf.data.AUTOTUNE
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif")
+
+# Paramètres d'augmentation, identiques à ceux de l'ancien ImageDataGenerator
+AUGMENTATION = {
+    "rotation_range": 30,
+    "width_shift_range": 0.2,
+    "height_shift_range": 0.2,
+    "zoom_range": 0.2,
+    "shear_range": 0.2,
+    "horizontal_flip": True,
+    "vertical_flip": True,
+}
+
+
+def list_images(directory):
+    """
+    Liste les images d'un dossier organisé en un sous-dossier par classe (comme flow_from_directory)
+    Renvoie les chemins, les index des classes et le dictionnaire {classe: index}
+    """
+    class_names = sorted(
+        folder for folder in os.listdir(directory) if os.path.isdir(os.path.join(directory, folder))
+    )
+    paths, labels = [], []
+    for index, class_name in enumerate(class_names):
+        class_folder = os.path.join(directory, class_name)
+        for file_name in sorted(os.listdir(class_folder)):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(class_folder, file_name))
+                labels.append(index)
+    return paths, np.array(labels, dtype=np.int32), {name: index for index, name in enumerate(class_names)}
+
+
+def decode_image(path, img_size):
+    """
+    Lit et redimensionne une image (interpolation au plus proche, comme load_img), en uint8
+    """
+    content = tf.io.read_file(path)
+    # Le décodage JPEG précis donne les mêmes pixels que Pillow
+    img = tf.cond(
+        tf.io.is_jpeg(content),
+        lambda: tf.io.decode_jpeg(content, channels=3, dct_method="INTEGER_ACCURATE"),
+        lambda: tf.io.decode_image(content, channels=3, expand_animations=False),
+    )
+    img = tf.image.resize(img, img_size, method="nearest")
+    img = tf.cast(img, tf.uint8)
+    img.set_shape((*img_size, 3))
+    return img
+
+
+def random_transforms(batch_size, height, width, params=AUGMENTATION):
+    """
+    Tire une transformation affine par image (rotation, décalage, cisaillement, zoom, retournements)
+    et renvoie les matrices au format attendu par ImageProjectiveTransformV3 (sortie -> entrée)
+    """
+    def uniform(limit):
+        return tf.random.uniform((batch_size,), -limit, limit)
+
+    # Mêmes tirages que ImageDataGenerator : angles en degrés, décalages en fraction de la taille
+    theta = uniform(params["rotation_range"]) * math.pi / 180
+    shear = uniform(params["shear_range"]) * math.pi / 180
+    tx = uniform(params["width_shift_range"]) * width
+    ty = uniform(params["height_shift_range"]) * height
+    zx = 1 + uniform(params["zoom_range"])
+    zy = 1 + uniform(params["zoom_range"])
+    zeros, ones = tf.zeros((batch_size,)), tf.ones((batch_size,))
+
+    def matrix(rows):
+        return tf.stack([tf.stack(row, axis=-1) for row in rows], axis=1)
+
+    rotation = matrix([[tf.cos(theta), -tf.sin(theta), zeros], [tf.sin(theta), tf.cos(theta), zeros],
+                       [zeros, zeros, ones]])
+    shift = matrix([[ones, zeros, tx], [zeros, ones, ty], [zeros, zeros, ones]])
+    shear_matrix = matrix([[ones, -tf.sin(shear), zeros], [zeros, tf.cos(shear), zeros], [zeros, zeros, ones]])
+    zoom = matrix([[zx, zeros, zeros], [zeros, zy, zeros], [zeros, zeros, ones]])
+
+    # Les retournements sont appliqués après la transformation, comme dans ImageDataGenerator
+    flip_x = tf.ones((batch_size,))
+    flip_y = tf.ones((batch_size,))
+    if params["horizontal_flip"]:
+        flip_x = tf.where(tf.random.uniform((batch_size,)) < 0.5, -1.0, 1.0)
+    if params["vertical_flip"]:
+        flip_y = tf.where(tf.random.uniform((batch_size,)) < 0.5, -1.0, 1.0)
+    flip = matrix([[flip_x, zeros, (1 - flip_x) * (width - 1) / 2],
+                   [zeros, flip_y, (1 - flip_y) * (height - 1) / 2], [zeros, zeros, ones]])
+
+    # La transformation est centrée sur le milieu de l'image
+    center_x, center_y = (width - 1) / 2, (height - 1) / 2
+    offset = matrix([[ones, zeros, center_x * ones], [zeros, ones, center_y * ones], [zeros, zeros, ones]])
+    reset = matrix([[ones, zeros, -center_x * ones], [zeros, ones, -center_y * ones], [zeros, zeros, ones]])
+
+    transforms = offset @ rotation @ shift @ shear_matrix @ zoom @ reset @ flip
+    return tf.reshape(transforms, (batch_size, 9))[:, :8]
+
+
+def augment_batch(images, params=AUGMENTATION):
+    """
+    Applique les augmentations à tout un lot en une seule opération (sur CPU)
+    """
+    shape = tf.shape(images)
+    transforms = random_transforms(shape[0], tf.cast(shape[1], tf.float32), tf.cast(shape[2], tf.float32), params)
+    return tf.raw_ops.ImageProjectiveTransformV3(
+        images=images,
+        transforms=transforms,
+        output_shape=shape[1:3],
+        fill_value=0.0,
+        interpolation="BILINEAR",
+        fill_mode="NEAREST",
+    )
+
+
+def cache_file(cache_dir, name, paths, img_size):
+    """
+    Renvoie le fichier de cache d'un dossier d'images. Il dépend de la liste des images,
+    pour ne pas relire un cache périmé après un preprocessing ; les anciens caches sont supprimés.
+    """
+    key = hashlib.sha1("\n".join([str(img_size)] + paths).encode()).hexdigest()[:12]
+    prefix = os.path.join(cache_dir, name)
+    for old_file in glob.glob(f"{prefix}_*"):
+        if not os.path.basename(old_file).startswith(f"{name}_{key}"):
+            os.remove(old_file)
+    return f"{prefix}_{key}"
+
+
+class ImageDataset:
+    """
+    Chargement d'un dossier d'images avec tf.data : décodage en parallèle, cache optionnel sur le disque
+    des images décodées, augmentation par lot et préchargement des lots suivants pendant l'entraînement.
+    Si le preprocessing a enregistré les images décodées (shards) et qu'elles sont à jour, elles sont lues
+    directement depuis le tableau projeté en mémoire, sans décodage.
+    Expose les mêmes attributs que les générateurs de flow_from_directory (samples, classes, class_indices...).
+    """
+
+    def __init__(self, directory, img_size=(224, 224), batch_size=16, augment=False, shuffle=False,
+                 cache_dir=None, seed=None, shards_dir=None, subset=None):
+        """
+        directory : dossier contenant un sous-dossier par classe
+        augment : applique les augmentations aléatoires (jeu d'entraînement)
+        shuffle : mélange les images à chaque époque
+        cache_dir : dossier où garder les images décodées (pas de cache si None)
+        shards_dir : dossier des images décodées par le preprocessing (ignoré si None)
+        subset : positions (dans le dossier) des images à garder, toutes par défaut (sans cache dans ce cas)
+        """
+        self.directory = directory
+        self.img_size = tuple(img_size)
+        self.batch_size = batch_size
+        self.filepaths, self.classes, self.class_indices = list_images(directory)
+        self.num_classes = len(self.class_indices)
+        self.shards = self.load_shards(shards_dir)
+
+        # Position de chaque image gardée dans le dossier (et dans les images décodées)
+        self.rows = np.arange(len(self.filepaths)) if subset is None else np.asarray(subset, dtype=np.int64)
+        self.filepaths = [self.filepaths[row] for row in self.rows]
+        self.classes = self.classes[self.rows]
+        self.samples = len(self.filepaths)
+
+        if self.shards is not None:
+            dataset = self.read_shards(shuffle, seed)
+        else:
+            dataset = self.decode_files(shuffle, seed, cache_dir if subset is None else None)
+        dataset = dataset.map(self.prepare_batch(augment), num_parallel_calls=AUTOTUNE)
+        self.dataset = dataset.prefetch(AUTOTUNE)
+
+    def load_shards(self, shards_dir):
+        """
+        Renvoie les images décodées du set si elles existent et correspondent aux fichiers du dossier
+        """
+        split = os.path.basename(os.path.normpath(self.directory))
+        if not shards_dir or not ImageShards.exists(shards_dir, split):
+            return None
+        shards = ImageShards(shards_dir, split)
+        files = [os.path.relpath(path, self.directory).replace(os.sep, "/") for path in self.filepaths]
+        if not shards.is_up_to_date(self.directory, files, self.img_size):
+            logging.warning(f"Les images décodées de {split} ne sont plus à jour, lecture des fichiers")
+            return None
+        logging.info(f"Lecture des images décodées de {split} depuis {shards.path}")
+        return shards
+
+    def read_shards(self, shuffle, seed):
+        """
+        Lots lus par index dans les images décodées, sans décodage
+        """
+        indices = tf.data.Dataset.from_tensor_slices(self.rows)
+        if shuffle:
+            indices = indices.shuffle(max(self.samples, 1), seed=seed, reshuffle_each_iteration=True)
+
+        def read(batch_indices):
+            images, labels = tf.numpy_function(self.shards.get_batch, [batch_indices], (tf.uint8, tf.int32))
+            images.set_shape((None, *self.img_size, 3))
+            labels.set_shape((None,))
+            return images, labels
+
+        return indices.batch(self.batch_size).map(read, num_parallel_calls=AUTOTUNE, deterministic=not shuffle)
+
+    def decode_files(self, shuffle, seed, cache_dir):
+        """
+        Lots décodés en parallèle depuis les fichiers images
+        """
+        dataset = tf.data.Dataset.from_tensor_slices((self.filepaths, self.classes))
+        dataset = dataset.map(
+            lambda path, label: (decode_image(path, self.img_size), label),
+            num_parallel_calls=AUTOTUNE,
+            deterministic=not shuffle,
+        )
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            name = os.path.basename(os.path.normpath(self.directory))
+            filename = cache_file(cache_dir, name, self.filepaths, self.img_size)
+            dataset = dataset.cache(filename)
+            logging.info(f"Cache des images décodées : {filename}")
+        if shuffle:
+            dataset = dataset.shuffle(min(self.samples, 10000) or 1, seed=seed, reshuffle_each_iteration=True)
+        return dataset.batch(self.batch_size)
+
+    def prepare_batch(self, augment):
+        """
+        Convertit un lot d'images (float32 de 0 à 255, comme ImageDataGenerator) et d'étiquettes (one-hot)
+        """
+        def prepare(images, labels):
+            images = tf.cast(images, tf.float32)
+            if augment:
+                images = augment_batch(images)
+            return images, tf.one_hot(labels, self.num_classes)
+        return prepare
+
+    def __len__(self):
+        return math.ceil(self.samples / self.batch_size)
@@ -0,0 +1,123 @@
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+import tensorflow as tf
+from data_loader import decode_image
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def file_hash(path):
+    """
+    Empreinte du contenu d'une image (une image modifiée a une nouvelle empreinte)
+    """
+    with open(path, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def backbone_version(backbone):
+    """
+    Version du réseau de base : son nom, la taille de ses entrées, une empreinte de ses poids
+    et sa précision de calcul si ce n'est pas float32 (précision mixte)
+    """
+    digest = hashlib.sha1()
+    for weight in backbone.weights:
+        digest.update(np.ascontiguousarray(weight.numpy()).tobytes())
+    input_size = "x".join(str(size) for size in backbone.input_shape[1:3])
+    version = f"{backbone.name}_{input_size}_{digest.hexdigest()[:12]}"
+    policy = backbone.dtype_policy.name
+    return version if policy == "float32" else f"{version}_{policy}"
+
+
+class FeatureCache:
+    """
+    Cache sur le disque des caractéristiques calculées par la partie gelée du réseau.
+    Une ligne par image, repérée par l'empreinte de l'image, dans un fichier par version du réseau de base.
+    Le fichier est projeté en mémoire : seules les lignes demandées sont lues.
+    """
+
+    def __init__(self, cache_dir, backbone, batch_size=64):
+        """
+        cache_dir : dossier du cache (un sous-dossier par version du réseau de base)
+        backbone : partie gelée du réseau, qui renvoie un vecteur de caractéristiques par image
+        """
+        self.backbone = backbone
+        self.batch_size = batch_size
+        self.img_size = tuple(backbone.input_shape[1:3])
+        self.feature_dim = int(backbone.output_shape[-1])
+        self.version = backbone_version(backbone)
+        self.path = os.path.join(cache_dir, self.version)
+        self.features_path = os.path.join(self.path, "features.f32")
+        self.index_path = os.path.join(self.path, "index.json")
+        os.makedirs(self.path, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as file:
+                self.index = json.load(file)
+        # Les lignes écrites sans avoir été ajoutées à l'index (arrêt pendant une écriture) sont retirées
+        with open(self.features_path, "ab") as file:
+            file.truncate(len(self.index) * self.feature_dim * 4)
+
+    def extract(self, paths):
+        """
+        Calcule les caractéristiques d'une liste d'images, par lots
+        """
+        dataset = tf.data.Dataset.from_tensor_slices(paths)
+        dataset = dataset.map(lambda path: decode_image(path, self.img_size), num_parallel_calls=AUTOTUNE)
+        dataset = dataset.batch(self.batch_size).map(lambda images: tf.cast(images, tf.float32))
+        for images in dataset.prefetch(AUTOTUNE):
+            yield self.backbone(images, training=False).numpy().astype(np.float32)
+
+    def update(self, paths):
+        """
+        Renvoie la ligne du cache de chaque image, en calculant seulement les images nouvelles ou modifiées
+        """
+        hashes = [file_hash(path) for path in paths]
+        missing = {}
+        for path, image_hash in zip(paths, hashes):
+            if image_hash not in self.index and image_hash not in missing:
+                missing[image_hash] = path
+
+        if missing:
+            logging.info(f"Calcul des caractéristiques de {len(missing)} image(s) sur {len(paths)}")
+            new_hashes = list(missing)
+            row = len(self.index)
+            with open(self.features_path, "ab") as file:
+                for features in self.extract(list(missing.values())):
+                    file.write(features.tobytes())
+            for image_hash in new_hashes:
+                self.index[image_hash] = row
+                row += 1
+            # L'index est remplacé d'un seul coup, une fois les caractéristiques écrites
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, "w") as file:
+                json.dump(self.index, file)
+            os.replace(temp_path, self.index_path)
+
+        return np.array([self.index[image_hash] for image_hash in hashes], dtype=np.int64)
+
+    def features(self):
+        """
+        Renvoie le tableau des caractéristiques, projeté en mémoire
+        """
+        if not self.index:
+            return np.zeros((0, self.feature_dim), dtype=np.float32)
+        return np.memmap(self.features_path, dtype=np.float32, mode="r", shape=(len(self.index), self.feature_dim))
+
+    def dataset(self, rows, labels, num_classes, batch_size=16, shuffle=False):
+        """
+        Lots (caractéristiques, étiquettes one-hot) lus dans le cache
+        """
+        features = self.features()
+
+        def gather(batch_rows, batch_labels):
+            batch = tf.numpy_function(lambda batch_rows: features[batch_rows], [batch_rows], tf.float32)
+            batch.set_shape((None, self.feature_dim))
+            return batch, tf.one_hot(batch_labels, num_classes)
+
+        dataset = tf.data.Dataset.from_tensor_slices((rows, np.asarray(labels, dtype=np.int32)))
+        if shuffle:
+            dataset = dataset.shuffle(len(rows), reshuffle_each_iteration=True)
+        return dataset.batch(batch_size).map(gather, num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
@@ -0,0 +1,203 @@
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+import mlflow
+from tensorflow.keras.callbacks import Callback
+
+# États d'un job : en attente, en cours puis terminé, en échec, annulé ou interrompu (redémarrage du worker)
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+
+
+class JobCancelled(Exception):
+    """
+    Levée pendant l'entraînement quand l'annulation du job est demandée
+    """
+
+
+class JobQueue:
+    """
+    File d'attente des entraînements, enregistrée dans une base SQLite sur le volume.
+    L'API y ajoute les jobs, le worker les prend un par un, dans l'ordre d'arrivée.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with self.connect() as connection:
+            # Le mode WAL permet de lire la file (API) pendant que le worker y écrit
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    run_id TEXT,
+                    progress TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    error TEXT
+                )
+                """
+            )
+
+    @contextmanager
+    def connect(self):
+        """
+        Connexion en autocommit, fermée à la sortie du bloc
+        """
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def to_dict(row):
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["progress"] = json.loads(job["progress"]) if job["progress"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def submit(self, params):
+        """
+        Ajoute un entraînement à la file et renvoie l'identifiant du job
+        """
+        with self.connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO jobs (status, params, created_at) VALUES (?, ?, ?)",
+                (QUEUED, json.dumps(params), time.time()),
+            )
+            return cursor.lastrowid
+
+    def claim_next(self):
+        """
+        Passe le plus ancien job en attente à l'état en cours et le renvoie (None si la file est vide)
+        """
+        with self.connect() as connection:
+            # La transaction est prise en écriture dès le début : un seul worker peut prendre un job donné
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    connection.execute(
+                        "UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (RUNNING, time.time(), row["id"])
+                    )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def get(self, job_id):
+        with self.connect() as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self.to_dict(row) if row else None
+
+    def list_jobs(self, status=None, limit=50):
+        """
+        Renvoie les derniers jobs (les plus récents en premier), éventuellement filtrés par état
+        """
+        query, args = "SELECT * FROM jobs", []
+        if status:
+            query += " WHERE status = ?"
+            args.append(status)
+        query += " ORDER BY id DESC LIMIT ?"
+        args.append(limit)
+        with self.connect() as connection:
+            return [self.to_dict(row) for row in connection.execute(query, args).fetchall()]
+
+    def cancel(self, job_id):
+        """
+        Annule un job : immédiatement s'il est en attente, au prochain lot s'il est en cours.
+        Renvoie le job mis à jour (None s'il n'existe pas).
+        """
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            )
+            connection.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING)
+            )
+        return self.get(job_id)
+
+    def is_cancel_requested(self, job_id):
+        with self.connect() as connection:
+            row = connection.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def update(self, job_id, **fields):
+        """
+        Met à jour des colonnes d'un job (run_id, progress...)
+        """
+        if "progress" in fields:
+            fields["progress"] = json.dumps(fields["progress"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self.connect() as connection:
+            connection.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def finish(self, job_id, status, error=None):
+        self.update(job_id, status=status, finished_at=time.time(), error=error)
+
+    def interrupt_running(self):
+        """
+        Au démarrage du worker, les jobs restés en cours ont été interrompus par un redémarrage.
+        Renvoie ces jobs.
+        """
+        jobs = self.list_jobs(status=RUNNING, limit=-1)
+        for job in jobs:
+            self.finish(job["id"], INTERRUPTED, "Worker redémarré pendant l'entraînement")
+        return jobs
+
+
+class JobProgress(Callback):
+    """
+    Enregistre l'avancement du job (époque, lot, images/s) dans la file, au plus toutes les
+    `interval` secondes, et arrête l'entraînement si son annulation a été demandée
+    """
+
+    def __init__(self, queue, job_id, batch_size, interval=2.0):
+        super().__init__()
+        self.queue = queue
+        self.job_id = job_id
+        self.batch_size = batch_size
+        self.interval = interval
+        self.epoch = 0
+
+    def on_train_begin(self, logs=None):
+        # On associe la run MLflow au job (pour la reprendre s'il est interrompu)
+        if mlflow.active_run():
+            self.queue.update(self.job_id, run_id=mlflow.active_run().info.run_id)
+        self.last_update = 0.0
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch = epoch
+        self.epoch_start = time.monotonic()
+
+    def on_train_batch_end(self, batch, logs=None):
+        now = time.monotonic()
+        if now - self.last_update < self.interval:
+            return
+        self.last_update = now
+        if self.queue.is_cancel_requested(self.job_id):
+            raise JobCancelled(f"Job {self.job_id} annulé")
+        step = batch + 1
+        self.queue.update(self.job_id, progress={
+            "epoch": self.epoch + 1,
+            "epochs": self.params.get("epochs"),
+            "step": step,
+            "steps": self.params.get("steps"),
+            "images_per_second": round(step * self.batch_size / (now - self.epoch_start), 1),
+        })
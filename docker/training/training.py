@@ -7,16 +7,25 @@ import logging
 import mlflow
 import shutil
 import json
-from sklearn.metrics import confusion_matrix
+import math
+import time
+from typing import Optional
 from tensorflow.keras.applications import EfficientNetB0
-from tensorflow.keras.layers import Dropout, GlobalAveragePooling2D, Dense
-from tensorflow.keras.callbacks import ReduceLROnPlateau, EarlyStopping
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
+from tensorflow.keras.layers import Dropout, GlobalAveragePooling2D, Dense, Input
+from tensorflow.keras.callbacks import ReduceLROnPlateau, EarlyStopping, Callback
+from tensorflow.keras.models import load_model
 from tensorflow.keras import Model
 from tensorflow.keras.optimizers import Adam
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from mlflow.tracking import MlflowClient
+from mlflow.exceptions import MlflowException
 from alert_system import AlertSystem
+from metrics import confusion_dataframe
+from data_loader import ImageDataset
+from feature_cache import FeatureCache, file_hash
+from training_profile import PROFILES, EpochTiming, apply_profile, reset_profile, set_model_policy
+from checkpoints import TrainingCheckpoint, has_checkpoint, load_checkpoint, remove_checkpoint
+from job_queue import JobQueue, JobCancelled
 
 # On lance le serveur FastAPI
 app = FastAPI()
@@ -36,6 +45,28 @@ mlruns_path = os.path.join(volume_path, "mlruns")
 train_path = os.path.join(dataset_folder, "train")
 valid_path = os.path.join(dataset_folder, "valid")
 test_path = os.path.join(dataset_folder, "test")
+# Images décodées par le preprocessing, lues à la place des fichiers si elles sont à jour
+dataset_shards_folder = os.path.join(volume_path, "dataset_shards")
+# Dossier du cache des images décodées (désactivé si vide)
+dataset_cache_folder = os.getenv("DATASET_CACHE_DIR", "")
+# Cache des caractéristiques du réseau de base (mode caractéristiques gelées)
+feature_cache_folder = os.path.join(volume_path, "feature_cache")
+# Nombre d'époques du mode caractéristiques gelées (une époque ne parcourt que des vecteurs)
+frozen_features_epochs = int(os.getenv("FROZEN_FEATURES_EPOCHS", 20))
+# Reprise à partir du modèle en production : nombre d'époques maximum, learning rate,
+# nombre d'anciennes images rejouées par nouvelle image et durée maximum
+# (fraction de la durée du dernier entraînement complet, ou nombre de minutes si elle est inconnue)
+warm_start_epochs = int(os.getenv("WARM_START_EPOCHS", 5))
+warm_start_learning_rate = float(os.getenv("WARM_START_LEARNING_RATE", 0.0001))
+warm_start_replay_ratio = float(os.getenv("WARM_START_REPLAY_RATIO", 1.0))
+warm_start_time_fraction = float(os.getenv("WARM_START_TIME_FRACTION", 0.25))
+warm_start_max_minutes = float(os.getenv("WARM_START_MAX_MINUTES", 60))
+# Points de reprise : à chaque fin d'époque et, si différent de 0, tous les N lots
+checkpoint_every_batches = int(os.getenv("CHECKPOINT_EVERY_BATCHES", 0))
+# File d'attente des entraînements (base SQLite sur le volume)
+jobs_db_path = os.path.join(state_folder, "training_jobs.db")
+# Taille des lots d'entraînement
+batch_size = 16
 
 # On créer les dossiers si nécessaire
 os.makedirs(state_folder, exist_ok=True)
@@ -44,10 +75,6 @@ os.makedirs(log_folder, exist_ok=True)
 # On déclare le nom de l'expérience MLflow à récupérer
 experiment_id = "157975935045122495"
 
-# On déclare l'état par défaut du container
-with open(state_path, "w") as file:
-    file.write("0")
-
 # On configure le logging pour les informations et les erreurs
 logging.basicConfig(
     filename=os.path.join(log_folder, "training.log"),
@@ -56,27 +83,81 @@ logging.basicConfig(
     datefmt="%d/%m/%Y %I:%M:%S %p",
 )
 
-# On ajoute le dossier mlruns contenant un run complet s'il n'existe pas dans le volume
-if not os.path.exists(mlruns_path):
-    shutil.copytree("./mlruns", mlruns_path)
-    shutil.copy("./prod_model_id.txt", mlruns_path)
-else:
-    shutil.rmtree("./mlruns")
-
 # On indique à MLFlow d'effectuer son tracking dans le dossier en question
 mlflow.set_tracking_uri("file:///home/app/volume_data/mlruns")
 client = MlflowClient()
 
+# File d'attente des entraînements, partagée entre l'API et le worker
+job_queue = JobQueue(jobs_db_path)
+
 # ----------------------------------------------------------------------------------------- #
 
 
-def generate_confusion_matrix(test_generator, model):
+def get_checkpoint_folder(run):
+    """
+    Dossier des points de reprise d'une run, dans ses artefacts MLflow (sur le volume)
+    """
+    return os.path.join(mlruns_path, run.info.experiment_id, run.info.run_id, "artifacts", "checkpoints")
+
+
+def prepare_worker():
+    """
+    Préparation du volume au démarrage du worker (seul processus qui entraîne) : dossier mlruns,
+    état du container et entraînements interrompus par un redémarrage
+    """
+    # On ajoute le dossier mlruns contenant un run complet s'il n'existe pas dans le volume
+    if not os.path.exists(mlruns_path):
+        shutil.copytree("./mlruns", mlruns_path)
+        shutil.copy("./prod_model_id.txt", mlruns_path)
+    else:
+        shutil.rmtree("./mlruns", ignore_errors=True)
+
+    # On récupère l'état laissé par le dernier démarrage (un entraînement interrompu laisse "1")
+    # puis on déclare l'état par défaut du container
+    previous_state = "0"
+    if os.path.exists(state_path):
+        with open(state_path, "r") as file:
+            previous_state = file.read().strip()
+    with open(state_path, "w") as file:
+        file.write("0")
+
+    # On récupère les entraînements interrompus par un redémarrage du container
+    try:
+        interrupted_jobs = job_queue.interrupt_running()
+        recover_interrupted_runs(previous_state == "1" or bool(interrupted_jobs))
+    except Exception as e:
+        logging.error(f"Un problème est survenu lors de la récupération des entraînements interrompus : {e}")
+
+
+def recover_interrupted_runs(interrupted=False):
+    """
+    Au démarrage, aucune run ne peut être en cours : les runs restées actives ont été interrompues
+    (redémarrage du container). On les marque comme arrêtées et on indique celles qui peuvent être reprises.
+    """
+    interrupted_runs = client.search_runs(experiment_id, filter_string="attributes.status = 'RUNNING'")
+    resumable = []
+    for run in interrupted_runs:
+        client.set_terminated(run.info.run_id, status="KILLED")
+        if has_checkpoint(get_checkpoint_folder(run)):
+            resumable.append(run.info.run_id)
+
+    if interrupted or interrupted_runs:
+        message = "Le container a redémarré pendant un entraînement."
+        if resumable:
+            message += " Il peut être repris avec /train?resume=<run_id> : " + ", ".join(resumable)
+        logging.warning(message)
+        alert_system.send_alert(subject="Entraînement interrompu", message=message)
+
+
+def generate_confusion_matrix(test_generator, model, predictions=None):
     """
     Génére la matrice de confusion (et métriques de recall, precision, et f1-score) pour le modèle
+    predictions : prédictions déjà calculées sur le set de test (mode caractéristiques gelées)
     """
     try:
         # On lance une prédiction sur tout le générateur de test
-        predictions = model.predict(test_generator)
+        if predictions is None:
+            predictions = model.predict(test_generator.dataset)
         # On récupère les index des classes prédites
         predicted_classes = np.argmax(predictions, axis=1)
 
@@ -84,14 +165,8 @@ def generate_confusion_matrix(test_generator, model):
         true_classes = test_generator.classes
         class_labels = list(test_generator.class_indices.keys())
 
-        # On créer la matrice de confusion
-        conf_matrix = confusion_matrix(true_classes, predicted_classes)
-
-        # On ajoute les metriques dans un DataFrame
-        confusion_df = pd.DataFrame(
-            conf_matrix, index=class_labels, columns=class_labels
-        )
-        confusion_df = add_metrics(confusion_df)
+        # On créer la matrice de confusion et on ajoute les metriques dans un DataFrame
+        confusion_df = confusion_dataframe(true_classes, predicted_classes, class_labels)
 
         # On enregistre la matrice de confusion
         confusion_df.to_csv("./initial_confusion_matrix.csv")
@@ -107,44 +182,6 @@ def generate_confusion_matrix(test_generator, model):
         )
 
 
-def add_metrics(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Ajout au DataFrame des métriques de precision, recall et f1-score
-    """
-    try:
-        # On calcule la precision (VP/VP+FP) pour chaque classe et ajoute la colonne
-        df["Precision"] = df.apply(
-            lambda row: df.loc[row.name, row.name] / df[row.name].sum()
-            if df[row.name].sum() != 0
-            else 0,
-            axis=1
-        )
-        # On calcule le recall (VP/VP+FN) pour chaque classe et ajoute la colonne
-        df["Recall"] = df.apply(
-            lambda row: df.loc[row.name, row.name] / df.loc[row.name].sum()
-            if df.loc[row.name].sum() != 0
-            else 0,
-            axis=1
-        )
-        # On calcule le f1-score ((2*Rec*Pre)/(Rec+Pre)) pour chaque classe et ajoute la colonne
-        df["f1-score"] = df.apply(
-            lambda row: (2 * row["Precision"] * row["Recall"]) / (row["Precision"] + row["Recall"])
-            if (row["Precision"] + row["Recall"]) != 0
-            else 0,
-            axis=1
-        )
-
-        return df
-    except Exception as e:
-        logging.error(
-            f"Un problème est survenu lors de la création des scores f1, recall et precision : {e}"
-        )
-        alert_system.send_alert(
-            subject="Erreur lors de l'entraînement",
-            message=f"Un problème est survenu lors de la création des scores f1, recall et precision : {e}",
-        )
-
-
 def get_worst_f1_scores(run_id: str):
     """
     Renvoie les f1-score et index les plus bas de la matrice de confusion d'une run
@@ -171,29 +208,310 @@ def get_worst_f1_scores(run_id: str):
         )
 
 
-def train_model():
+def add_head(x, num_classes):
+    """
+    Ajoute nos couches de classification à la sortie (après pooling) du réseau de base
+    """
+    x = Dense(1280, activation="relu")(x)
+    x = Dropout(rate=0.2)(x)
+    x = Dense(640, activation="relu")(x)
+    x = Dropout(rate=0.2)(x)
+    # La couche de sortie reste en float32 avec la précision mixte (softmax et loss stables)
+    return Dense(num_classes, activation="softmax", dtype="float32")(x)
+
+
+def compile_model(model, learning_rate=0.001, jit_compile="auto"):
+    """
+    Compile le modèle avec un optimiseur Adam et un learning rate adaptatif
+    (jit_compile : compilation XLA de l'étape d'entraînement, selon le profil)
+    """
+    optimizer = Adam(learning_rate=learning_rate)
+    model.compile(
+        optimizer=optimizer,
+        loss="categorical_crossentropy",
+        metrics=["acc", "mean_absolute_error"],
+        jit_compile=jit_compile,
+    )
+
+
+def train_frozen_features(
+    train_generator, valid_generator, test_generator, callbacks, batch_size,
+    jit_compile="auto", restored_model=None, checkpoint_state=None
+):
+    """
+    Mode caractéristiques gelées : le réseau de base n'est calculé qu'une fois par image (les caractéristiques
+    sont gardées en cache), puis seules nos couches sont entraînées et évaluées sur les vecteurs en cache.
+    restored_model et checkpoint_state : nos couches et l'état du point de reprise, pour reprendre une run.
+    Renvoie le modèle complet, l'historique, les métriques et les prédictions sur le set de test.
+    """
+    # Réseau de base entièrement gelé, qui renvoie directement le vecteur moyen (pooling)
+    backbone = EfficientNetB0(weights="imagenet", include_top=False, pooling="avg", input_shape=(224, 224, 3))
+    backbone.trainable = False
+
+    # On calcule uniquement les caractéristiques des images nouvelles ou modifiées
+    cache = FeatureCache(feature_cache_folder, backbone)
+    mlflow.log_param("backbone_version", cache.version)
+    datasets = {}
+    for name, generator in (("train", train_generator), ("valid", valid_generator), ("test", test_generator)):
+        rows = cache.update(generator.filepaths)
+        datasets[name] = cache.dataset(
+            rows, generator.classes, train_generator.num_classes, batch_size, shuffle=name == "train"
+        )
+
+    # On entraîne nos couches sur les vecteurs en cache
+    if restored_model is not None:
+        head = restored_model
+    else:
+        inputs = Input(shape=(cache.feature_dim,))
+        head = Model(inputs=inputs, outputs=add_head(inputs, train_generator.num_classes))
+        compile_model(head, jit_compile=jit_compile)
+    training_history = head.fit(
+        datasets["train"],
+        epochs=frozen_features_epochs,
+        initial_epoch=checkpoint_state["epoch"] if checkpoint_state else 0,
+        validation_data=datasets["valid"],
+        callbacks=callbacks + [EpochTiming(train_generator.samples)],
+        verbose=1,
+    )
+    test_results = head.evaluate(datasets["test"])
+    test_predictions = head.predict(datasets["test"])
+
+    # On assemble le réseau de base et nos couches entraînées : le modèle enregistré prend des images en entrée
+    x = backbone.output
+    for layer in head.layers[1:]:
+        x = layer(x)
+    model = Model(inputs=backbone.input, outputs=x)
+    compile_model(model)
+    return model, training_history, test_results, test_predictions
+
+
+class TimeBudget(Callback):
+    """
+    Arrête l'entraînement dès que la durée maximum est dépassée (vérifiée après chaque lot)
+    """
+
+    def __init__(self, max_seconds):
+        super().__init__()
+        self.max_seconds = max_seconds
+        self.stopped = False
+
+    def on_train_begin(self, logs=None):
+        self.start_time = time.monotonic()
+
+    def on_train_batch_end(self, batch, logs=None):
+        if time.monotonic() - self.start_time > self.max_seconds:
+            self.model.stop_training = True
+            self.stopped = True
+
+
+def get_time_budget(run):
+    """
+    Durée maximum (en secondes) d'une reprise : une fraction de la durée du dernier entraînement complet
+    """
+    # Si le modèle en production vient lui-même d'une reprise, on remonte jusqu'à l'entraînement complet
+    while run.data.params.get("warm_start") == "True" and run.data.params.get("warm_start_from"):
+        run = client.get_run(run.data.params["warm_start_from"])
+    if run.info.end_time:
+        return warm_start_time_fraction * (run.info.end_time - run.info.start_time) / 1000
+    return warm_start_max_minutes * 60
+
+
+def load_warm_start_model(run_id, class_indices):
+    """
+    Charge le modèle d'une run et remplace sa dernière couche par une couche couvrant toutes les classes.
+    Les poids des classes déjà connues sont recopiés (selon leur nom), ceux des nouvelles classes sont initialisés.
+    Renvoie le modèle et les classes connues par le modèle d'origine.
+    """
+    model_folder = os.path.join(mlruns_path, experiment_id, run_id, "artifacts", "model")
+    model = load_model(os.path.join(model_folder, "saved_model.h5"))
+    with open(os.path.join(model_folder, "classes.json"), "r") as file:
+        known_classes = {name: int(index) for index, name in json.load(file).items()}
+
+    # La nouvelle couche remplace l'ancienne et peut donc reprendre son nom
+    output_layer = model.layers[-1]
+    old_kernel, old_bias = output_layer.get_weights()
+    new_output_layer = Dense(len(class_indices), activation="softmax", name=output_layer.name, dtype="float32")
+    outputs = new_output_layer(output_layer.input)
+    kernel, bias = new_output_layer.get_weights()
+    # Les nouvelles classes partent d'un biais moyen pour ne pas être défavorisées au départ
+    bias[:] = old_bias.mean()
+    for name, index in class_indices.items():
+        if name in known_classes:
+            kernel[:, index] = old_kernel[:, known_classes[name]]
+            bias[index] = old_bias[known_classes[name]]
+    new_output_layer.set_weights([kernel, bias])
+    model = Model(inputs=model.input, outputs=outputs)
+
+    # Comme pour un entraînement complet, seules les 20 dernières couches du réseau de base et nos couches
+    # sont entraînées
+    last_base_layer = [layer.name for layer in model.layers].index("top_activation")
+    for position, layer in enumerate(model.layers):
+        layer.trainable = position > last_base_layer - 20
+    return model, set(known_classes)
+
+
+def log_train_images(dataset):
+    """
+    Enregistre dans les artefacts du modèle les empreintes (contenu) des images d'entraînement :
+    une reprise retrouve ainsi les images déjà vues par le modèle, même si leurs fichiers ont été réécrits.
+    Renvoie les empreintes, dans l'ordre des images du dataset.
+    """
+    hashes = [file_hash(path) for path in dataset.filepaths]
+    train_images_path = "./train_images.json"
+    with open(train_images_path, "w") as json_file:
+        json.dump(sorted(set(hashes)), json_file)
+    mlflow.log_artifact(train_images_path, artifact_path="model")
+    os.remove(train_images_path)
+    return hashes
+
+
+def load_train_images(run_id):
+    """
+    Empreintes des images d'entraînement d'une run (None pour une run qui ne les a pas enregistrées)
+    """
+    train_images_path = os.path.join(mlruns_path, experiment_id, run_id, "artifacts", "model", "train_images.json")
+    if not os.path.exists(train_images_path):
+        return None
+    with open(train_images_path, "r") as file:
+        return set(json.load(file))
+
+
+def select_replay(dataset, known_classes, hashes, trained_images, since, replay_ratio, seed=None):
+    """
+    Choisit les images du mélange de reprise : toutes les nouvelles images (classes inconnues du modèle
+    ou images qu'il n'a pas vues) et un échantillon des anciennes images de chaque classe.
+    Une image est reconnue par l'empreinte de son contenu (hashes, dans l'ordre du dataset) parmi celles
+    de l'entraînement du modèle (trained_images). Pour un modèle qui ne les a pas enregistrées,
+    les images modifiées après since sont considérées nouvelles.
+    Renvoie les positions des images choisies et le nombre de nouvelles images.
+    """
+    class_names = {index: name for name, index in dataset.class_indices.items()}
+    if trained_images is not None:
+        is_seen = [image_hash in trained_images for image_hash in hashes]
+    else:
+        is_seen = [os.path.getmtime(path) <= since for path in dataset.filepaths]
+    is_new = np.array([
+        class_names[label] not in known_classes or not seen
+        for label, seen in zip(dataset.classes, is_seen)
+    ], dtype=bool)
+    new_rows = np.flatnonzero(is_new)
+    old_rows = np.flatnonzero(~is_new)
+
+    # Le même nombre d'anciennes images est rejoué pour chaque classe connue
+    old_labels = dataset.classes[old_rows]
+    per_class = max(1, math.ceil(replay_ratio * len(new_rows) / max(1, len(np.unique(old_labels)))))
+    rng = np.random.default_rng(seed)
+    replay_rows = [
+        rng.permutation(old_rows[old_labels == label])[:per_class] for label in np.unique(old_labels)
+    ]
+    return np.sort(np.concatenate([new_rows, *replay_rows])).astype(np.int64), len(new_rows)
+
+
+def train_warm_start(
+    train_generator, valid_generator, test_generator, callbacks, batch_size,
+    jit_compile="auto", precision_policy="float32", restored_model=None, checkpoint_state=None, train_hashes=None
+):
+    """
+    Reprise de l'entraînement à partir du modèle en production : la dernière couche est agrandie pour
+    les nouvelles classes, puis le modèle est affiné sur les nouvelles images mélangées à un échantillon
+    des anciennes, dans une durée limitée.
+    restored_model et checkpoint_state : le modèle et l'état du point de reprise, pour reprendre une run
+    (le modèle de départ reste celui de la run, même si le modèle en production a changé depuis).
+    train_hashes : empreintes des images de train_generator, si elles sont déjà calculées.
+    Renvoie le modèle, l'historique et les métriques sur le set de test.
+    """
+    prod_run_id = client.get_run(mlflow.active_run().info.run_id).data.params.get("warm_start_from")
+    if prod_run_id is None:
+        with open(os.path.join(mlruns_path, "prod_model_id.txt"), "r") as file:
+            prod_run_id = file.read().strip()
+    prod_run = client.get_run(prod_run_id)
+    model, known_classes = load_warm_start_model(prod_run_id, train_generator.class_indices)
+    if restored_model is not None:
+        model = restored_model
+    elif precision_policy != "float32":
+        # Le modèle chargé calcule en float32 : on lui applique la précision du profil
+        model = set_model_policy(model, precision_policy)
+    new_classes = [name for name in train_generator.class_indices if name not in known_classes]
+
+    # Les images absentes de l'entraînement du modèle en production sont considérées nouvelles
+    # (à défaut d'empreintes enregistrées, celles modifiées après le début de son entraînement).
+    # La graine dépend du modèle de départ : une reprise rejoue les mêmes anciennes images.
+    if train_hashes is None:
+        train_hashes = [file_hash(path) for path in train_generator.filepaths]
+    rows, new_images = select_replay(
+        train_generator, known_classes, train_hashes, load_train_images(prod_run_id),
+        prod_run.info.start_time / 1000, warm_start_replay_ratio, seed=prod_run.info.start_time
+    )
+    replay_generator = ImageDataset(
+        train_path, img_size=(224, 224), batch_size=batch_size, augment=True, shuffle=True,
+        shards_dir=dataset_shards_folder, subset=rows
+    )
+    time_budget = TimeBudget(get_time_budget(prod_run))
+    # Lors d'une reprise, la durée déjà passée est décomptée
+    elapsed_seconds = checkpoint_state["training_seconds"] if checkpoint_state else 0.0
+    mlflow.log_params({
+        "warm_start_from": prod_run_id,
+        "new_classes": len(new_classes),
+        "new_images": new_images,
+        "replay_images": replay_generator.samples - new_images,
+        "time_budget_seconds": round(time_budget.max_seconds),
+    })
+    logging.info(
+        f"Reprise depuis {prod_run_id} : {len(new_classes)} nouvelle(s) classe(s), {new_images} nouvelle(s) image(s), "
+        f"{replay_generator.samples - new_images} ancienne(s) image(s) rejouée(s), "
+        f"durée maximum {time_budget.max_seconds:.0f} s"
+    )
+    time_budget.max_seconds = max(0.0, time_budget.max_seconds - elapsed_seconds)
+
+    if restored_model is None:
+        compile_model(model, learning_rate=warm_start_learning_rate, jit_compile=jit_compile)
+    training_history = model.fit(
+        replay_generator.dataset,
+        epochs=warm_start_epochs,
+        initial_epoch=checkpoint_state["epoch"] if checkpoint_state else 0,
+        validation_data=valid_generator.dataset,
+        callbacks=callbacks + [time_budget, EpochTiming(replay_generator.samples)],
+        verbose=1,
+    )
+    mlflow.log_metric("stopped_by_time_budget", int(time_budget.stopped))
+    test_results = model.evaluate(test_generator.dataset)
+    return model, training_history, test_results
+
+
+def train_model(frozen_features=False, warm_start=False, profile="default", resume=None, callbacks=None):
     """
     Fonction qui lance l'entraînement du modèle tout en faisant un suivi avec MLFlow
+    (resume : run_id d'une run interrompue à reprendre depuis son dernier point de reprise,
+    callbacks : callbacks ajoutés à l'entraînement, comme le suivi de l'avancement du job).
+    Les erreurs sont signalées par email puis relancées pour le worker.
     """
+    callbacks = callbacks or []
     try:
         # On indique que l'état du container passe à actif
         with open(state_path, "w") as file:
             file.write("1")
 
+        # Précision mixte et compilation XLA selon le profil d'entraînement
+        settings = apply_profile(profile)
+
         # On indique le nom de l'expérience dans laquelle se situer
         mlflow.set_experiment("Bird Classification Training")
 
-        # On lance le tracking de la run via MLFlow
-        with mlflow.start_run():
+        # On lance le tracking de la run via MLFlow (ou on reprend la run interrompue)
+        with mlflow.start_run(run_id=resume) as run:
 
             logging.info("Démmarage de l'entraînement")
 
+            # Points de reprise (modèle et état de l'optimiseur) enregistrés dans les artefacts de la run
+            checkpoint_folder = get_checkpoint_folder(run)
+            restored_model, checkpoint_state = load_checkpoint(checkpoint_folder)
+            checkpoint = TrainingCheckpoint(checkpoint_folder, checkpoint_every_batches, checkpoint_state)
+
             # On demande a MLFLow de logger automatiquement les métriques pertinentes
             # mais sans le modèle (qu'on log plus tard manuellement)
             mlflow.keras.autolog(log_models=False)
 
-            # Définition et log de la batch size
-            batch_size = 16
+            # Log de la batch size
             mlflow.log_param("batch_size", batch_size)
 
             # Définition des callbacks
@@ -209,25 +527,20 @@ def train_model():
                 patience=5, min_delta=0.01, verbose=1, mode="min", monitor="val_loss"
             )
 
-            # Création des générateurs d'images avec augmentation des données
-            train_datagen = ImageDataGenerator(
-                rotation_range=30,
-                width_shift_range=0.2,
-                height_shift_range=0.2,
-                horizontal_flip=True,
-                vertical_flip=True,
-                zoom_range=0.2,
-                shear_range=0.2,
-                fill_mode="nearest",
-            )
-            train_generator = train_datagen.flow_from_directory(
-                train_path, target_size=(224, 224), batch_size=batch_size
+            # Création des jeux de données tf.data (décodage en parallèle, cache optionnel
+            # et préchargement), avec augmentation des données pour l'entraînement
+            cache_dir = dataset_cache_folder or None
+            train_generator = ImageDataset(
+                train_path, img_size=(224, 224), batch_size=batch_size,
+                augment=True, shuffle=True, cache_dir=cache_dir, shards_dir=dataset_shards_folder
             )
-            valid_generator = ImageDataGenerator().flow_from_directory(
-                valid_path, target_size=(224, 224), batch_size=batch_size
+            valid_generator = ImageDataset(
+                valid_path, img_size=(224, 224), batch_size=batch_size,
+                cache_dir=cache_dir, shards_dir=dataset_shards_folder
             )
-            test_generator = ImageDataGenerator().flow_from_directory(
-                test_path, target_size=(224, 224), batch_size=batch_size, shuffle=False
+            test_generator = ImageDataset(
+                test_path, img_size=(224, 224), batch_size=batch_size,
+                cache_dir=cache_dir, shards_dir=dataset_shards_folder
             )
 
             # Récupération du nombre de classes et leurs indexs
@@ -243,66 +556,90 @@ def train_model():
                 json.dump(indices_classes, json_file)
             mlflow.log_artifact(classes_file_path, artifact_path="model")
             os.remove(classes_file_path)
+            # Empreintes des images d'entraînement, pour reconnaître les nouvelles images lors d'une reprise
+            train_hashes = log_train_images(train_generator)
 
             # On log manuellement le nombre de classes
             mlflow.log_param("num_classes", num_classes)
-
-            # On se base sur le modèle pré-entrainé EfficientNetB0
-            base_model = EfficientNetB0(weights="imagenet", include_top=False)
-
-            # On dégèle uniquement les 20 dernières couches pour affiner le modèle
-            for layer in base_model.layers[:-20]:
-                layer.trainable = False
-            for layer in base_model.layers[-20:]:
-                layer.trainable = True
-
-            # On ajoute nos couches
-            x = base_model.output
-            x = GlobalAveragePooling2D()(x)
-            x = Dense(1280, activation="relu")(x)
-            x = Dropout(rate=0.2)(x)
-            x = Dense(640, activation="relu")(x)
-            x = Dropout(rate=0.2)(x)
-            predictions = Dense(num_classes, activation="softmax")(x)
-            model = Model(inputs=base_model.input, outputs=predictions)
-
-            # On compile le modèle avec un optimiseur Adam et un learning rate adaptatif
-            optimizer = Adam(learning_rate=0.001)
-            model.compile(
-                optimizer=optimizer,
-                loss="categorical_crossentropy",
-                metrics=["acc", "mean_absolute_error"],
-            )
-
-            # On enntraîne le modèle
-            training_history = model.fit(
-                train_generator,
-                epochs=1,
-                steps_per_epoch=train_generator.samples // train_generator.batch_size,
-                validation_data=valid_generator,
-                validation_steps=valid_generator.samples // valid_generator.batch_size,
-                callbacks=[reduce_learning_rate, early_stopping],
-                verbose=1,
-            )
+            mlflow.log_param("frozen_features", frozen_features)
+            mlflow.log_param("warm_start", warm_start)
+            mlflow.log_params({"profile": profile, **settings})
+
+            if warm_start:
+                # On repart du modèle en production, affiné sur les nouvelles images et un échantillon des anciennes
+                model, training_history, test_results = train_warm_start(
+                    train_generator, valid_generator, test_generator,
+                    [reduce_learning_rate, early_stopping, checkpoint, *callbacks], batch_size,
+                    settings["jit_compile"], settings["precision_policy"], restored_model, checkpoint_state,
+                    train_hashes
+                )
+                test_predictions = None
+            elif frozen_features:
+                # Le réseau de base est gelé : seules nos couches sont entraînées, sur les caractéristiques en cache
+                model, training_history, test_results, test_predictions = train_frozen_features(
+                    train_generator, valid_generator, test_generator,
+                    [reduce_learning_rate, early_stopping, checkpoint, *callbacks], batch_size,
+                    settings["jit_compile"], restored_model, checkpoint_state
+                )
+            else:
+                if restored_model is not None:
+                    # Reprise : le modèle et l'état de l'optimiseur viennent du dernier point de reprise
+                    model = restored_model
+                else:
+                    # On se base sur le modèle pré-entrainé EfficientNetB0
+                    base_model = EfficientNetB0(weights="imagenet", include_top=False)
+
+                    # On dégèle uniquement les 20 dernières couches pour affiner le modèle
+                    for layer in base_model.layers[:-20]:
+                        layer.trainable = False
+                    for layer in base_model.layers[-20:]:
+                        layer.trainable = True
+
+                    # On ajoute nos couches
+                    x = GlobalAveragePooling2D()(base_model.output)
+                    predictions = add_head(x, num_classes)
+                    model = Model(inputs=base_model.input, outputs=predictions)
+                    compile_model(model, jit_compile=settings["jit_compile"])
+
+                # On enntraîne le modèle
+                training_history = model.fit(
+                    train_generator.dataset,
+                    epochs=1,
+                    initial_epoch=checkpoint_state["epoch"] if checkpoint_state else 0,
+                    validation_data=valid_generator.dataset,
+                    callbacks=[
+                        reduce_learning_rate, early_stopping, checkpoint, EpochTiming(train_generator.samples),
+                        *callbacks,
+                    ],
+                    verbose=1,
+                )
+                # On évalue le modèle sur le set de test
+                test_results = model.evaluate(test_generator.dataset)
+                test_predictions = None
 
             logging.info("Entraînement terminé !")
-            # On évalue le modèle sur le set de test
-            test_loss, test_accuracy, test_mae = model.evaluate(test_generator)
+            test_loss, test_accuracy, test_mae = test_results
 
             logging.info(f"Précision sur test: {test_accuracy}")
-            logging.info(
-                f"Précision finale sur validation: {training_history.history['val_acc'][-1]}"
-            )
-
-            # On sauvegarde le modèle au format h5
+            # Une reprise après la dernière époque n'a pas d'historique : on utilise alors
+            # les métriques de la dernière époque gardées par les points de reprise
+            val_accuracy = training_history.history.get("val_acc", [checkpoint.last_logs.get("val_acc")])
+            logging.info(f"Précision finale sur validation: {val_accuracy[-1]}")
+
+            # On sauvegarde le modèle au format h5, en float32 pour l'inférence
+            if settings["precision_policy"] != "float32":
+                model = set_model_policy(model, "float32")
             model_save_path = "saved_model.h5"
             model.save(model_save_path)
             mlflow.log_artifact(model_save_path, artifact_path="model")
             os.remove(model_save_path)
             logging.info("Modèle enregistré avec succès !")
 
+            # Le modèle est enregistré : les points de reprise ne servent plus
+            remove_checkpoint(checkpoint_folder)
+
             # On génère et sauvegarde la matrice de confusion pour plus tard
-            generate_confusion_matrix(test_generator, model)
+            generate_confusion_matrix(test_generator, model, test_predictions)
 
             # On termine le run MLFlow
             mlflow.end_run()
@@ -314,9 +651,10 @@ def train_model():
                 """,
             )
 
-            # On indique que le container n'est plus actif
-            with open(state_path, "w") as file:
-                file.write("0")
+    except JobCancelled as e:
+        # Annulation demandée : les points de reprise sont gardés, la run peut être reprise
+        logging.info(f"Entraînement annulé : {e}")
+        raise
 
     except Exception as e:
         logging.error(f"Un problème est survenu lors de l'entraînement : {e}")
@@ -324,6 +662,15 @@ def train_model():
             subject="Erreur lors de l'entraînement",
             message=f"Un problème est survenu lors de l'entraînement : {e}",
         )
+        raise
+
+    finally:
+        # La politique de précision est globale : on la remet à zéro pour les prochaines requêtes
+        reset_profile()
+
+        # On indique que le container n'est plus actif, que l'entraînement ait réussi ou non
+        with open(state_path, "w") as file:
+            file.write("0")
 
 
 # ----------------------------------------------------------------------------------------- #
@@ -335,30 +682,47 @@ def read_root():
 
 
 @app.get("/train")
-async def train(background_tasks: BackgroundTasks):
+async def train(
+    frozen_features: bool = False,
+    warm_start: bool = False,
+    profile: str = "default",
+    resume: Optional[str] = None,
+):
+    if resume:
+        # Reprise d'une run interrompue : le mode et le profil sont ceux de la run
+        try:
+            run = client.get_run(resume)
+        except MlflowException:
+            raise HTTPException(status_code=404, detail=f"Run {resume} introuvable.")
+        if not has_checkpoint(get_checkpoint_folder(run)):
+            raise HTTPException(status_code=404, detail=f"Aucun point de reprise pour la run {resume}.")
+        frozen_features = run.data.params.get("frozen_features") == "True"
+        warm_start = run.data.params.get("warm_start") == "True"
+        profile = run.data.params.get("profile", "default")
+    if frozen_features and warm_start:
+        raise HTTPException(
+            status_code=400,
+            detail="Les modes frozen_features et warm_start ne peuvent pas être combinés.",
+        )
+    if profile not in PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Profil d'entraînement inconnu : {profile} (profils : {', '.join(PROFILES)}).",
+        )
     try:
-        # On récupère les états des containers
-        with open(preprocessing_state_path, "r") as preprocessing_file:
-            preprocessing_state = preprocessing_file.read()
-
-        with open(drift_monitor_state_path, "r") as drift_monitor_file:
-            drift_monitor_state = drift_monitor_file.read()
-
-        with open(state_path, "r") as state_file:
-            state = state_file.read()
-
-        # On vérifie que le preprocessing, drift_monitoring ou en entraînement n'est pas en cours
-        if (
-            preprocessing_state == "0"
-            and drift_monitor_state == "0"
-            and state == "0"
-            and len(os.listdir(dataset_folder)) > 1
-        ):
-            # On lance la tâche en arrière-plan pour immédiatement retourner une réponse
-            background_tasks.add_task(train_model)
-            return "Entraînement du modèle lancé, merci d'attendre le mail indiquant le succès de la tâche."
-        else:
-            return "Un preprocessing, révision de drift ou un entraînement est en cours, merci de revenir plus tard."
+        # On vérifie que le premier preprocessing a créé le dataset
+        if not os.path.isdir(dataset_folder) or len(os.listdir(dataset_folder)) <= 1:
+            return "Le dataset n'est pas encore disponible, merci de revenir plus tard."
+
+        # On ajoute l'entraînement à la file : le worker le lance dès que le preprocessing,
+        # le drift monitoring et les entraînements précédents sont terminés
+        job_id = job_queue.submit(
+            {"frozen_features": frozen_features, "warm_start": warm_start, "profile": profile, "resume": resume}
+        )
+        return (
+            f"Entraînement du modèle ajouté à la file d'attente (job {job_id}), "
+            "son avancement est visible avec la route /jobs."
+        )
 
     except Exception as e:
         logging.error(f"Un problème est survenu lors de l''entraînement : {e}")
@@ -372,6 +736,34 @@ async def train(background_tasks: BackgroundTasks):
         )
 
 
+@app.get("/jobs")
+async def jobs(status: Optional[str] = None, limit: int = 50):
+    """
+    Liste les derniers entraînements de la file, avec leur état et leur avancement
+    (époque, lot, images/s)
+    """
+    return job_queue.list_jobs(status, limit)
+
+
+@app.get("/jobs/{job_id}")
+async def job(job_id: int):
+    found = job_queue.get(job_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} introuvable.")
+    return found
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: int):
+    """
+    Annule un entraînement en attente, ou arrête un entraînement en cours (au prochain lot)
+    """
+    found = job_queue.cancel(job_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} introuvable.")
+    return found
+
+
 @app.get("/results")
 async def results():
     """
@@ -0,0 +1,104 @@
+import time
+import logging
+import mlflow
+import tensorflow as tf
+from tensorflow.keras import mixed_precision
+from tensorflow.keras.callbacks import Callback
+from tensorflow.keras.models import clone_model
+
+# Profils d'entraînement : précision mixte (seulement si le matériel en profite) et compilation XLA
+# de l'étape d'entraînement ("auto" : choix de Keras, XLA sur GPU uniquement)
+PROFILES = {
+    "default": {"mixed_precision": False, "jit_compile": "auto"},
+    "mixed": {"mixed_precision": True, "jit_compile": "auto"},
+    "xla": {"mixed_precision": False, "jit_compile": True},
+    "fast": {"mixed_precision": True, "jit_compile": True},
+}
+
+
+def cpu_supports_bfloat16():
+    """
+    Vérifie que le processeur calcule nativement en bfloat16 (AVX512-BF16 ou AMX)
+    """
+    try:
+        with open("/proc/cpuinfo", "r") as file:
+            flags = file.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def mixed_precision_policy():
+    """
+    Politique de précision mixte adaptée au matériel : float16 sur les GPU récents (Tensor Cores),
+    bfloat16 sur les processeurs qui le calculent nativement, float32 sinon (la précision mixte
+    serait plus lente que le float32)
+    """
+    gpus = tf.config.list_physical_devices("GPU")
+    if gpus:
+        capability = tf.config.experimental.get_device_details(gpus[0]).get("compute_capability", (0, 0))
+        return "mixed_float16" if capability >= (7, 0) else "float32"
+    return "mixed_bfloat16" if cpu_supports_bfloat16() else "float32"
+
+
+def apply_profile(name):
+    """
+    Applique un profil d'entraînement (politique de précision globale, utilisée par les couches créées ensuite)
+    Renvoie la politique de précision et l'option jit_compile à passer à model.compile
+    """
+    if name not in PROFILES:
+        raise ValueError(f"Profil d'entraînement inconnu : {name} (profils : {', '.join(PROFILES)})")
+    profile = PROFILES[name]
+    policy = mixed_precision_policy() if profile["mixed_precision"] else "float32"
+    mixed_precision.set_global_policy(policy)
+    logging.info(f"Profil d'entraînement {name} : précision {policy}, jit_compile={profile['jit_compile']}")
+    return {"precision_policy": policy, "jit_compile": profile["jit_compile"]}
+
+
+def reset_profile():
+    """
+    Revient à la politique float32 par défaut
+    """
+    mixed_precision.set_global_policy("float32")
+
+
+def set_model_policy(model, policy):
+    """
+    Copie du modèle (poids compris) dont les couches calculent avec la politique demandée.
+    La couche de sortie reste en float32 pour que le softmax et la loss restent stables.
+    """
+    output_layer = model.layers[-1]
+
+    def clone_layer(layer):
+        config = layer.get_config()
+        config["dtype"] = "float32" if layer is output_layer else policy
+        return layer.__class__.from_config(config)
+
+    clone = clone_model(model, clone_function=clone_layer)
+    clone.set_weights(model.get_weights())
+    for layer, cloned_layer in zip(model.layers, clone.layers):
+        cloned_layer.trainable = layer.trainable
+    return clone
+
+
+class EpochTiming(Callback):
+    """
+    Mesure la durée et le débit (images/s) de chaque époque et les enregistre dans MLflow
+    pour comparer les profils d'entraînement
+    """
+
+    def __init__(self, samples):
+        super().__init__()
+        self.samples = samples
+        self.times = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.start_time = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        # La durée comprend la validation de fin d'époque
+        duration = time.perf_counter() - self.start_time
+        self.times.append(duration)
+        mlflow.log_metrics(
+            {"epoch_time": duration, "images_per_second": self.samples / duration}, step=epoch
+        )
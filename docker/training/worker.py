@@ -0,0 +1,62 @@
+import os
+import time
+import logging
+from training import (
+    job_queue, prepare_worker, train_model, batch_size, preprocessing_state_path, drift_monitor_state_path
+)
+from job_queue import JobProgress, JobCancelled, DONE, FAILED, CANCELLED
+
+# Délai (en secondes) entre deux vérifications de la file d'attente
+poll_interval = float(os.getenv("TRAINING_WORKER_POLL_INTERVAL", 5))
+
+
+def read_state(path):
+    """
+    État d'un container ("0" s'il n'a pas encore écrit son fichier d'état)
+    """
+    if not os.path.exists(path):
+        return "0"
+    with open(path, "r") as file:
+        return file.read().strip()
+
+
+def other_tasks_running():
+    """
+    Vérifie si le preprocessing ou le drift monitoring est en cours
+    """
+    return read_state(preprocessing_state_path) != "0" or read_state(drift_monitor_state_path) != "0"
+
+
+def run_job(job):
+    """
+    Lance l'entraînement d'un job et enregistre son résultat dans la file
+    """
+    logging.info(f"Job {job['id']} : démarrage de l'entraînement {job['params']}")
+    try:
+        train_model(**job["params"], callbacks=[JobProgress(job_queue, job["id"], batch_size)])
+        job_queue.finish(job["id"], DONE)
+    except JobCancelled:
+        job_queue.finish(job["id"], CANCELLED)
+    except Exception as e:
+        job_queue.finish(job["id"], FAILED, str(e))
+
+
+def main():
+    """
+    Boucle du worker : les entraînements de la file sont lancés un par un, hors du processus de l'API
+    """
+    prepare_worker()
+    logging.info("Worker d'entraînement démarré")
+    while True:
+        if other_tasks_running():
+            time.sleep(poll_interval)
+            continue
+        job = job_queue.claim_next()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+
+class PendingUploads:
+    """
+    Garde en mémoire les dernières images envoyées à /predict pour ne les écrire
+    sur le volume que si l'utilisateur les ajoute ensuite au dataset.
+    Au-delà de la taille maximum, les images les plus anciennes sont retirées de la mémoire
+    et écrites dans le dossier de débordement (temp_images) pour rester disponibles.
+    L'écriture est séparée de l'ajout (spill) pour pouvoir être faite hors de la boucle d'événements.
+    """
+
+    def __init__(self, max_bytes, spill_path=None):
+        """
+        max_bytes : mémoire maximum occupée par les images
+        spill_path : dossier où sont écrites les images retirées de la mémoire (oubliées si None)
+        """
+        self.max_bytes = max_bytes
+        self.spill_path = spill_path
+        self.total_bytes = 0
+        self.images = OrderedDict()
+        # Images retirées de la mémoire mais pas encore écrites : elles restent disponibles pour pop
+        self.spilling = dict()
+        self.lock = threading.Lock()
+
+    def add(self, file_name, content):
+        """
+        Ajoute une image (ou la remet en tête si elle est déjà présente).
+        Renvoie True si des images sont à écrire dans le dossier de débordement (voir spill).
+        """
+        with self.lock:
+            if file_name in self.images:
+                self.images.move_to_end(file_name)
+                return False
+            self.images[file_name] = content
+            self.total_bytes += len(content)
+            # On retire les images les plus anciennes si la taille maximum est dépassée
+            while self.total_bytes > self.max_bytes and len(self.images) > 1:
+                old_file_name, old_content = self.images.popitem(last=False)
+                self.total_bytes -= len(old_content)
+                if self.spill_path is not None:
+                    self.spilling[old_file_name] = old_content
+            return bool(self.spilling)
+
+    def spill(self):
+        """
+        Écrit dans le dossier de débordement les images retirées de la mémoire
+        """
+        with self.lock:
+            spilling = list(self.spilling.items())
+        for file_name, content in spilling:
+            file_path = os.path.join(self.spill_path, file_name)
+            try:
+                if not os.path.exists(file_path):
+                    # Écriture à côté puis renommage : un fichier présent est toujours complet
+                    with open(file_path + ".tmp", "wb") as image_file:
+                        image_file.write(content)
+                    os.replace(file_path + ".tmp", file_path)
+            except OSError as e:
+                logging.error(f"Impossible d'écrire l'image {file_name} dans {self.spill_path}: {str(e)}")
+            with self.lock:
+                self.spilling.pop(file_name, None)
+
+    def pop(self, file_name):
+        """
+        Retire et renvoie une image, ou None si elle n'est plus en mémoire
+        """
+        with self.lock:
+            content = self.images.pop(file_name, None)
+            if content is not None:
+                self.total_bytes -= len(content)
+                return content
+            return self.spilling.pop(file_name, None)
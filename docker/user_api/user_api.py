@@ -6,9 +6,11 @@ from fastapi import (
     File,
     UploadFile,
     Header,
-    Form
+    Form,
+    BackgroundTasks
 )
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional
 from pydantic import BaseModel
 from datetime import datetime, timedelta
@@ -20,10 +22,12 @@ import logging
 
 # from app.models.predictClass import predictClass
 from fastapi.responses import FileResponse, PlainTextResponse
-import requests
 import hashlib
 import time
 import pandas as pd
+from http_client import UpstreamClient
+from pending_uploads import PendingUploads
+from prediction_cache import PredictionCache
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -47,6 +51,7 @@ state_folder = os.path.join(volume_path, "containers_state")
 preprocessing_state_path = os.path.join(state_folder, "preprocessing_state.txt")
 temp_folder = os.path.join(volume_path, "temp_images")
 unknown_images_path = os.path.join(volume_path, "unknown_images")
+prod_model_id_path = os.path.join(volume_path, "mlruns", "prod_model_id.txt")
 
 
 # On créer les dossiers si nécessaire
@@ -64,6 +69,19 @@ logging.basicConfig(
 
 # On définit les variables d'environnement
 API_KEY = os.getenv("API_KEY")
+# Si activé, les images envoyées sont aussi écrites dans temp_images en arrière-plan
+# (utile pour la route /add_image de l'API administrateur)
+KEEP_TEMP_IMAGES = os.getenv("KEEP_TEMP_IMAGES", "0") == "1"
+# Taille maximum (en Mo) des images gardées en mémoire en attente d'un éventuel /add_image
+PENDING_UPLOADS_MAX_MB = float(os.getenv("PENDING_UPLOADS_MAX_MB", 64))
+# Nombre maximum de prédictions envoyées simultanément au conteneur d'inférence
+INFERENCE_MAX_CONCURRENCY = int(os.getenv("INFERENCE_MAX_CONCURRENCY", 32))
+# Si activé, les prédictions déjà connues sont servies sans appeler le conteneur d'inférence
+# (elles n'apparaissent alors pas dans l'historique des inférences)
+USER_API_PREDICTION_CACHE = os.getenv("USER_API_PREDICTION_CACHE", "0") == "1"
+# Taille du cache des prédictions (nombre d'entrées et mémoire en Mo)
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", 10000))
+PREDICTION_CACHE_MAX_MB = float(os.getenv("PREDICTION_CACHE_MAX_MB", 16))
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
@@ -82,6 +100,85 @@ def load_authorized_users():
 # ----------------------------------------------------------------------------------------- #
 
 
+# Les images retirées de la mémoire sont écrites dans temp_images pour rester disponibles pour /add_image
+pending_uploads = PendingUploads(max_bytes=PENDING_UPLOADS_MAX_MB * 1024 * 1024, spill_path=temp_folder)
+
+# On garde les dernières prédictions pour ne pas renvoyer une image déjà vue au conteneur d'inférence
+prediction_cache = PredictionCache(
+    max_entries=PREDICTION_CACHE_MAX_ENTRIES, max_bytes=PREDICTION_CACHE_MAX_MB * 1024 * 1024
+)
+# Dernier run_id lu dans prod_model_id.txt et date de modification du fichier correspondante
+prod_run_id_state = {"mtime": None, "run_id": None}
+
+# Client HTTP partagé vers le conteneur d'inférence (connexions réutilisées entre les requêtes)
+inference_client = UpstreamClient(
+    "http://inference:5500",
+    max_concurrency=INFERENCE_MAX_CONCURRENCY,
+    timeouts={"/predict": 30},
+)
+
+
+def save_image(content, file_path):
+    """
+    Écrit une image sur le volume
+    """
+    with open(file_path, "wb") as image_file:
+        image_file.write(content)
+
+
+def store_uploaded_image(image_name, destination_path):
+    """
+    Enregistre une image envoyée à /predict à son emplacement définitif :
+    depuis la mémoire si elle y est encore, sinon depuis le dossier temp_images
+    """
+    content = pending_uploads.pop(image_name)
+    if content is not None:
+        save_image(content, destination_path)
+        # On supprime l'éventuelle copie écrite en arrière-plan
+        temp_file_path = os.path.join(temp_folder, image_name)
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+    else:
+        temp_file_path = os.path.join(temp_folder, image_name)
+        # L'image n'est plus disponible (redémarrage de l'API ou nom inconnu)
+        if not os.path.exists(temp_file_path):
+            logging.warning(f"Image {image_name} introuvable pour /add_image")
+            raise HTTPException(
+                status_code=410,
+                detail="L'image n'est plus disponible, merci de l'envoyer à nouveau avec /predict",
+            )
+        os.rename(temp_file_path, destination_path)
+
+
+def upstream_error_detail(response):
+    """
+    Message d'erreur renvoyé par le conteneur d'inférence (le corps peut ne pas être du JSON,
+    par exemple une erreur du serveur ou d'un proxy)
+    """
+    try:
+        return response.json().get("detail", "Erreur du conteneur d'inférence")
+    except (ValueError, AttributeError):
+        return response.text or "Erreur du conteneur d'inférence"
+
+
+def get_prod_run_id():
+    """
+    Renvoie le run_id du modèle en production. Le fichier n'est relu que s'il a été modifié,
+    et le cache des prédictions est vidé lorsque le modèle change.
+    """
+    try:
+        mtime = os.stat(prod_model_id_path).st_mtime
+    except FileNotFoundError:
+        return None
+    if mtime != prod_run_id_state["mtime"]:
+        with open(prod_model_id_path, "r") as file:
+            run_id = file.read()
+        if prod_run_id_state["run_id"] is not None and run_id != prod_run_id_state["run_id"]:
+            prediction_cache.clear()
+        prod_run_id_state.update(mtime=mtime, run_id=run_id)
+    return prod_run_id_state["run_id"]
+
+
 # On utilise le modèle Pydantic pour le token
 class Token(BaseModel):
     access_token: str
@@ -166,6 +263,16 @@ def update_authorized_users(users):
 # ----------------------------------------------------------------------------------------- #
 
 
+@app.on_event("startup")
+async def start_http_clients():
+    inference_client.start()
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    await inference_client.close()
+
+
 # Route pour obtenir un token
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
@@ -235,6 +342,7 @@ async def get_status(
 # Route pour faire une prédiction
 @app.post("/predict")
 async def predict(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     api_key: str = Depends(verify_api_key),
     current_user: str = Depends(verify_token),
@@ -244,17 +352,55 @@ async def predict(
         # On lit le fichier envoyé
         content = await file.read()
         # On lui donne un nom unique basé sur son hash
-        file_name = hashlib.sha256(content).hexdigest() + ".jpg"
-        # On enregistre le fichier sur le volume
-        file_path = os.path.join(temp_path, file_name)
-        with open(file_path, "wb") as image_file:
-            image_file.write(content)
-        # On envoie la requête au conteneur d'inférence avec le nom de l'image qu'il doit récupérer
-        response = requests.get(
-            "http://inference:5500/predict", params={"file_name": file_name}
+        content_hash = hashlib.sha256(content).hexdigest()
+        file_name = content_hash + ".jpg"
+        # On garde l'image en mémoire, elle ne sera écrite sur le volume qu'en cas d'appel à /add_image
+        if pending_uploads.add(file_name, content):
+            # Les images retirées de la mémoire sont écrites dans temp_images hors de la boucle d'événements
+            await run_in_threadpool(pending_uploads.spill)
+        if KEEP_TEMP_IMAGES:
+            # L'écriture sur le volume se fait après l'envoi de la réponse
+            background_tasks.add_task(save_image, content, os.path.join(temp_path, file_name))
+
+        # Si cette image a déjà été prédite par le modèle en production, on renvoie la prédiction connue
+        # (sans le cache, le conteneur d'inférence sert la prédiction depuis son propre cache et l'enregistre)
+        run_id = get_prod_run_id() if USER_API_PREDICTION_CACHE else None
+        cached_prediction = prediction_cache.get(content_hash, run_id) if run_id else None
+        if cached_prediction is not None:
+            logging.info(f"Prédiction servie depuis le cache de l'API pour {file_name} (modèle {run_id})")
+            return {**cached_prediction, "filename": file_name}
+
+        start_time = time.time()
+        # On envoie directement l'image au conteneur d'inférence, qui la décode en mémoire
+        # (la prédiction est idempotente, elle peut donc être retentée)
+        response = await inference_client.post(
+            "/predict",
+            params={"file_name": file_name},
+            content=content,
+            headers={"Content-Type": "application/octet-stream"},
+            idempotent=True,
         )
-        return response.json()
+        if response.status_code != 200:
+            # On transmet l'indication de délai si le conteneur d'inférence est saturé
+            retry_after = response.headers.get("Retry-After")
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=upstream_error_detail(response),
+                headers={"Retry-After": retry_after} if retry_after else None,
+            )
+        prediction = response.json()
+        # On ne garde la prédiction que si elle vient bien du modèle en production
+        if run_id is not None and prediction.get("run_id") == run_id:
+            prediction_cache.put(
+                content_hash,
+                run_id,
+                {key: prediction[key] for key in ("predictions", "scores", "run_id")},
+                time.time() - start_time,
+            )
+        return prediction
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Erreur lors de la prédiction: {str(e)}")
         raise HTTPException(
@@ -262,6 +408,14 @@ async def predict(
         )
 
 
+# Route pour suivre l'efficacité du cache des prédictions
+@app.get("/metrics")
+async def metrics(
+    api_key: str = Depends(verify_api_key), username: str = Depends(verify_token)
+):
+    return {"prediction_cache": prediction_cache.get_stats()}
+
+
 # Route pour obtenir la liste des espèces
 @app.get("/get_species")
 async def get_species(
@@ -340,21 +494,21 @@ async def add_image(
         with open(preprocessing_state_path, "r") as file:
             preprocessing_state = file.read()
         if preprocessing_state != "2":
-            # On créer le chemin vers l'image
-            file_path = os.path.join(temp_folder, image_name)
             # Si la classe est inconnue, on l'ajoute dans le dossier des images inconnues
             if is_unknown:
-                os.rename(file_path, f"{unknown_images_path}/{image_name}")
+                store_uploaded_image(image_name, f"{unknown_images_path}/{image_name}")
                 return {"status": "Image ajoutée dans les images inconnues"}
             # Si la classe est connue, on l'ajoute dans train au bon endroit
             else:
                 class_path = os.path.join(dataset_raw_path, f"train/{species}")
                 if not os.path.exists(class_path):
                     os.makedirs(class_path, exist_ok=True)
-                os.rename(file_path, f"{class_path}/{image_name}")
+                store_uploaded_image(image_name, f"{class_path}/{image_name}")
                 return {"status": f"Image ajouteé dans l'espèce suivante: '{species}'"}
         else:
             return "Le dataset de base n'est pas encore présent, merci de patienter..."
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Une erreur est survenue lors de l'ajout de l'image: {str(e)}")
         raise HTTPException(
@@ -3,19 +3,32 @@ import os
 from datetime import datetime, timedelta
 import numpy as np
 from app.utils.logger import setup_logger
+from monitoring.prediction_store import get_store
 
 logger = setup_logger("drift_monitor", "drift_monitor.log")
 
 
 class DriftMonitor:
-    def __init__(self, train_data_path="data/train"):
+    def __init__(self, train_data_path="data/train", store=None):
         self.train_data_path = train_data_path
+        # Journal des prédictions en colonnes (Parquet), partitionné par jour (ouvert au premier usage)
+        self._store = store
         self.initial_class_counts = self.get_initial_class_counts()
         self.average_class_size = np.mean(list(self.initial_class_counts.values())) if self.initial_class_counts else 0
         self.class_increase_threshold = 1.05  # 5% d'augmentation
         self.new_class_threshold = max(10, int(0.03 * self.average_class_size))
         self.confidence_drop_threshold = 0.03
 
+    @property
+    def store(self):
+        """
+        Journal des prédictions : sans journal fourni, celui par défaut n'est ouvert (et son dossier créé)
+        qu'au premier enregistrement ou à la première lecture
+        """
+        if self._store is None:
+            self._store = get_store()
+        return self._store
+
     def get_initial_class_counts(self):
         class_counts = {}
         for class_name in os.listdir(self.train_data_path):
@@ -27,24 +40,29 @@ class DriftMonitor:
         logger.info(f"Comptages initiaux des classes : {class_counts}")
         return class_counts
 
-    def get_current_log_file(self):
-        timestamp = datetime.now().strftime("%Y%m%d")
-        return f"logs/performance_logs_{timestamp}.csv"
-
-    def check_drift(self, log_file=None):
-        if log_file is None:
-            log_file = self.get_current_log_file()
+    def check_drift(self, log_file=None, start=None, end=None):
+        """
+        Détecte un drift à partir d'un fichier CSV de logs, ou sinon à partir des compteurs
+        du journal des prédictions entre start et end (la journée en cours par défaut)
+        """
+        if log_file is not None:
+            if not os.path.exists(log_file) or os.stat(log_file).st_size == 0:
+                logger.warning(f"Le fichier de log {log_file} n'existe pas ou est vide.")
+                return False, "Pas assez de données pour détecter un drift"
+            df = pd.read_csv(log_file, usecols=["date", "predicted_class", "confidence"])
+            current_class_counts = df["predicted_class"].value_counts().to_dict()
+            recent_confidence, past_confidence = self.get_confidences_from_frame(df)
+        else:
+            # Les compteurs sont tenus à jour à chaque prédiction : pas besoin de relire les logs
+            current_class_counts, recent_confidence, past_confidence = self.get_counts_from_store(start, end)
 
-        if not os.path.exists(log_file) or os.stat(log_file).st_size == 0:
-            logger.warning(f"Le fichier de log {log_file} n'existe pas ou est vide.")
+        if not current_class_counts:
+            logger.warning("Aucune prédiction enregistrée sur la période.")
             return False, "Pas assez de données pour détecter un drift"
 
-        df = pd.read_csv(log_file)
         drift_detected = False
         drift_reasons = []
 
-        # Calculer les comptes de classes à partir du fichier de log
-        current_class_counts = df["predicted_class"].value_counts().to_dict()
         logger.info(f"Comptages actuels des classes : {current_class_counts}")
 
         for class_name, initial_count in self.initial_class_counts.items():
@@ -62,10 +80,7 @@ class DriftMonitor:
                 drift_detected = True
                 drift_reasons.append(f"Nouvelle classe détectée: {new_class} avec {new_class_count} images")
 
-        recent_df = df[df["date"] >= (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")]
-        if not recent_df.empty:
-            recent_confidence = recent_df["confidence"].mean()
-            past_confidence = df[df["date"] < recent_df["date"].min()]["confidence"].mean()
+        if recent_confidence is not None:
             logger.info(f"Confiance récente: {recent_confidence}, Confiance passée: {past_confidence}")
 
             if recent_confidence < past_confidence - self.confidence_drop_threshold:
@@ -78,3 +93,41 @@ class DriftMonitor:
             logger.info("Aucun drift détecté")
 
         return drift_detected, (drift_reasons if drift_detected else "Aucun drift détecté")
+
+    def get_confidences_from_frame(self, df):
+        """
+        Renvoie la confiance moyenne depuis la veille et la confiance moyenne avant
+        """
+        recent_df = df[df["date"] >= (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")]
+        if recent_df.empty:
+            return None, None
+        recent_confidence = recent_df["confidence"].mean()
+        past_confidence = df[df["date"] < recent_df["date"].min()]["confidence"].mean()
+        return recent_confidence, past_confidence
+
+    def get_counts_from_store(self, start=None, end=None):
+        """
+        Renvoie, à partir des compteurs du journal, le nombre de prédictions par classe sur la période,
+        la confiance moyenne depuis la veille et la confiance moyenne avant
+        """
+        if start is None and end is None:
+            start = datetime.combine(datetime.now().date(), datetime.min.time())
+        summary = self.store.summarize(start, end)
+        current_class_counts = {
+            class_name: class_summary["predicted"]
+            for class_name, class_summary in summary["classes"].items()
+            if class_summary["predicted"]
+        }
+
+        recent_start = datetime.combine((datetime.now() - timedelta(days=1)).date(), datetime.min.time())
+        recent = self.store.summarize(recent_start if start is None else max(start, recent_start), end)
+        if recent["count"] == 0:
+            return current_class_counts, None, None
+        recent_confidence = recent["confidence_sum"] / recent["count"]
+
+        past_confidence = np.nan
+        if start is None or start < recent_start:
+            past = self.store.summarize(start, recent_start if end is None else min(end, recent_start))
+            if past["count"]:
+                past_confidence = past["confidence_sum"] / past["count"]
+        return current_class_counts, recent_confidence, past_confidence
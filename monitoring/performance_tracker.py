@@ -1,80 +1,93 @@
 import pandas as pd
-from datetime import datetime
 from app.utils.data_manager import DataManager
 from app.utils.logger import setup_logger
+from monitoring.prediction_store import get_store
 
 logger = setup_logger("performance_tracker", "performance_tracker.log")
 
 
 class PerformanceTracker:
-    def __init__(self):
+    def __init__(self, store=None):
         self.data_manager = DataManager()
         self.class_names = self.data_manager.get_class_names()
-        self.current_log_file = None
+        # Journal des prédictions en colonnes (Parquet), partitionné par jour (ouvert au premier usage)
+        self._store = store
         logger.info(f"PerformanceTracker initialized with {len(self.class_names)} classes")
 
-    def get_current_log_file(self):
-        timestamp = datetime.now().strftime("%Y%m%d")
-        return f"logs/performance_logs_{timestamp}.csv"
+    @property
+    def store(self):
+        """
+        Journal des prédictions : sans journal fourni, celui par défaut n'est ouvert (et son dossier créé)
+        qu'au premier enregistrement ou à la première lecture
+        """
+        if self._store is None:
+            self._store = get_store()
+        return self._store
 
     def log_prediction(self, predicted_class, confidence, true_class=None):
-        log_file = self.get_current_log_file()
-
-        new_log = pd.DataFrame(
-            {
-                "date": [datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-                "predicted_class": [predicted_class],
-                "confidence": [confidence],
-                "true_class": [true_class],
-            }
-        )
-
         try:
-            if log_file != self.current_log_file:
-                self.current_log_file = log_file
-                new_log.to_csv(log_file, index=False)
-            else:
-                new_log.to_csv(log_file, mode="a", header=False, index=False)
+            self.store.append(predicted_class, confidence, true_class=true_class)
             logger.info(
                 f"Prédiction enregistrée : {predicted_class}, confidence: {confidence}, true_class: {true_class}"
             )
         except Exception as e:
             logger.error(f"Erreur lors de l'enregistrement de la prédiction: {str(e)}")
 
-    def get_performance_metrics(self, log_file=None):
+    def get_performance_metrics(self, log_file=None, start=None, end=None):
+        """
+        Calcule la précision à partir d'un fichier CSV de logs, ou sinon à partir des compteurs
+        du journal des prédictions entre start et end (la journée en cours par défaut)
+        """
         if log_file is None:
-            log_file = self.get_current_log_file()
-
-        logger.info(f"Tentative de lecture du fichier de log : {log_file}")
-
-        try:
-            df = pd.read_csv(log_file)
-            logger.info(f"Fichier de log lu avec succès. Nombre de lignes : {len(df)}")
-        except FileNotFoundError:
-            logger.warning(f"Fichier de logs {log_file} non trouvé.")
-            return None, {}
-
-        if df.empty:
-            logger.warning("Le fichier de logs est vide.")
+            # Les compteurs sont tenus à jour à chaque prédiction : pas besoin de relire les logs
+            summary = self.store.summarize(start, end)
+        else:
+            logger.info(f"Tentative de lecture du fichier de log : {log_file}")
+            try:
+                df = pd.read_csv(log_file, usecols=["predicted_class", "true_class"])
+                logger.info(f"Fichier de log lu avec succès. Nombre de lignes : {len(df)}")
+            except FileNotFoundError:
+                logger.warning(f"Fichier de logs {log_file} non trouvé.")
+                return None, {}
+            summary = self.summarize_frame(df)
+
+        if summary["count"] == 0:
+            logger.warning("Aucune prédiction n'a été enregistrée.")
             return None, {}
 
-        # Filtrer les entrées sans vraie classe
-        df = df.dropna(subset=["true_class"])
-
-        if df.empty:
+        # Seules les entrées avec une vraie classe sont prises en compte
+        if summary["labelled"] == 0:
             logger.warning("Aucune entrée avec une vraie classe n'a été trouvée.")
             return None, {}
 
-        overall_accuracy = (df["predicted_class"] == df["true_class"]).mean()
+        overall_accuracy = summary["correct"] / summary["labelled"]
         logger.info(f"Précision globale calculée : {overall_accuracy}")
 
         class_accuracies = {}
         for class_name in self.class_names:
-            class_df = df[df["true_class"] == class_name]
-            if not class_df.empty:
-                class_accuracies[class_name] = (class_df["predicted_class"] == class_df["true_class"]).mean()
+            class_summary = summary["classes"].get(class_name)
+            if class_summary and class_summary["true"]:
+                class_accuracies[class_name] = class_summary["correct"] / class_summary["true"]
             else:
                 class_accuracies[class_name] = None
 
         logger.info(f"Précisions par classe calculées : {class_accuracies}")
         return overall_accuracy, class_accuracies
+
+    @staticmethod
+    def summarize_frame(df):
+        """
+        Calcule les mêmes compteurs que le journal des prédictions à partir d'un DataFrame
+        """
+        labelled = df.dropna(subset=["true_class"])
+        correct = labelled["predicted_class"] == labelled["true_class"]
+        per_class = correct.groupby(labelled["true_class"]).agg(["size", "sum"])
+        return {
+            "count": len(df),
+            "labelled": len(labelled),
+            "correct": int(correct.sum()),
+            "classes": {
+                class_name: {"true": int(size), "correct": int(nb_correct)}
+                for class_name, (size, nb_correct) in per_class.iterrows()
+            },
+        }
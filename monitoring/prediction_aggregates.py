@@ -0,0 +1,182 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+try:
+    import fcntl
+except ImportError:
+    # Pas de verrou entre processus sous Windows : les écritures concurrentes restent fusionnées,
+    # mais sans garantie si deux processus sauvegardent au même instant
+    fcntl = None
+
+
+def empty_summary():
+    return {"count": 0, "confidence_sum": 0.0, "labelled": 0, "correct": 0, "classes": {}}
+
+
+def empty_class():
+    return {"predicted": 0, "confidence_sum": 0.0, "true": 0, "correct": 0}
+
+
+def add_summary(total, summary):
+    """
+    Ajoute les compteurs d'une journée (ou d'une période) à total
+    """
+    for key in ("count", "confidence_sum", "labelled", "correct"):
+        total[key] += summary[key]
+    for class_name, class_summary in summary["classes"].items():
+        class_total = total["classes"].setdefault(class_name, empty_class())
+        for key, value in class_summary.items():
+            class_total[key] += value
+
+
+class PredictionAggregates:
+    """
+    Compteurs par jour et par classe, mis à jour à chaque prédiction : nombre de prédictions,
+    somme des confiances, nombre de prédictions étiquetées et correctes.
+    Les vérifications de précision et de drift lisent ces compteurs au lieu de relire les logs.
+    Plusieurs processus peuvent partager le même fichier : chacun y ajoute, à la sauvegarde,
+    les compteurs accumulés depuis sa dernière sauvegarde.
+    """
+
+    def __init__(self, path):
+        """
+        path : fichier JSON dans lequel les compteurs sont sauvegardés
+        """
+        self.path = path
+        self.days = defaultdict(empty_summary)
+        # Compteurs pas encore ajoutés au fichier
+        self.pending = defaultdict(empty_summary)
+        self.lock = threading.Lock()
+
+    def add(self, day, predicted_class, confidence, true_class=None):
+        """
+        Met à jour les compteurs avec une prédiction
+        """
+        with self.lock:
+            for days in (self.days, self.pending):
+                summary = days[day]
+                predicted = summary["classes"].setdefault(predicted_class, empty_class())
+                summary["count"] += 1
+                summary["confidence_sum"] += confidence
+                predicted["predicted"] += 1
+                predicted["confidence_sum"] += confidence
+                if true_class is not None:
+                    true = summary["classes"].setdefault(true_class, empty_class())
+                    summary["labelled"] += 1
+                    true["true"] += 1
+                    if predicted_class == true_class:
+                        summary["correct"] += 1
+                        true["correct"] += 1
+
+    def add_frame(self, df):
+        """
+        Met à jour les compteurs avec un DataFrame de prédictions (colonnes date, predicted_class,
+        confidence, true_class), agrégé par jour et par classe sans parcourir les lignes
+        """
+        if df.empty:
+            return
+        df = df.assign(
+            day=df["date"].dt.strftime("%Y-%m-%d"),
+            labelled=df["true_class"].notna(),
+            correct=df["predicted_class"] == df["true_class"],
+        )
+        predicted = df.groupby(["day", "predicted_class"])["confidence"].agg(["size", "sum"])
+        true = df[df["labelled"]].groupby(["day", "true_class"])["correct"].agg(["size", "sum"])
+        frame_days = defaultdict(empty_summary)
+        for (day, class_name), (size, confidence_sum) in predicted.iterrows():
+            summary = frame_days[day]
+            class_summary = summary["classes"].setdefault(class_name, empty_class())
+            summary["count"] += int(size)
+            summary["confidence_sum"] += float(confidence_sum)
+            class_summary["predicted"] += int(size)
+            class_summary["confidence_sum"] += float(confidence_sum)
+        for (day, class_name), (size, correct) in true.iterrows():
+            summary = frame_days[day]
+            class_summary = summary["classes"].setdefault(class_name, empty_class())
+            summary["labelled"] += int(size)
+            summary["correct"] += int(correct)
+            class_summary["true"] += int(size)
+            class_summary["correct"] += int(correct)
+        with self.lock:
+            for day, summary in frame_days.items():
+                add_summary(self.days[day], summary)
+                add_summary(self.pending[day], summary)
+
+    def summarize(self, days):
+        """
+        Additionne les compteurs des jours demandés
+        """
+        total = empty_summary()
+        with self.lock:
+            for day in days:
+                summary = self.days.get(day)
+                if summary is not None:
+                    add_summary(total, summary)
+        return total
+
+    @contextmanager
+    def file_lock(self):
+        """
+        Verrou entre processus autour de la lecture et de l'écriture du fichier
+        """
+        with open(self.path + ".lock", "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self):
+        """
+        Compteurs enregistrés dans le fichier, None s'il n'existe pas
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r") as file:
+            return json.load(file)
+
+    def write(self, days):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(json.dumps(days))
+        os.replace(temp_path, self.path)
+
+    def save(self):
+        """
+        Ajoute les nouveaux compteurs à ceux du fichier (éventuellement mis à jour par d'autres processus)
+        pour ne pas avoir à relire les logs au redémarrage. Les compteurs en mémoire sont remplacés
+        par le total enregistré.
+        """
+        with self.lock, self.file_lock():
+            days = defaultdict(empty_summary, self.read() or {})
+            for day, summary in self.pending.items():
+                add_summary(days[day], summary)
+            self.write(days)
+            self.days = days
+            self.pending = defaultdict(empty_summary)
+
+    def load(self, build=None):
+        """
+        Recharge les compteurs sauvegardés. S'il n'y en a pas, renvoie False,
+        ou les calcule avec build (qui renvoie un DataFrame de prédictions) et les sauvegarde.
+        """
+        with self.file_lock():
+            days = self.read()
+            if days is None:
+                if build is None:
+                    return False
+                # Le fichier est créé avant de relâcher le verrou : un seul processus recalcule les compteurs
+                self.add_frame(build())
+                with self.lock:
+                    self.write(self.days)
+                    self.pending = defaultdict(empty_summary)
+                return True
+        with self.lock:
+            self.days = defaultdict(empty_summary, days)
+            self.pending = defaultdict(empty_summary)
+        return True
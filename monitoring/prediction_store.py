@@ -0,0 +1,179 @@
+import os
+import time
+import uuid
+import atexit
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from app.utils.logger import setup_logger
+from monitoring.prediction_aggregates import PredictionAggregates
+
+logger = setup_logger("prediction_store", "prediction_store.log")
+
+SCHEMA = pa.schema(
+    [
+        ("date", pa.timestamp("s")),
+        ("predicted_class", pa.string()),
+        ("confidence", pa.float64()),
+        ("true_class", pa.string()),
+    ]
+)
+PARTITIONING = ds.partitioning(pa.schema([("day", pa.string())]), flavor="hive")
+# Schéma lu : les colonnes des fichiers et le jour, déduit du nom de la partition
+DATASET_SCHEMA = SCHEMA.append(pa.field("day", pa.string()))
+
+# Une seule instance par dossier, pour que les lignes en mémoire soient visibles de tous les lecteurs
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(root="logs/predictions"):
+    """
+    Renvoie le journal des prédictions associé à un dossier
+    """
+    root = os.path.abspath(root)
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = PredictionStore(root)
+        return _stores[root]
+
+
+class PredictionStore:
+    """
+    Journal des prédictions en colonnes, au format Parquet, partitionné par jour (day=AAAA-MM-JJ).
+    Les prédictions sont gardées en mémoire puis écrites par groupes de lignes.
+    Les requêtes ne lisent que les colonnes et les jours demandés.
+    Des compteurs par jour et par classe sont tenus à jour à chaque prédiction.
+    """
+
+    def __init__(self, root="logs/predictions", row_group_size=1000, flush_interval=60):
+        self.root = root
+        self.row_group_size = row_group_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        # Les compteurs sont rechargés au démarrage. S'ils n'existent pas encore,
+        # on les calcule une seule fois à partir des prédictions déjà enregistrées
+        self.aggregates = PredictionAggregates(os.path.join(self.root, "aggregates.json"))
+        self.aggregates.load(build=self.query)
+        # Les lignes encore en mémoire sont écrites à la fin du programme
+        atexit.register(self.flush)
+
+    def append(self, predicted_class, confidence, true_class=None, date=None):
+        """
+        Ajoute une prédiction, écrite sur le disque avec le prochain groupe de lignes
+        """
+        row = {
+            "date": (date or datetime.now()).replace(microsecond=0),
+            "predicted_class": predicted_class,
+            "confidence": float(confidence),
+            "true_class": true_class,
+        }
+        self.aggregates.add(row["date"].strftime("%Y-%m-%d"), predicted_class, row["confidence"], true_class)
+        with self.lock:
+            self.buffer.append(row)
+            full = len(self.buffer) >= self.row_group_size
+        if full or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Écrit les prédictions en mémoire, un fichier Parquet par jour concerné
+        """
+        with self.lock:
+            rows, self.buffer = self.buffer, []
+            self.last_flush = time.monotonic()
+        if not rows:
+            return
+        df = pd.DataFrame(rows)
+        for day, day_df in df.groupby(df["date"].dt.strftime("%Y-%m-%d")):
+            partition = os.path.join(self.root, f"day={day}")
+            os.makedirs(partition, exist_ok=True)
+            table = pa.Table.from_pandas(day_df, schema=SCHEMA, preserve_index=False)
+            filename = f"part-{datetime.now().strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+            pq.write_table(table, os.path.join(partition, filename))
+        self.aggregates.save()
+        logger.info(f"{len(rows)} prédiction(s) écrite(s) dans {self.root}")
+
+    def query(self, columns=None, start=None, end=None):
+        """
+        Renvoie les prédictions entre start (inclus) et end (exclu) sous forme de DataFrame,
+        en ne lisant que les colonnes et les partitions nécessaires
+        """
+        columns = columns or SCHEMA.names
+        frames = []
+
+        files = [
+            os.path.join(folder, file)
+            for folder, _, folder_files in os.walk(self.root)
+            for file in folder_files
+            if file.endswith(".parquet")
+        ]
+        if files:
+            dataset = ds.dataset(
+                files,
+                schema=DATASET_SCHEMA,
+                format="parquet",
+                partitioning=PARTITIONING,
+                partition_base_dir=self.root,
+            )
+            filters = []
+            # Le filtre sur le jour permet de ne pas ouvrir les fichiers des autres partitions
+            if start is not None:
+                filters += [ds.field("day") >= start.strftime("%Y-%m-%d"), ds.field("date") >= start]
+            if end is not None:
+                filters += [ds.field("day") <= end.strftime("%Y-%m-%d"), ds.field("date") < end]
+            dataset_filter = None
+            for condition in filters:
+                dataset_filter = condition if dataset_filter is None else dataset_filter & condition
+            frames.append(dataset.to_table(columns=columns, filter=dataset_filter).to_pandas())
+
+        # On ajoute les prédictions pas encore écrites
+        with self.lock:
+            buffered = pd.DataFrame(self.buffer, columns=SCHEMA.names)
+        if not buffered.empty:
+            if start is not None:
+                buffered = buffered[buffered["date"] >= start]
+            if end is not None:
+                buffered = buffered[buffered["date"] < end]
+            frames.append(buffered[columns])
+
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def query_day(self, day=None, columns=None):
+        """
+        Renvoie les prédictions d'une journée (aujourd'hui par défaut)
+        """
+        start = datetime.combine((day or datetime.now()).date(), datetime.min.time())
+        return self.query(columns=columns, start=start, end=start + timedelta(days=1))
+
+    def summarize(self, start=None, end=None):
+        """
+        Renvoie les compteurs des prédictions entre start (inclus) et end (exclu),
+        la journée en cours par défaut. Si les bornes tombent sur des jours entiers,
+        seuls les compteurs sont lus, sinon les prédictions de la période sont relues.
+        """
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        if start is None and end is None:
+            start = today
+        if start is None:
+            days = sorted(self.aggregates.days)
+            start = datetime.strptime(days[0], "%Y-%m-%d") if days else today
+        if end is None:
+            end = today + timedelta(days=1)
+
+        if start.time() == datetime.min.time() and end.time() == datetime.min.time():
+            days = [(start + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range((end - start).days)]
+            return self.aggregates.summarize(days)
+
+        period = PredictionAggregates(None)
+        period.add_frame(self.query(start=start, end=end))
+        return period.summarize(period.days)
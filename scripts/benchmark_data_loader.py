@@ -0,0 +1,76 @@
+import sys
+import os
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tensorflow.keras.preprocessing.image import ImageDataGenerator
+from training.data_loader import ImageDataset, AUGMENTATION
+from app.utils.logger import setup_logger
+
+logger = setup_logger("benchmark_data_loader", "benchmark_data_loader.log")
+
+
+def measure(batches, max_batches, warmup=1):
+    """
+    Mesure le débit (images/s) d'un itérable de lots (images, étiquettes), depuis la création
+    de l'itérateur (remplissage du tampon de mélange compris)
+    """
+    # Un premier passage court, non mesuré, prépare les fonctions TensorFlow
+    iterator = iter(batches)
+    for _ in range(warmup):
+        next(iterator)
+    del iterator
+
+    images = 0
+    start_time = time.perf_counter()
+    iterator = iter(batches)
+    for _ in range(max_batches):
+        try:
+            batch, _ = next(iterator)
+        except StopIteration:
+            break
+        images += len(batch)
+    return images / (time.perf_counter() - start_time)
+
+
+def run_benchmark(data_path, batch_size=16, max_batches=50, augment=True, cache_dir=None, shards_dir=None):
+    results = {}
+
+    # Ancien chargement : ImageDataGenerator.flow_from_directory
+    datagen = ImageDataGenerator(**AUGMENTATION, fill_mode="nearest") if augment else ImageDataGenerator()
+    generator = datagen.flow_from_directory(data_path, target_size=(224, 224), batch_size=batch_size)
+    results["ImageDataGenerator"] = measure(generator, max_batches)
+
+    # Nouveau chargement : tf.data (sans puis avec le cache, lu au deuxième passage)
+    dataset = ImageDataset(data_path, batch_size=batch_size, augment=augment, shuffle=True)
+    results["tf.data"] = measure(dataset.dataset, max_batches)
+    if cache_dir:
+        cached = ImageDataset(data_path, batch_size=batch_size, augment=augment, shuffle=True, cache_dir=cache_dir)
+        for _ in cached.dataset:
+            pass
+        results["tf.data (cache)"] = measure(cached.dataset, max_batches)
+    if shards_dir:
+        # Images décodées par le preprocessing (write_shards)
+        sharded = ImageDataset(data_path, batch_size=batch_size, augment=augment, shuffle=True, shards_dir=shards_dir)
+        if sharded.shards is not None:
+            results["tf.data (shards)"] = measure(sharded.dataset, max_batches)
+
+    for name, images_per_second in results.items():
+        message = f"{name:<20} {images_per_second:.1f} images/s"
+        logger.info(message)
+        print(message)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare le débit de l'ancien et du nouveau chargement des images")
+    parser.add_argument("--data_path", default="data/train", help="Dossier contenant un sous-dossier par classe")
+    parser.add_argument("--batch_size", type=int, default=16, help="Taille des lots")
+    parser.add_argument("--batches", type=int, default=50, help="Nombre de lots mesurés")
+    parser.add_argument("--no_augment", action="store_true", help="Désactive l'augmentation des données")
+    parser.add_argument("--cache_dir", default=None, help="Dossier du cache des images décodées (optionnel)")
+    parser.add_argument("--shards_dir", default=None, help="Dossier des images décodées par le preprocessing")
+    args = parser.parse_args()
+    run_benchmark(args.data_path, args.batch_size, args.batches, not args.no_augment, args.cache_dir, args.shards_dir)
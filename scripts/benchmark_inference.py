@@ -0,0 +1,100 @@
+import sys
+import os
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.preprocessing import image
+from tensorflow.keras.applications.efficientnet import preprocess_input
+from app.models.predictClass import build_inference_function
+from app.utils.logger import setup_logger
+
+logger = setup_logger("benchmark_inference", "benchmark_inference.log")
+
+
+def load_input(image_path, img_size=(224, 224)):
+    """
+    Charge l'image de test (ou une image aléatoire si aucune n'est fournie) au format du modèle
+    """
+    if image_path is None:
+        img_array = np.random.uniform(0, 255, size=(*img_size, 3)).astype(np.float32)
+    else:
+        img_array = image.img_to_array(image.load_img(image_path, target_size=img_size))
+    return preprocess_input(np.expand_dims(img_array, axis=0))
+
+
+def measure(predict, img_ready, runs, warmup=5):
+    """
+    Mesure la latence (en ms) d'une fonction de prédiction sur une image
+    """
+    for _ in range(warmup):
+        predict(img_ready)
+    latencies = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        predict(img_ready)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return np.array(latencies)
+
+
+def get_paths(model_path):
+    """
+    Renvoie le modèle chargé et les deux chemins de prédiction à comparer selon son format
+    """
+    if model_path.endswith(".h5"):
+        # Modèle Keras (conteneur d'inférence) : Model.predict contre tf.function compilée
+        model = tf.keras.models.load_model(model_path)
+
+        @tf.function(input_signature=[tf.TensorSpec(shape=(None, 224, 224, 3), dtype=tf.float32)])
+        def infer(images):
+            return model(images, training=False)
+
+        infer = infer.get_concrete_function()
+        return model, {
+            "Model.predict": lambda x: model.predict(x, verbose=0),
+            "tf.function": lambda x: infer(tf.convert_to_tensor(x, dtype=tf.float32)).numpy(),
+        }
+
+    # SavedModel (application) : appel de la signature contre tf.function compilée
+    loaded_model = tf.saved_model.load(model_path)
+    predict_fn = loaded_model.signatures["serving_default"]
+    infer = build_inference_function(predict_fn)
+
+    def signature_predict(x):
+        predictions = predict_fn(tf.constant(x))
+        output_name = list(predictions.keys())[0]
+        return predictions[output_name].numpy()
+
+    return loaded_model, {
+        "signature": signature_predict,
+        "tf.function": lambda x: infer(tf.convert_to_tensor(x, dtype=tf.float32)).numpy(),
+    }
+
+
+def run_benchmark(model_path, image_path=None, runs=100):
+    img_ready = load_input(image_path)
+    results = {}
+    # On garde une référence au modèle chargé pour que ses variables ne soient pas libérées
+    model, paths = get_paths(model_path)
+    for name, predict in paths.items():
+        latencies = measure(predict, img_ready, runs)
+        results[name] = latencies
+        message = (
+            f"{name:<15} médiane : {np.median(latencies):.2f} ms | "
+            f"p95 : {np.percentile(latencies, 95):.2f} ms | moyenne : {latencies.mean():.2f} ms"
+        )
+        logger.info(message)
+        print(message)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare la latence par image du chemin actuel et du chemin compilé")
+    parser.add_argument("--model_path", required=True, help="Dossier SavedModel ou fichier saved_model.h5")
+    parser.add_argument("--image_path", default=None, help="Image de test (aléatoire par défaut)")
+    parser.add_argument("--runs", type=int, default=100, help="Nombre de prédictions mesurées")
+    args = parser.parse_args()
+    run_benchmark(args.model_path, args.image_path, args.runs)
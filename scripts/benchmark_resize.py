@@ -0,0 +1,103 @@
+import sys
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "docker", "preprocessing"))
+
+import numpy as np
+from PIL import Image
+from SizeManager import SizeManager, resize_image, resize_backend
+from MetadataIndex import MetadataIndex
+from app.utils.logger import setup_logger
+
+logger = setup_logger("benchmark_resize", "benchmark_resize.log")
+
+# Tailles des images synthétiques (une partie est déjà à la taille cible)
+SIZES = [(224, 224), (640, 480), (1024, 768), (1600, 1200), (3000, 2000)]
+
+
+def make_dataset(path, images, seed=12):
+    """
+    Crée un dossier set/classe d'images JPEG (et quelques PNG) de tailles variées
+    """
+    rng = np.random.default_rng(seed)
+    class_path = os.path.join(path, "train", "SYNTHETIC")
+    os.makedirs(class_path, exist_ok=True)
+    for i in range(images):
+        width, height = SIZES[i % len(SIZES)]
+        # Image bruitée basse fréquence, plus proche d'une photo qu'un bruit pur
+        small = rng.integers(0, 255, size=(height // 16, width // 16, 3), dtype=np.uint8)
+        image = Image.fromarray(small).resize((width, height))
+        extension = ".png" if i % 10 == 9 else ".jpg"
+        image.save(os.path.join(class_path, f"{i}{extension}"))
+    return [os.path.join(class_path, file) for file in sorted(os.listdir(class_path))]
+
+
+def resize_sequential(paths, target_size):
+    """
+    Redimensionnement d'origine : décodage complet puis filtre par défaut, une image après l'autre
+    """
+    for path in paths:
+        image = Image.open(path)
+        if image.size != target_size:
+            image.resize(target_size).save(path)
+
+
+def run_benchmark(images=200, workers=None, target_size=(224, 224)):
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    source = tempfile.mkdtemp(prefix="benchmark_resize_")
+    try:
+        make_dataset(source, images)
+        variants = {
+            "séquentiel (d'origine)": lambda db, paths: resize_sequential(paths, target_size),
+            "draft, séquentiel": lambda db, paths: [
+                resize_image(path, target_size, backend=resize_backend()) for path in paths
+            ],
+            f"draft, pool de {workers} processus": lambda db, paths: SizeManager(
+                db, target_size, workers=workers
+            ).resize_images(metadata(db)),
+        }
+        for name, function in variants.items():
+            # Chaque variante travaille sur une copie des images d'origine
+            db = source + "_run"
+            shutil.rmtree(db, ignore_errors=True)
+            shutil.copytree(source, db)
+            paths = [os.path.join(db, "train", "SYNTHETIC", file)
+                     for file in sorted(os.listdir(os.path.join(db, "train", "SYNTHETIC")))]
+            start_time = time.perf_counter()
+            function(db, paths)
+            results[name] = images / (time.perf_counter() - start_time)
+            shutil.rmtree(db)
+            if os.path.exists(db + "_metadata.db"):
+                os.remove(db + "_metadata.db")
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+
+    for name, images_per_second in results.items():
+        message = f"{name:<26} {images_per_second:.1f} images/s"
+        logger.info(message)
+        print(message)
+    return results
+
+
+def metadata(db):
+    """
+    Métadonnées des images, comme les lit SizeManager (index mis à jour à partir des en-têtes)
+    """
+    metadata_index = MetadataIndex(db + "_metadata.db")
+    metadata_index.update(db)
+    return metadata_index.dataframe()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare le redimensionnement d'origine et le redimensionnement "
+                                                 "parallèle avec décodage JPEG réduit (SizeManager)")
+    parser.add_argument("--images", type=int, default=200, help="Nombre d'images synthétiques")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de processus (par défaut : nombre de coeurs)")
+    args = parser.parse_args()
+    run_benchmark(args.images, args.workers)
@@ -16,6 +16,7 @@ from sklearn.metrics import (
 import numpy as np
 import mlflow
 from app.utils.logger import setup_logger
+from training.image_shards import ImageShards, list_split_images
 
 logger = setup_logger("evaluate_model", "evaluate_model.log")
 
@@ -32,6 +33,25 @@ def load_test_data(test_path, img_size=(224, 224), batch_size=32):
     return test_generator
 
 
+def load_test_batches(test_path, shards_path, img_size=(224, 224), batch_size=32):
+    """
+    Renvoie les lots (images, étiquettes one-hot) du set de test et le dictionnaire des classes.
+    Les images décodées par le preprocessing sont utilisées si elles sont à jour.
+    """
+    if ImageShards.exists(shards_path, "test"):
+        shards = ImageShards(shards_path, "test")
+        if shards.is_up_to_date(test_path, list_split_images(test_path)[0], img_size):
+            logger.info(f"Lecture des images décodées depuis {shards.path}")
+            one_hot = np.eye(shards.num_classes, dtype=np.float32)
+            batches = (
+                (images.astype(np.float32) / 255.0, one_hot[labels])
+                for images, labels in shards.batches(batch_size)
+            )
+            return batches, shards.class_indices
+    test_generator = load_test_data(test_path, img_size, batch_size)
+    return (test_generator[i] for i in range(len(test_generator))), test_generator.class_indices
+
+
 def get_latest_model(base_path):
     model_folders = glob.glob(os.path.join(base_path, "saved_model*"))
     if not model_folders:
@@ -47,6 +67,7 @@ def evaluate_model():
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     models_dir = os.path.join(BASE_DIR, "models")
     test_path = os.path.join(BASE_DIR, "data", "test")
+    shards_path = os.path.join(BASE_DIR, "data_shards")
 
     logger.info(f"Dossier des modèles : {models_dir}")
     logger.info(f"Dossier de test : {test_path}")
@@ -70,15 +91,14 @@ def evaluate_model():
         return
 
     logger.info("Chargement des données de test...")
-    test_generator = load_test_data(test_path)
-    logger.info(f"Données de test chargées. Nombre de classes : {len(test_generator.class_indices)}")
+    test_batches, class_indices = load_test_batches(test_path, shards_path)
+    logger.info(f"Données de test chargées. Nombre de classes : {len(class_indices)}")
 
     logger.info("Génération des prédictions...")
     all_predictions = []
     all_true_classes = []
 
-    for i in range(len(test_generator)):
-        batch_images, batch_labels = test_generator[i]
+    for batch_images, batch_labels in test_batches:
         batch_predictions = infer(tf.constant(batch_images))[
             "dense_2"
         ]  # Assurez-vous que 'dense_2' est le bon nom de la couche de sortie
@@ -94,7 +114,7 @@ def evaluate_model():
     logger.info(f"Précision sur l'ensemble de test : {accuracy:.4f}")
 
     logger.info("Calcul du rapport de classification...")
-    class_names = list(test_generator.class_indices.keys())
+    class_names = list(class_indices.keys())
     report = classification_report(true_classes, predicted_classes, target_names=class_names)
     logger.info("Rapport de classification :\n" + report)
 
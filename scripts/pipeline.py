@@ -17,13 +17,16 @@ from monitoring.system_monitor import SystemMonitor
 from app.utils.logger import setup_logger, clean_old_logs
 from app.utils.data_manager import DataManager
 from app.models.predictClass import predictClass
-from training.train_model import train_model
+from training.train_model import train_model, SHARDS_DIR
+from training.image_shards import write_shards
 from preprocessing.preprocess_dataset import CleanDB
 from app.utils.data_version_manager import DataVersionManager
 from scripts.downloadDataset import download_dataset
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 logger = setup_logger("pipeline", "pipeline.log")
+# Nombre d'images prédites en une seule passe du modèle
+PREDICTION_BATCH_SIZE = 32
 
 
 def preprocess_data(data_path, test_dataset_mode: bool = False):
@@ -32,6 +35,10 @@ def preprocess_data(data_path, test_dataset_mode: bool = False):
     cleaner.cleanAll()
     logger.info("Prétraitement des données terminé")
 
+    # Les images décodées sont relues par l'entraînement et l'évaluation sans décodage
+    counts = write_shards(data_path, SHARDS_DIR)
+    logger.info(f"Images décodées enregistrées : {counts}")
+
     data_version_manager = DataVersionManager(data_path)
     new_version = data_version_manager.update_version()
     logger.info(f"Nouvelle version des données : {new_version}")
@@ -126,9 +133,13 @@ def run_pipeline(test_dataset_mode: bool = False):
 
             logger.info(f"Traitement de {len(new_data)} nouvelles images")
 
-            for image_path, true_class in new_data:
-                class_name, confidence = predictor.predict(image_path)
+            # Les images sont prédites par lots pour n'effectuer qu'une passe du modèle par lot
+            image_paths = [image_path for image_path, _ in new_data]
+            batch_results = []
+            for start in range(0, len(image_paths), PREDICTION_BATCH_SIZE):
+                batch_results.extend(predictor.predict_batch(image_paths[start:start + PREDICTION_BATCH_SIZE]))
 
+            for (image_path, true_class), (class_name, confidence) in zip(new_data, batch_results):
                 if class_name in predictions:
                     predictions[class_name] += 1
                 else:
@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "docker", "inference"))
+from batcher import BatchPredictor, QueueFullError
+
+
+class TestBatchPredictor(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+
+    def predict_batch(self, items):
+        self.batches.append(list(items))
+        return [item * 10 for item in items]
+
+    def test_parameters_are_bounded(self):
+        batcher = BatchPredictor(self.predict_batch, max_batch_size=0, max_wait_ms=-5, max_queue_size=-1)
+        self.assertEqual(batcher.max_batch_size, 1)
+        self.assertEqual(batcher.max_wait, 0.0)
+        self.assertEqual(batcher.max_queue_size, 0)
+
+    def test_concurrent_requests_are_batched_up_to_max_size(self):
+        async def scenario():
+            batcher = BatchPredictor(self.predict_batch, max_batch_size=4, max_wait_ms=50)
+            batcher.start()
+            try:
+                return await asyncio.gather(*(batcher.submit(item) for item in range(10))), batcher.get_stats()
+            finally:
+                await batcher.stop()
+
+        results, stats = asyncio.run(scenario())
+        self.assertEqual(results, [item * 10 for item in range(10)])
+        self.assertEqual([len(batch) for batch in self.batches], [4, 4, 2])
+        self.assertEqual((stats["total_batches"], stats["total_requests"], stats["batch_size_max"]), (3, 10, 4))
+
+    def test_single_request_waits_at_most_max_wait(self):
+        async def scenario():
+            batcher = BatchPredictor(self.predict_batch, max_batch_size=16, max_wait_ms=20)
+            batcher.start()
+            try:
+                start_time = time.perf_counter()
+                result = await batcher.submit(3)
+                return result, time.perf_counter() - start_time
+            finally:
+                await batcher.stop()
+
+        result, elapsed = asyncio.run(scenario())
+        self.assertEqual(result, 30)
+        self.assertEqual(self.batches, [[3]])
+        # Le lot incomplet part après le délai, sans attendre d'autres requêtes
+        self.assertGreaterEqual(elapsed, 0.015)
+        self.assertLess(elapsed, 1.0)
+
+    def test_full_queue_rejects_requests(self):
+        started, release = threading.Event(), threading.Event()
+
+        def blocking_predict(items):
+            started.set()
+            release.wait(5)
+            return self.predict_batch(items)
+
+        async def scenario():
+            batcher = BatchPredictor(blocking_predict, max_batch_size=1, max_wait_ms=0, max_queue_size=1)
+            batcher.start()
+            try:
+                # Le premier élément occupe le modèle, le second remplit la file
+                first = asyncio.ensure_future(batcher.submit(1))
+                await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+                second = asyncio.ensure_future(batcher.submit(2))
+                await asyncio.sleep(0)
+                self.assertTrue(batcher.is_full())
+                with self.assertRaises(QueueFullError):
+                    await batcher.submit(3)
+                release.set()
+                return await asyncio.gather(first, second), batcher.get_stats()
+            finally:
+                release.set()
+                await batcher.stop()
+
+        results, stats = asyncio.run(scenario())
+        self.assertEqual(results, [10, 20])
+        self.assertEqual(stats["rejected_requests"], 1)
+
+    def test_batch_error_is_sent_to_every_caller(self):
+        def failing_predict(items):
+            raise ValueError("modèle indisponible")
+
+        async def scenario():
+            batcher = BatchPredictor(failing_predict, max_batch_size=4, max_wait_ms=10)
+            batcher.start()
+            try:
+                return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+            finally:
+                await batcher.stop()
+
+        results = asyncio.run(scenario())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import importlib.util
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from tensorflow.keras import layers, models
+from tensorflow.keras.callbacks import LambdaCallback
+
+# Le module est chargé depuis son fichier : ajouter docker/training au chemin masquerait
+# le dossier training du projet par docker/training/training.py
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+spec = importlib.util.spec_from_file_location(
+    "checkpoints", os.path.join(ROOT_PATH, "docker", "training", "checkpoints.py")
+)
+checkpoints = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(checkpoints)
+
+
+class TestTrainingCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.checkpoint_folder = os.path.join(self.folder, "checkpoint")
+        rng = np.random.default_rng(0)
+        self.x = rng.random((32, 4), dtype=np.float32)
+        self.y = np.eye(2, dtype=np.float32)[rng.integers(0, 2, 32)]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def build_model(self):
+        model = models.Sequential([layers.Input((4,)), layers.Dense(2, activation="softmax")])
+        model.compile(optimizer="adam", loss="categorical_crossentropy", metrics=["accuracy"])
+        return model
+
+    def test_no_checkpoint(self):
+        self.assertFalse(checkpoints.has_checkpoint(self.checkpoint_folder))
+        self.assertEqual(checkpoints.load_checkpoint(self.checkpoint_folder), (None, None))
+
+    def test_save_load_and_resume(self):
+        model = self.build_model()
+        checkpoint = checkpoints.TrainingCheckpoint(self.checkpoint_folder)
+        model.fit(self.x, self.y, batch_size=8, epochs=2, callbacks=[checkpoint], verbose=0)
+
+        restored_model, state = checkpoints.load_checkpoint(self.checkpoint_folder)
+        self.assertEqual(state["epoch"], 2)
+        self.assertEqual(sorted(state["logs"]), ["accuracy", "loss"])
+        self.assertGreater(state["training_seconds"], 0)
+        for restored, saved in zip(restored_model.get_weights(), model.get_weights()):
+            np.testing.assert_allclose(restored, saved)
+        # L'état de l'optimiseur est repris avec le modèle
+        self.assertEqual(int(restored_model.optimizer.iterations), int(model.optimizer.iterations))
+
+        # La reprise commence à l'époque enregistrée et garde les métriques de la dernière époque
+        resumed = checkpoints.TrainingCheckpoint(self.checkpoint_folder, state=state)
+        self.assertEqual(resumed.last_logs, state["logs"])
+        history = restored_model.fit(
+            self.x, self.y, batch_size=8, initial_epoch=state["epoch"], epochs=3, callbacks=[resumed], verbose=0
+        )
+        self.assertEqual(history.epoch, [2])
+        _, resumed_state = checkpoints.load_checkpoint(self.checkpoint_folder)
+        self.assertEqual(resumed_state["epoch"], 3)
+        self.assertGreater(resumed_state["training_seconds"], state["training_seconds"])
+
+        checkpoints.remove_checkpoint(self.checkpoint_folder)
+        self.assertFalse(checkpoints.has_checkpoint(self.checkpoint_folder))
+
+    def test_batch_checkpoint_restarts_interrupted_epoch(self):
+        model = self.build_model()
+        checkpoint = checkpoints.TrainingCheckpoint(self.checkpoint_folder, every_batches=2)
+
+        class Interrupt(Exception):
+            pass
+
+        def stop_at_third_batch(batch, logs=None):
+            if checkpoint.epoch == 1 and batch == 2:
+                raise Interrupt()
+
+        stop = LambdaCallback(on_train_batch_end=stop_at_third_batch)
+        with self.assertRaises(Interrupt):
+            model.fit(self.x, self.y, batch_size=8, epochs=3, callbacks=[checkpoint, stop], verbose=0)
+
+        # Le dernier point de reprise date du 2e lot de la 2e époque : cette époque est recommencée
+        _, state = checkpoints.load_checkpoint(self.checkpoint_folder)
+        self.assertEqual(state["epoch"], 1)
+        self.assertNotIn("tmp_model.keras", os.listdir(self.checkpoint_folder))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "docker", "preprocessing"))
+from CleanDB import CleanDB
+from UnderSampling import UnderSamplerImages, seeded_order
+
+
+def list_tree(path):
+    """
+    Contenu d'un dataset : {(set, classe): fichiers}
+    """
+    return {
+        (set_name, class_name): sorted(os.listdir(os.path.join(path, set_name, class_name)))
+        for set_name in os.listdir(path)
+        for class_name in os.listdir(os.path.join(path, set_name))
+    }
+
+
+class TestCleanDB(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.folder, "dataset_clean")
+        for class_name, count in (("AIGLE", 40), ("MOINEAU", 25)):
+            class_path = os.path.join(self.db_path, "all_files", class_name)
+            os.makedirs(class_path)
+            for index in range(count):
+                open(os.path.join(class_path, f"{index}.jpg"), "w").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def copy_db(self, name):
+        path = os.path.join(self.folder, name)
+        shutil.copytree(self.db_path, path)
+        return path
+
+    def test_split_moves_the_same_number_of_images_per_class(self):
+        CleanDB(self.db_path, workers=1).split_set_class_balancing(3)
+        tree = list_tree(self.db_path)
+        for class_name, count in (("AIGLE", 40), ("MOINEAU", 25)):
+            self.assertEqual(len(tree[("test", class_name)]), 3)
+            self.assertEqual(len(tree[("valid", class_name)]), 3)
+            self.assertEqual(len(tree[("all_files", class_name)]), count - 6)
+
+    def test_split_is_reproducible_and_depends_on_seed(self):
+        other_path = self.copy_db("other")
+        seed_path = self.copy_db("seed")
+        CleanDB(self.db_path, workers=1).split_set_class_balancing(3)
+        CleanDB(other_path, workers=2).split_set_class_balancing(3)
+        CleanDB(seed_path, workers=1, seed=7).split_set_class_balancing(3)
+        self.assertEqual(list_tree(self.db_path), list_tree(other_path))
+        self.assertNotEqual(list_tree(self.db_path), list_tree(seed_path))
+
+    def test_interrupted_split_resumes_to_the_same_sets(self):
+        expected_path = self.copy_db("expected")
+        CleanDB(expected_path, workers=1).split_set_class_balancing(3)
+
+        # Arrêt après le déplacement d'une partie des images d'une classe
+        clean_db = CleanDB(self.db_path, workers=1)
+        plan = clean_db.plan_class_split("AIGLE", 3)
+        clean_db.apply_class_plan("AIGLE", plan[:4])
+        # Un nouveau processus reprend le split
+        CleanDB(self.db_path, workers=1).split_set_class_balancing(3)
+        self.assertEqual(list_tree(self.db_path), list_tree(expected_path))
+
+    def test_under_sample_keeps_treshold_images(self):
+        under_sampler = UnderSamplerImages(self.db_path, treshold=30, seed=12)
+        for class_name in ("AIGLE", "MOINEAU"):
+            under_sampler.under_sample_class(class_name)
+        tree = list_tree(self.db_path)
+        self.assertEqual(len(tree[("all_files", "AIGLE")]), 30)
+        self.assertEqual(len(tree[("all_files", "MOINEAU")]), 25)
+
+    def test_interrupted_under_sample_keeps_the_same_images(self):
+        expected_path = self.copy_db("expected")
+        UnderSamplerImages(expected_path, treshold=20, seed=12).under_sample_class("AIGLE")
+
+        # Arrêt après la suppression d'une partie des images en trop
+        class_path = os.path.join(self.db_path, "all_files", "AIGLE")
+        for file in seeded_order(os.listdir(class_path), 12, "AIGLE")[20:26]:
+            os.remove(os.path.join(class_path, file))
+        UnderSamplerImages(self.db_path, treshold=20, seed=12).under_sample_class("AIGLE")
+        self.assertEqual(list_tree(self.db_path), list_tree(expected_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from tensorflow.keras.preprocessing.image import ImageDataGenerator
+from training.data_loader import ImageDataset, AUGMENTATION, augment_batch
+from training.image_shards import write_shards
+
+
+class TestDataLoader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        for class_name in ["moineau", "aigle", "corbeau"]:
+            os.makedirs(os.path.join(cls.folder, class_name))
+            for index in range(3):
+                array = rng.integers(0, 255, (300, 400, 3), dtype=np.uint8)
+                Image.fromarray(array).save(os.path.join(cls.folder, class_name, f"{index}.jpg"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder)
+
+    def test_matches_flow_from_directory(self):
+        generator = ImageDataGenerator().flow_from_directory(
+            self.folder, target_size=(224, 224), batch_size=9, shuffle=False
+        )
+        dataset = ImageDataset(self.folder, batch_size=9)
+        self.assertEqual(dataset.class_indices, generator.class_indices)
+        np.testing.assert_array_equal(dataset.classes, generator.classes)
+        images, labels = next(iter(dataset.dataset))
+        expected_images, expected_labels = generator[0]
+        np.testing.assert_array_equal(images.numpy(), expected_images)
+        np.testing.assert_array_equal(labels.numpy(), expected_labels)
+
+    def test_augment_batch_keeps_shape(self):
+        images = np.random.uniform(0, 255, (4, 224, 224, 3)).astype(np.float32)
+        augmented = augment_batch(images).numpy()
+        self.assertEqual(augmented.shape, images.shape)
+        self.assertFalse(np.array_equal(augmented, images))
+
+    def test_augment_batch_without_transform_is_identity(self):
+        params = dict(
+            AUGMENTATION, rotation_range=0, width_shift_range=0, height_shift_range=0,
+            zoom_range=0, shear_range=0, horizontal_flip=False, vertical_flip=False,
+        )
+        images = np.random.uniform(0, 255, (2, 224, 224, 3)).astype(np.float32)
+        np.testing.assert_allclose(augment_batch(images, params).numpy(), images)
+
+    def test_cache_is_written(self):
+        cache_dir = os.path.join(self.folder + "_cache")
+        try:
+            dataset = ImageDataset(self.folder, batch_size=4, augment=True, shuffle=True, cache_dir=cache_dir)
+            self.assertEqual(sum(len(images) for images, _ in dataset.dataset), 9)
+            self.assertTrue(any(name.endswith(".index") for name in os.listdir(cache_dir)))
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def test_subset_keeps_selected_images(self):
+        dataset = ImageDataset(self.folder, batch_size=9)
+        subset = ImageDataset(self.folder, batch_size=9, subset=[1, 4, 8])
+        self.assertEqual(subset.samples, 3)
+        self.assertEqual(subset.filepaths, [dataset.filepaths[row] for row in (1, 4, 8)])
+        images, labels = next(iter(subset.dataset))
+        expected_images, expected_labels = next(iter(dataset.dataset))
+        np.testing.assert_array_equal(images.numpy(), expected_images.numpy()[[1, 4, 8]])
+        np.testing.assert_array_equal(labels.numpy(), expected_labels.numpy()[[1, 4, 8]])
+
+    def test_reads_up_to_date_shards(self):
+        shards_dir = os.path.join(self.folder + "_shards")
+        dataset_dir = tempfile.mkdtemp()
+        try:
+            shutil.copytree(self.folder, os.path.join(dataset_dir, "train"))
+            write_shards(dataset_dir, shards_dir)
+            train_path = os.path.join(dataset_dir, "train")
+            from_files = ImageDataset(train_path, batch_size=9)
+            from_shards = ImageDataset(train_path, batch_size=9, shards_dir=shards_dir)
+            self.assertIsNotNone(from_shards.shards)
+            images, labels = next(iter(from_shards.dataset))
+            expected_images, expected_labels = next(iter(from_files.dataset))
+            np.testing.assert_array_equal(images.numpy(), expected_images.numpy())
+            np.testing.assert_array_equal(labels.numpy(), expected_labels.numpy())
+
+            # Une image ajoutée après le preprocessing : les fichiers sont relus
+            shutil.copy(os.path.join(train_path, "aigle", "0.jpg"), os.path.join(train_path, "aigle", "9.jpg"))
+            self.assertIsNone(ImageDataset(train_path, batch_size=9, shards_dir=shards_dir).shards)
+        finally:
+            shutil.rmtree(shards_dir, ignore_errors=True)
+            shutil.rmtree(dataset_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,19 @@
 import unittest
 import pandas as pd
 from monitoring.drift_monitor import DriftMonitor
+from monitoring.prediction_store import PredictionStore
 import os
+import tempfile
 from datetime import datetime, timedelta
 
 
 class TestDriftMonitor(unittest.TestCase):
     def setUp(self):
-        self.test_train_data_path = "test_train_data"
-        self.test_log_file = "test_performance_logs.csv"
+        # Toutes les données du test (images, logs et journal des prédictions) sont dans un dossier temporaire
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_train_data_path = os.path.join(self.temp_dir.name, "test_train_data")
+        self.test_log_file = os.path.join(self.temp_dir.name, "test_performance_logs.csv")
+        self.store = PredictionStore(os.path.join(self.temp_dir.name, "predictions"))
 
         # Créer un répertoire de données d'entraînement factice
         os.makedirs(os.path.join(self.test_train_data_path, "class1"), exist_ok=True)
@@ -30,17 +35,11 @@ class TestDriftMonitor(unittest.TestCase):
         test_data.to_csv(self.test_log_file, index=False)
 
     def tearDown(self):
-        if os.path.exists(self.test_log_file):
-            os.remove(self.test_log_file)
-        for root, dirs, files in os.walk(self.test_train_data_path, topdown=False):
-            for name in files:
-                os.remove(os.path.join(root, name))
-            for name in dirs:
-                os.rmdir(os.path.join(root, name))
-        os.rmdir(self.test_train_data_path)
+        self.store.flush()
+        self.temp_dir.cleanup()
 
     def test_check_drift(self):
-        monitor = DriftMonitor(train_data_path=self.test_train_data_path)
+        monitor = DriftMonitor(train_data_path=self.test_train_data_path, store=self.store)
         drift_detected, reasons = monitor.check_drift(log_file=self.test_log_file)
 
         print(f"Drift detected: {drift_detected}")
@@ -58,18 +57,27 @@ class TestDriftMonitor(unittest.TestCase):
         self.assertEqual(monitor.initial_class_counts, {"class1": 100, "class2": 100})
         self.assertEqual(current_counts, {"class1": 230, "class2": 220})
 
+    def test_check_drift_from_store(self):
+        for _ in range(230):
+            self.store.append("class1", 0.9)
+        self.store.flush()
+
+        monitor = DriftMonitor(train_data_path=self.test_train_data_path, store=self.store)
+        drift_detected, reasons = monitor.check_drift()
+
+        self.assertTrue(drift_detected)
+        self.assertIn("La classe class1 a augmenté de plus de 5%: 100 à 230", reasons)
+
     def test_check_drift_no_data(self):
-        empty_log_file = "empty_log.csv"
+        empty_log_file = os.path.join(self.temp_dir.name, "empty_log.csv")
         open(empty_log_file, "w").close()  # Créer un fichier vide
 
-        monitor = DriftMonitor(train_data_path=self.test_train_data_path)
+        monitor = DriftMonitor(train_data_path=self.test_train_data_path, store=self.store)
         drift_detected, reason = monitor.check_drift(log_file=empty_log_file)
 
         self.assertFalse(drift_detected)
         self.assertEqual(reason, "Pas assez de données pour détecter un drift")
 
-        os.remove(empty_log_file)
-
 
 if __name__ == "__main__":
     unittest.main()
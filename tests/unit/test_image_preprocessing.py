@@ -0,0 +1,47 @@
+import io
+import os
+import sys
+import unittest
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.utils.image_preprocessing import BatchPreprocessor, decode_image
+
+
+def encode(array, format):
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+class TestImagePreprocessing(unittest.TestCase):
+    def test_decode_image_resizes_to_model_size(self):
+        content = encode(np.random.randint(0, 255, (900, 1200, 3), dtype=np.uint8), "JPEG")
+        img = decode_image(content, (224, 224))
+        self.assertEqual(img.shape, (224, 224, 3))
+        self.assertEqual(img.dtype, np.uint8)
+
+    def test_decode_image_converts_png_to_rgb(self):
+        content = encode(np.random.randint(0, 255, (300, 300, 4), dtype=np.uint8), "PNG")
+        self.assertEqual(decode_image(content, (224, 224)).shape, (224, 224, 3))
+
+    def test_batch_preprocessor_reuses_buffer(self):
+        array = np.random.randint(0, 255, (224, 224, 3), dtype=np.uint8)
+        preprocessor = BatchPreprocessor((224, 224), max_batch_size=4)
+        buffer = preprocessor.buffer
+        batch = preprocessor.preprocess([encode(array, "PNG"), array])
+        self.assertEqual(batch.shape, (2, 224, 224, 3))
+        self.assertEqual(batch.dtype, np.float32)
+        np.testing.assert_array_equal(batch[0], array.astype(np.float32))
+        np.testing.assert_array_equal(batch[1], array.astype(np.float32))
+        self.assertIs(preprocessor.buffer, buffer)
+
+    def test_batch_preprocessor_grows_for_larger_batches(self):
+        array = np.zeros((224, 224, 3), dtype=np.uint8)
+        preprocessor = BatchPreprocessor((224, 224), max_batch_size=1)
+        self.assertEqual(preprocessor.preprocess([array] * 3).shape, (3, 224, 224, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from training.image_shards import ImageShards, write_shards
+
+
+class TestImageShards(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.dataset_path = os.path.join(self.folder, "dataset_clean")
+        self.shards_path = os.path.join(self.folder, "dataset_shards")
+        rng = np.random.default_rng(0)
+        for split, count in (("train", 5), ("test", 2)):
+            for class_name in ("moineau", "aigle"):
+                class_path = os.path.join(self.dataset_path, split, class_name)
+                os.makedirs(class_path)
+                for index in range(count):
+                    array = rng.integers(0, 255, (224, 224, 3), dtype=np.uint8)
+                    Image.fromarray(array).save(os.path.join(class_path, f"{index}.png"))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_write_and_read_shards(self):
+        counts = write_shards(self.dataset_path, self.shards_path)
+        self.assertEqual(counts, {"train": 10, "test": 4})
+        self.assertFalse(ImageShards.exists(self.shards_path, "valid"))
+
+        shards = ImageShards(self.shards_path, "train")
+        self.assertEqual(shards.class_indices, {"aigle": 0, "moineau": 1})
+        self.assertIsInstance(shards.images, np.memmap)
+        self.assertEqual(shards.images.shape, (10, 224, 224, 3))
+        expected = np.asarray(Image.open(os.path.join(self.dataset_path, "train", "moineau", "3.png")))
+        position = shards.files.index("moineau/3.png")
+        np.testing.assert_array_equal(shards.images[position], expected)
+        self.assertEqual(shards.classes[position], 1)
+
+    def test_batches_cover_every_image(self):
+        write_shards(self.dataset_path, self.shards_path)
+        shards = ImageShards(self.shards_path, "train")
+        ordered = list(shards.batches(4))
+        self.assertEqual([len(images) for images, _ in ordered], [4, 4, 2])
+        # Des index consécutifs donnent une vue du tableau projeté, sans copie
+        self.assertTrue(np.shares_memory(ordered[0][0], shards.images))
+        labels = np.concatenate([labels for _, labels in shards.batches(4, shuffle=True, seed=1)])
+        self.assertEqual(sorted(labels.tolist()), sorted(shards.classes.tolist()))
+
+    def test_rewrite_replaces_previous_shards(self):
+        write_shards(self.dataset_path, self.shards_path)
+        shutil.rmtree(os.path.join(self.dataset_path, "test"))
+        write_shards(self.dataset_path, self.shards_path)
+        self.assertFalse(ImageShards.exists(self.shards_path, "test"))
+        self.assertFalse(os.path.exists(self.shards_path + ".tmp"))
+
+    def test_unchanged_images_are_not_decoded_again(self):
+        # Une image BMP garde la même taille de fichier quand ses pixels changent
+        image_path = os.path.join(self.dataset_path, "train", "moineau", "bmp.bmp")
+        Image.fromarray(np.zeros((224, 224, 3), dtype=np.uint8)).save(image_path)
+        write_shards(self.dataset_path, self.shards_path)
+        # On change ses pixels en gardant sa taille et sa date : elle est considérée inchangée
+        stat = os.stat(image_path)
+        Image.fromarray(np.full((224, 224, 3), 255, dtype=np.uint8)).save(image_path)
+        os.utime(image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        previous = np.array(ImageShards(self.shards_path, "train").images)
+
+        # Seule une nouvelle image de test est décodée, train est repris tel quel
+        array = np.full((224, 224, 3), 7, dtype=np.uint8)
+        Image.fromarray(array).save(os.path.join(self.dataset_path, "test", "aigle", "9.png"))
+        counts = write_shards(self.dataset_path, self.shards_path)
+        self.assertEqual(counts, {"train": 11, "test": 5})
+        np.testing.assert_array_equal(ImageShards(self.shards_path, "train").images, previous)
+        test_shards = ImageShards(self.shards_path, "test")
+        np.testing.assert_array_equal(test_shards.images[test_shards.files.index("aigle/9.png")], array)
+
+        # Une image modifiée (nouvelle date) est décodée à nouveau
+        os.utime(image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        write_shards(self.dataset_path, self.shards_path)
+        shards = ImageShards(self.shards_path, "train")
+        self.assertEqual(shards.images[shards.files.index("moineau/bmp.bmp")].min(), 255)
+
+    def test_is_up_to_date_compares_file_stamps(self):
+        write_shards(self.dataset_path, self.shards_path)
+        split_path = os.path.join(self.dataset_path, "train")
+        shards = ImageShards(self.shards_path, "train")
+        self.assertTrue(shards.is_up_to_date(split_path, shards.files, (224, 224)))
+        self.assertFalse(shards.is_up_to_date(split_path, shards.files, (128, 128)))
+
+        # Même nom de fichier mais contenu réécrit : la date de modification change
+        image_path = os.path.join(split_path, "aigle", "0.png")
+        stat = os.stat(image_path)
+        os.utime(image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertFalse(shards.is_up_to_date(split_path, shards.files, (224, 224)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "docker", "preprocessing"))
+from IncrementalCleanDB import IncrementalCleanDB
+
+
+class TestIncrementalCleanDB(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.raw_path = os.path.join(self.folder, "dataset_raw")
+        self.clean_path = os.path.join(self.folder, "dataset_clean")
+        os.makedirs(self.clean_path)
+        for class_name, count in (("AIGLE", 20), ("MOINEAU", 30), ("PIC", 25)):
+            for index in range(count):
+                self.add_image(class_name, index)
+        # Classe dont les images sont trop allongées : elle n'est pas exploitable
+        for index in range(30):
+            self.add_image("HERON", index, size=(64, 24))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def add_image(self, class_name, index, size=(32, 32)):
+        class_path = os.path.join(self.raw_path, "train", class_name)
+        os.makedirs(class_path, exist_ok=True)
+        # Couleur unique par image : deux images n'ont jamais le même contenu
+        color = (index * 8 % 256, len(class_name) * 20, index // 32 * 50)
+        Image.new("RGB", size, color).save(os.path.join(class_path, f"{index}.jpg"))
+
+    def clean(self):
+        IncrementalCleanDB(
+            self.clean_path, self.raw_path, os.path.join(self.folder, "raw_manifest.json"),
+            os.path.join(self.folder, "clean_index.json"), target_size=(32, 32), workers=1,
+        ).start_clean()
+
+    def list_class(self, class_name):
+        """
+        Images de la classe dans chaque set : {set: fichiers}
+        """
+        return {
+            set_name: sorted(os.listdir(os.path.join(self.clean_path, set_name, class_name)))
+            for set_name in ("train", "test", "valid")
+        }
+
+    def test_first_run_splits_every_usable_class(self):
+        self.clean()
+        self.assertEqual(sorted(os.listdir(os.path.join(self.clean_path, "train"))), ["AIGLE", "MOINEAU", "PIC"])
+        # Seuil : taille de la plus petite classe (20), 15% dans test et valid
+        for class_name in ("AIGLE", "MOINEAU", "PIC"):
+            self.assertEqual({name: len(files) for name, files in self.list_class(class_name).items()},
+                             {"train": 14, "test": 3, "valid": 3})
+
+    def test_untouched_classes_keep_their_split(self):
+        self.clean()
+        before = {class_name: self.list_class(class_name) for class_name in ("AIGLE", "MOINEAU", "PIC")}
+        mtimes = {
+            file: os.stat(os.path.join(self.clean_path, "train", "AIGLE", file)).st_mtime_ns
+            for file in before["AIGLE"]["train"]
+        }
+
+        # Une image ajoutée à une classe : seule cette classe est mise à jour
+        self.add_image("MOINEAU", 30)
+        self.clean()
+        self.assertEqual(self.list_class("AIGLE"), before["AIGLE"])
+        self.assertEqual(self.list_class("PIC"), before["PIC"])
+        # Les fichiers des classes inchangées ne sont pas réécrits
+        self.assertEqual({
+            file: os.stat(os.path.join(self.clean_path, "train", "AIGLE", file)).st_mtime_ns
+            for file in before["AIGLE"]["train"]
+        }, mtimes)
+        # Les images déjà réparties de la classe modifiée restent dans leur set
+        after = self.list_class("MOINEAU")
+        for set_name in ("train", "test", "valid"):
+            self.assertEqual(len(after[set_name]), len(before["MOINEAU"][set_name]))
+            for file in after[set_name]:
+                for other_set in {"train", "test", "valid"} - {set_name}:
+                    self.assertNotIn(file, before["MOINEAU"][other_set])
+
+    def test_treshold_change_resamples_every_class(self):
+        self.clean()
+        before = {class_name: self.list_class(class_name) for class_name in ("AIGLE", "MOINEAU", "PIC")}
+
+        # La plus petite classe perd des images : le seuil passe de 20 à 14
+        for index in range(6):
+            os.remove(os.path.join(self.raw_path, "train", "AIGLE", f"{index}.jpg"))
+        self.clean()
+        for class_name in ("AIGLE", "MOINEAU", "PIC"):
+            after = self.list_class(class_name)
+            self.assertEqual({name: len(files) for name, files in after.items()},
+                             {"train": 10, "test": 2, "valid": 2})
+            # Les images gardées étaient déjà dans dataset_clean
+            if class_name != "AIGLE":
+                for set_name in ("train", "test", "valid"):
+                    self.assertTrue(set(after[set_name]) <= set(sum(before[class_name].values(), [])))
+
+    def test_no_usable_class_empties_dataset_clean(self):
+        self.clean()
+        for class_name in ("AIGLE", "MOINEAU", "PIC"):
+            shutil.rmtree(os.path.join(self.raw_path, "train", class_name))
+        self.clean()
+        for set_name in ("train", "test", "valid"):
+            self.assertEqual(os.listdir(os.path.join(self.clean_path, set_name)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
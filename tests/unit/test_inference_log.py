@@ -0,0 +1,79 @@
+import os
+import csv
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "docker", "inference"))
+from inference_log import InferenceLogWriter
+
+COLUMNS = ["date", "predicted_class", "confidence"]
+
+
+class TestInferenceLogWriter(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def read_rows(self):
+        """
+        Lignes de tous les fichiers écrits, dans l'ordre des fichiers (le nom contient la date de création)
+        """
+        rows = []
+        for file_name in sorted(os.listdir(self.folder)):
+            with open(os.path.join(self.folder, file_name), newline="") as file:
+                content = list(csv.reader(file))
+            self.assertEqual(content[0], COLUMNS)
+            rows.extend(content[1:])
+        return rows
+
+    def wait_written(self, writer, count):
+        deadline = time.time() + 5
+        while writer.get_stats()["written_rows"] < count and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_full_buffer_is_flushed_without_waiting_interval(self):
+        writer = InferenceLogWriter(self.folder, COLUMNS, flush_size=3, flush_interval=60)
+        try:
+            writer.log([["2026-10-18", "AIGLE", "0.9"], ["2026-10-18", "PIC", "0.5"]])
+            time.sleep(0.05)
+            self.assertEqual(writer.get_stats()["pending_rows"], 2)
+            writer.log([["2026-10-18", "MOINEAU", "0.7"]])
+            self.wait_written(writer, 3)
+            stats = writer.get_stats()
+            self.assertEqual((stats["written_rows"], stats["pending_rows"], stats["flushes"]), (3, 0, 1))
+            self.assertEqual([row[1] for row in self.read_rows()], ["AIGLE", "PIC", "MOINEAU"])
+        finally:
+            writer.close()
+
+    def test_pending_rows_are_written_after_interval_and_on_close(self):
+        writer = InferenceLogWriter(self.folder, COLUMNS, flush_size=100, flush_interval=0.05)
+        writer.log([["2026-10-18", "AIGLE", "0.9"]])
+        self.wait_written(writer, 1)
+        self.assertEqual(writer.get_stats()["written_rows"], 1)
+
+        writer.flush_interval = 60
+        writer.log([["2026-10-18", "PIC", "0.5"]])
+        writer.close()
+        self.assertEqual(len(self.read_rows()), 2)
+
+    def test_file_is_rotated_when_max_size_is_reached(self):
+        writer = InferenceLogWriter(self.folder, COLUMNS, flush_size=1, flush_interval=60, max_bytes=60)
+        for index in range(4):
+            writer.log([["2026-10-18", f"CLASSE_{index}", "0.123456789"]])
+            self.wait_written(writer, index + 1)
+        writer.close()
+
+        stats = writer.get_stats()
+        self.assertGreaterEqual(stats["rotations"], 2)
+        self.assertEqual(len(os.listdir(self.folder)), stats["rotations"] + 1)
+        self.assertEqual([row[1] for row in self.read_rows()], [f"CLASSE_{index}" for index in range(4)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import importlib.util
+import shutil
+import tempfile
+import unittest
+
+# Le module est chargé depuis son fichier : ajouter docker/training au chemin masquerait
+# le dossier training du projet par docker/training/training.py
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+spec = importlib.util.spec_from_file_location(
+    "job_queue", os.path.join(ROOT_PATH, "docker", "training", "job_queue.py")
+)
+job_queue = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(job_queue)
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.queue = job_queue.JobQueue(os.path.join(self.folder, "jobs.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_jobs_are_claimed_in_order(self):
+        first = self.queue.submit({"epochs": 5})
+        second = self.queue.submit({"epochs": 10})
+
+        job = self.queue.claim_next()
+        self.assertEqual((job["id"], job["status"], job["params"]), (first, job_queue.RUNNING, {"epochs": 5}))
+        self.assertIsNotNone(job["started_at"])
+        self.assertEqual(self.queue.claim_next()["id"], second)
+        self.assertIsNone(self.queue.claim_next())
+
+    def test_claim_is_shared_between_connections(self):
+        job_id = self.queue.submit({})
+        # Un second worker sur la même base ne reprend pas un job déjà pris
+        other_queue = job_queue.JobQueue(self.queue.db_path)
+        self.assertEqual(self.queue.claim_next()["id"], job_id)
+        self.assertIsNone(other_queue.claim_next())
+
+    def test_cancel_queued_job_is_immediate(self):
+        job_id = self.queue.submit({})
+        job = self.queue.cancel(job_id)
+        self.assertEqual(job["status"], job_queue.CANCELLED)
+        self.assertIsNotNone(job["finished_at"])
+        self.assertIsNone(self.queue.claim_next())
+        self.assertIsNone(self.queue.cancel(job_id + 1))
+
+    def test_cancel_running_job_is_requested(self):
+        job_id = self.queue.submit({})
+        self.queue.claim_next()
+        self.assertFalse(self.queue.is_cancel_requested(job_id))
+
+        job = self.queue.cancel(job_id)
+        # Le job reste en cours jusqu'au prochain lot, qui voit la demande d'annulation
+        self.assertEqual(job["status"], job_queue.RUNNING)
+        self.assertTrue(job["cancel_requested"])
+        self.assertTrue(self.queue.is_cancel_requested(job_id))
+        self.queue.finish(job_id, job_queue.CANCELLED, "Job annulé")
+        self.assertEqual(self.queue.get(job_id)["status"], job_queue.CANCELLED)
+
+    def test_interrupt_running_only_changes_running_jobs(self):
+        done_id = self.queue.submit({})
+        running_id = self.queue.submit({})
+        queued_id = self.queue.submit({})
+        self.queue.claim_next()
+        self.queue.finish(done_id, job_queue.DONE)
+        self.queue.claim_next()
+        self.queue.update(running_id, run_id="abc", progress={"epoch": 2})
+
+        interrupted = self.queue.interrupt_running()
+        self.assertEqual([job["id"] for job in interrupted], [running_id])
+        job = self.queue.get(running_id)
+        self.assertEqual((job["status"], job["run_id"], job["progress"]), (job_queue.INTERRUPTED, "abc", {"epoch": 2}))
+        self.assertEqual(self.queue.get(done_id)["status"], job_queue.DONE)
+        self.assertEqual(self.queue.get(queued_id)["status"], job_queue.QUEUED)
+        self.assertEqual([job["id"] for job in self.queue.list_jobs(status=job_queue.QUEUED)], [queued_id])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "docker", "preprocessing"))
+from MetadataIndex import MetadataIndex
+
+
+class TestMetadataIndex(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.dataset_path = os.path.join(self.folder, "dataset_clean")
+        self.index = MetadataIndex(os.path.join(self.folder, "metadata.db"))
+        self.save_image("train", "AIGLE", "0.jpg", (224, 224))
+        self.save_image("train", "AIGLE", "1.png", (320, 240))
+        self.save_image("test", "MOINEAU", "2.jpg", (100, 80))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def save_image(self, set_name, class_name, file_name, size):
+        class_path = os.path.join(self.dataset_path, set_name, class_name)
+        os.makedirs(class_path, exist_ok=True)
+        Image.new("RGB", size).save(os.path.join(class_path, file_name))
+
+    def test_update_reads_headers(self):
+        self.assertEqual(self.index.update(self.dataset_path), (3, 0))
+        df = self.index.dataframe().set_index("filename")
+        self.assertEqual(list(df.columns), ["set", "birdName", "height", "width", "format", "mode"])
+        self.assertEqual((df.loc["1.png", "height"], df.loc["1.png", "width"]), (240, 320))
+        self.assertEqual(df.loc["1.png", "format"], "PNG")
+        self.assertEqual(df.loc["2.jpg", "birdName"], "MOINEAU")
+
+    def test_update_only_reads_added_or_changed_images(self):
+        self.index.update(self.dataset_path)
+        self.assertEqual(self.index.update(self.dataset_path), (0, 0))
+
+        # Image ajoutée, image redimensionnée et image supprimée
+        self.save_image("valid", "AIGLE", "3.jpg", (50, 50))
+        self.save_image("train", "AIGLE", "1.png", (224, 224))
+        os.remove(os.path.join(self.dataset_path, "test", "MOINEAU", "2.jpg"))
+        self.assertEqual(self.index.update(self.dataset_path), (2, 1))
+
+        df = self.index.dataframe().set_index("filename")
+        self.assertEqual(sorted(df.index), ["0.jpg", "1.png", "3.jpg"])
+        self.assertEqual(df.loc["1.png", "width"], 224)
+        self.assertEqual(df.loc["3.jpg", "set"], "valid")
+
+    def test_unreadable_image_is_not_returned(self):
+        with open(os.path.join(self.dataset_path, "train", "AIGLE", "4.jpg"), "w") as file:
+            file.write("pas une image")
+        self.assertEqual(self.index.update(self.dataset_path), (4, 0))
+        self.assertNotIn("4.jpg", self.index.dataframe()["filename"].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import unittest
+import importlib.util
+import numpy as np
+from scipy import sparse
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def load_metrics(container):
+    """
+    Charge le metrics.py d'un conteneur (les deux modules ont le même nom)
+    """
+    spec = importlib.util.spec_from_file_location(
+        f"{container}_metrics", os.path.join(ROOT_PATH, "docker", container, "metrics.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def reference_metrics(true_classes, predicted_classes, nb_classes):
+    """
+    Ancien calcul, classe par classe : precision VP / (VP + FP), recall VP / (VP + FN),
+    f1-score (2 * Rec * Pre) / (Rec + Pre), 0 si le dénominateur est nul
+    """
+    matrix = [[0] * nb_classes for _ in range(nb_classes)]
+    for true_class, predicted_class in zip(true_classes, predicted_classes):
+        matrix[true_class][predicted_class] += 1
+    precision, recall, f1_score = [], [], []
+    for index in range(nb_classes):
+        predicted_total = sum(row[index] for row in matrix)
+        true_total = sum(matrix[index])
+        class_precision = matrix[index][index] / predicted_total if predicted_total != 0 else 0
+        class_recall = matrix[index][index] / true_total if true_total != 0 else 0
+        precision.append(class_precision)
+        recall.append(class_recall)
+        f1_score.append(
+            (2 * class_precision * class_recall) / (class_precision + class_recall)
+            if (class_precision + class_recall) != 0
+            else 0
+        )
+    return precision, recall, f1_score
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.modules = [load_metrics("training"), load_metrics("monitoring")]
+
+    def assert_metrics(self, df, true_classes, predicted_classes, nb_classes):
+        precision, recall, f1_score = reference_metrics(true_classes, predicted_classes, nb_classes)
+        np.testing.assert_allclose(df["Precision"].to_numpy(), precision)
+        np.testing.assert_allclose(df["Recall"].to_numpy(), recall)
+        np.testing.assert_allclose(df["f1-score"].to_numpy(), f1_score)
+
+    def test_dense_metrics_match_reference(self):
+        # Classe 2 jamais prédite, classe 3 absente des vraies classes, classe 4 absente des deux
+        true_classes = [0, 0, 0, 1, 1, 2, 2, 0, 1]
+        predicted_classes = [0, 1, 0, 1, 3, 0, 1, 3, 1]
+        labels = ["AIGLE", "MOINEAU", "PIC", "HERON", "MERLE"]
+        for metrics in self.modules:
+            df = metrics.confusion_dataframe(true_classes, predicted_classes, labels)
+            self.assertEqual(list(df.index), labels)
+            self.assertEqual(list(df.columns), labels + ["Precision", "Recall", "f1-score"])
+            self.assertEqual(df.loc["AIGLE", "MOINEAU"], 1)
+            self.assert_metrics(df, true_classes, predicted_classes, len(labels))
+            self.assertEqual(df.loc["PIC", "Precision"], 0)
+            self.assertEqual(df.loc["HERON", "Recall"], 0)
+            self.assertEqual(df.loc["MERLE", "f1-score"], 0)
+
+    def test_sparse_metrics_match_reference(self):
+        rng = np.random.default_rng(0)
+        nb_classes = 1200
+        # Les 100 dernières classes n'apparaissent ni dans les vraies classes ni dans les prédictions
+        true_classes = rng.integers(0, 1000, 5000)
+        predicted_classes = np.where(rng.random(5000) < 0.6, true_classes, rng.integers(0, 1100, 5000))
+        labels = [f"classe_{index}" for index in range(nb_classes)]
+        for metrics in self.modules:
+            self.assertGreaterEqual(nb_classes, metrics.SPARSE_MIN_CLASSES)
+            df = metrics.confusion_dataframe(true_classes, predicted_classes, labels)
+            # Seules les métriques sont gardées, pas la matrice
+            self.assertEqual(list(df.columns), ["Precision", "Recall", "f1-score"])
+            self.assert_metrics(df, true_classes.tolist(), predicted_classes.tolist(), nb_classes)
+            self.assertTrue((df.iloc[1100:] == 0).all().all())
+
+    def test_sparse_and_dense_matrices_give_same_metrics(self):
+        rng = np.random.default_rng(1)
+        true_classes = rng.integers(0, 50, 500)
+        predicted_classes = rng.integers(0, 50, 500)
+        for metrics in self.modules:
+            dense = metrics.confusion_matrix(true_classes, predicted_classes, 60)
+            matrix = metrics.confusion_matrix(true_classes, predicted_classes, 60, sparse_matrix=True)
+            self.assertTrue(sparse.issparse(matrix))
+            np.testing.assert_array_equal(matrix.toarray(), dense)
+            for dense_values, sparse_values in zip(metrics.confusion_metrics(dense),
+                                                   metrics.confusion_metrics(matrix)):
+                np.testing.assert_allclose(dense_values, sparse_values)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "docker", "inference"))
+from model_registry import ModelRegistry
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.loaded = []
+        self.registry = ModelRegistry(self.load_model, max_bytes=300, max_models=2)
+
+    def load_model(self, run_id):
+        self.loaded.append(run_id)
+        return SimpleNamespace(run_id=run_id, memory_bytes=100)
+
+    def test_load_reuses_loaded_model(self):
+        model = self.registry.load("run1")
+        self.assertIs(self.registry.load("run1"), model)
+        self.assertEqual(self.loaded, ["run1"])
+        self.assertIsNone(self.registry.get("run2"))
+
+    def test_least_recently_used_model_is_unloaded(self):
+        self.registry.load("run1")
+        self.registry.load("run2")
+        self.registry.get("run1")
+        self.registry.load("run3")
+        self.assertEqual(list(self.registry.models), ["run1", "run3"])
+        self.assertEqual(self.registry.get_stats()["evictions"], 1)
+
+    def test_memory_budget_unloads_models(self):
+        registry = ModelRegistry(self.load_model, max_bytes=150, max_models=3)
+        registry.load("run1")
+        registry.load("run2")
+        self.assertEqual(list(registry.models), ["run2"])
+
+    def test_pinned_models_survive_eviction(self):
+        self.registry.load("run1")
+        self.registry.pin(["run1", None])
+        self.registry.load("run2")
+        self.registry.load("run3")
+        self.assertEqual(list(self.registry.models), ["run1", "run3"])
+
+        # Épinglé avant son ajout, le nouveau modèle en production n'est jamais déchargé
+        self.registry.pin(["run1", "run4"])
+        self.registry.add(SimpleNamespace(run_id="run4", memory_bytes=100))
+        self.assertEqual(list(self.registry.models), ["run1", "run4"])
+        self.assertTrue(self.registry.get_stats()["models"]["run4"]["pinned"])
+
+    def test_budget_can_be_exceeded_by_pinned_models_only(self):
+        self.registry.pin(["run1", "run2", "run3"])
+        for run_id in ("run1", "run2", "run3"):
+            self.registry.load(run_id)
+        self.assertEqual(len(self.registry.models), 3)
+        # Désépinglés, les modèles les plus anciens sont déchargés
+        self.registry.pin(["run3"])
+        self.assertEqual(list(self.registry.models), ["run2", "run3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
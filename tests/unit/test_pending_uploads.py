@@ -0,0 +1,58 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "docker", "user_api"))
+from pending_uploads import PendingUploads
+
+
+class TestPendingUploads(unittest.TestCase):
+    def setUp(self):
+        self.temp_path = tempfile.mkdtemp()
+        self.uploads = PendingUploads(max_bytes=10, spill_path=self.temp_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_path)
+
+    def test_pop_returns_image_in_memory(self):
+        self.uploads.add("a.jpg", b"12345")
+        self.assertEqual(self.uploads.pop("a.jpg"), b"12345")
+        self.assertEqual(self.uploads.total_bytes, 0)
+        self.assertIsNone(self.uploads.pop("a.jpg"))
+
+    def test_evicted_image_is_written_to_spill_path(self):
+        self.assertFalse(self.uploads.add("a.jpg", b"12345"))
+        self.uploads.add("b.jpg", b"67890")
+        # "a.jpg" est remise en tête, "b.jpg" devient la plus ancienne
+        self.uploads.add("a.jpg", b"12345")
+        self.assertTrue(self.uploads.add("c.jpg", b"abcde"))
+        self.assertEqual(self.uploads.total_bytes, 10)
+
+        # Tant qu'elle n'est pas écrite, l'image retirée de la mémoire reste disponible
+        self.assertEqual(os.listdir(self.temp_path), [])
+        self.uploads.spill()
+        self.assertEqual(os.listdir(self.temp_path), ["b.jpg"])
+        with open(os.path.join(self.temp_path, "b.jpg"), "rb") as file:
+            self.assertEqual(file.read(), b"67890")
+        self.assertIsNone(self.uploads.pop("b.jpg"))
+
+    def test_image_waiting_to_be_spilled_can_be_popped(self):
+        self.uploads.add("a.jpg", b"12345")
+        self.uploads.add("b.jpg", b"678901")
+        self.assertEqual(self.uploads.pop("a.jpg"), b"12345")
+        self.uploads.spill()
+        self.assertEqual(os.listdir(self.temp_path), [])
+
+    def test_eviction_without_spill_path_forgets_image(self):
+        uploads = PendingUploads(max_bytes=10)
+        uploads.add("a.jpg", b"12345")
+        self.assertFalse(uploads.add("b.jpg", b"678901"))
+        self.assertIsNone(uploads.pop("a.jpg"))
+        self.assertEqual(os.listdir(self.temp_path), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,32 +1,49 @@
 import unittest
 import os
+import tempfile
 import pandas as pd
 from datetime import datetime
 from unittest.mock import patch
 from monitoring.performance_tracker import PerformanceTracker
+from monitoring.prediction_store import PredictionStore
 
 
 class TestPerformanceTracker(unittest.TestCase):
     @patch("monitoring.performance_tracker.DataManager")
     def setUp(self, mock_data_manager):
-        self.test_log_file = f'logs/performance_logs_{datetime.now().strftime("%Y%m%d")}.csv'
+        self.temp_dir = tempfile.TemporaryDirectory()
+        log_name = f'performance_logs_{datetime.now().strftime("%Y%m%d")}.csv'
+        self.test_log_file = os.path.join(self.temp_dir.name, log_name)
+        self.test_store_path = os.path.join(self.temp_dir.name, "predictions")
         mock_data_manager.return_value.get_class_names.return_value = [
             "class1",
             "class2",
         ]
-        self.tracker = PerformanceTracker()
+        self.tracker = PerformanceTracker(store=PredictionStore(self.test_store_path))
 
     def tearDown(self):
-        if os.path.exists(self.test_log_file):
-            os.remove(self.test_log_file)
+        # Les prédictions encore en mémoire sont écrites avant la suppression du dossier
+        self.tracker.store.flush()
+        self.temp_dir.cleanup()
 
     def test_log_prediction(self):
         self.tracker.log_prediction("class1", 0.9, "class1")
         self.tracker.log_prediction("class2", 0.8, "class2")
+        self.tracker.store.flush()
 
-        df = pd.read_csv(self.test_log_file)
+        df = self.tracker.store.query_day()
         self.assertEqual(len(df), 2)
         self.assertEqual(df["predicted_class"].tolist(), ["class1", "class2"])
+        self.assertEqual(df["confidence"].tolist(), [0.9, 0.8])
+
+    def test_get_performance_metrics_from_store(self):
+        for predicted_class, true_class in [("class1", "class1"), ("class1", "class2"), ("class2", "class2")]:
+            self.tracker.log_prediction(predicted_class, 0.9, true_class)
+        self.tracker.log_prediction("class2", 0.9)
+
+        overall_accuracy, class_accuracies = self.tracker.get_performance_metrics()
+        self.assertAlmostEqual(overall_accuracy, 2 / 3)
+        self.assertEqual(class_accuracies, {"class1": 1.0, "class2": 0.5})
 
     def test_get_performance_metrics(self):
         test_data = pd.DataFrame(
@@ -0,0 +1,70 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "docker", "inference"))
+from prediction_cache import PredictionCache
+
+
+class TestPredictionCache(unittest.TestCase):
+    def setUp(self):
+        self.disk_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.disk_path)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = PredictionCache(max_entries=2)
+        cache.put("a", "run1", {"class": "AIGLE"})
+        cache.put("b", "run1", {"class": "MOINEAU"})
+        # "a" est lue : "b" devient la plus ancienne
+        self.assertEqual(cache.get("a", "run1"), {"class": "AIGLE"})
+        cache.put("c", "run1", {"class": "PIC"})
+
+        self.assertIsNone(cache.get("b", "run1"))
+        self.assertEqual(cache.get("a", "run1"), {"class": "AIGLE"})
+        self.assertEqual(cache.get("c", "run1"), {"class": "PIC"})
+        stats = cache.get_stats()
+        self.assertEqual((stats["entries"], stats["evictions"]), (2, 1))
+
+    def test_memory_limit_evicts_entries(self):
+        cache = PredictionCache(max_entries=100, max_bytes=2 * PredictionCache.entry_size(("a", "run1"), 1))
+        for content_hash in "abcd":
+            cache.put(content_hash, "run1", 1)
+        stats = cache.get_stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertLessEqual(stats["memory_bytes"], cache.max_bytes)
+        self.assertIsNone(cache.get("a", "run1"))
+
+    def test_hit_and_miss_counters(self):
+        cache = PredictionCache()
+        cache.put("a", "run1", [0.9], compute_time=0.5)
+        cache.get("a", "run1")
+        cache.get("a", "run1")
+        # Même image mais autre modèle : la prédiction n'est pas reprise
+        cache.get("a", "run2")
+        stats = cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["disk_hits"]), (2, 1, 0))
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3)
+        self.assertAlmostEqual(stats["saved_seconds"], 1.0)
+
+    def test_disk_entries_survive_restart_and_clear(self):
+        cache = PredictionCache(disk_path=self.disk_path)
+        cache.put("a", "run1", {"class": "AIGLE"}, compute_time=0.2)
+
+        restarted = PredictionCache(disk_path=self.disk_path)
+        self.assertEqual(restarted.get("a", "run1"), {"class": "AIGLE"})
+        self.assertEqual(restarted.get("a", "run1"), {"class": "AIGLE"})
+        stats = restarted.get_stats()
+        self.assertEqual((stats["disk_hits"], stats["hits"], stats["misses"]), (1, 1, 0))
+
+        restarted.clear()
+        self.assertIsNone(restarted.get("a", "run1"))
+        self.assertEqual(os.listdir(self.disk_path), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from monitoring.prediction_store import PredictionStore
+
+
+class TestPredictionStore(unittest.TestCase):
+    def setUp(self):
+        self.test_store_path = tempfile.mkdtemp()
+        self.store = PredictionStore(self.test_store_path, row_group_size=3)
+        self.today = datetime.now().replace(microsecond=0)
+        self.yesterday = self.today - timedelta(days=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_store_path)
+
+    def test_flush_writes_one_partition_per_day(self):
+        self.store.append("class1", 0.9, date=self.yesterday)
+        self.store.append("class2", 0.8, date=self.today)
+        self.store.flush()
+
+        partitions = sorted(folder for folder in os.listdir(self.test_store_path) if folder.startswith("day="))
+        self.assertEqual(
+            partitions,
+            [f"day={self.yesterday.strftime('%Y-%m-%d')}", f"day={self.today.strftime('%Y-%m-%d')}"],
+        )
+        self.assertEqual(self.store.buffer, [])
+
+    def test_row_group_is_flushed_when_full(self):
+        for _ in range(3):
+            self.store.append("class1", 0.9, date=self.today)
+        self.assertEqual(self.store.buffer, [])
+        self.assertEqual(len(self.store.query()), 3)
+
+    def test_query_filters_columns_and_dates(self):
+        self.store.append("class1", 0.9, true_class="class1", date=self.yesterday)
+        self.store.append("class2", 0.8, true_class="class1", date=self.today)
+        self.store.flush()
+        # Une prédiction encore en mémoire est aussi renvoyée
+        self.store.append("class3", 0.7, date=self.today)
+
+        df = self.store.query_day(columns=["predicted_class", "confidence"])
+        self.assertEqual(list(df.columns), ["predicted_class", "confidence"])
+        self.assertEqual(df["predicted_class"].tolist(), ["class2", "class3"])
+
+        df = self.store.query(start=self.yesterday, end=self.today)
+        self.assertEqual(df["predicted_class"].tolist(), ["class1"])
+
+    def test_summarize_uses_running_counters(self):
+        self.store.append("class1", 0.9, true_class="class1", date=self.today)
+        self.store.append("class1", 0.7, true_class="class2", date=self.today)
+        self.store.append("class2", 0.5, date=self.yesterday)
+
+        summary = self.store.summarize()
+        self.assertEqual(summary["count"], 2)
+        self.assertAlmostEqual(summary["confidence_sum"], 1.6)
+        self.assertEqual((summary["labelled"], summary["correct"]), (2, 1))
+        self.assertEqual(summary["classes"]["class1"]["predicted"], 2)
+        self.assertEqual(summary["classes"]["class2"], {"predicted": 0, "confidence_sum": 0.0, "true": 1, "correct": 0})
+
+        summary = self.store.summarize(start=self.yesterday - timedelta(days=1))
+        self.assertEqual(summary["count"], 3)
+
+    def test_counters_survive_restart(self):
+        self.store.append("class1", 0.9, true_class="class1", date=self.today)
+        self.store.append("class2", 0.8, date=self.today)
+        self.store.flush()
+        expected = self.store.summarize()
+
+        # Les compteurs sauvegardés sont rechargés
+        self.assertEqual(PredictionStore(self.test_store_path).summarize(), expected)
+
+        # Sans sauvegarde, ils sont recalculés une fois à partir des fichiers Parquet
+        os.remove(os.path.join(self.test_store_path, "aggregates.json"))
+        self.assertEqual(PredictionStore(self.test_store_path).summarize(), expected)
+
+    def test_counters_of_several_writers_are_merged(self):
+        # Deux processus qui écrivent dans le même dossier
+        other_store = PredictionStore(self.test_store_path, row_group_size=3)
+        self.store.append("class1", 0.9, true_class="class1", date=self.today)
+        other_store.append("class2", 0.8, date=self.today)
+        other_store.append("class1", 0.6, date=self.today)
+        self.store.flush()
+        other_store.flush()
+        self.store.append("class2", 0.7, date=self.today)
+        self.store.flush()
+
+        summary = PredictionStore(self.test_store_path).summarize()
+        self.assertEqual(summary["count"], 4)
+        self.assertEqual(summary["classes"]["class1"]["predicted"], 2)
+        self.assertEqual(summary["classes"]["class2"]["predicted"], 2)
+        self.assertEqual((summary["labelled"], summary["correct"]), (1, 1))
+        # Le dernier à sauvegarder voit aussi les compteurs de l'autre
+        self.assertEqual(self.store.summarize(), summary)
+
+    def test_query_empty_store(self):
+        df = self.store.query(columns=["predicted_class"])
+        self.assertTrue(df.empty)
+        self.assertEqual(list(df.columns), ["predicted_class"])
+
+
+if __name__ == "__main__":
+    unittest.main()
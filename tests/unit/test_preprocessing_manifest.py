@@ -0,0 +1,60 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "docker", "preprocessing"))
+from PreprocessingManifest import PreprocessingManifest, dataset_signature
+
+
+class TestPreprocessingManifest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.dataset_path = os.path.join(self.folder, "dataset_raw")
+        self.manifest_path = os.path.join(self.folder, "manifest.json")
+        for class_name in ("AIGLE", "MOINEAU"):
+            class_path = os.path.join(self.dataset_path, "train", class_name)
+            os.makedirs(class_path)
+            for index in range(3):
+                open(os.path.join(class_path, f"{index}.jpg"), "w").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_signature_changes_with_images_and_excluded_classes(self):
+        signature = dataset_signature(self.dataset_path)
+        self.assertEqual(dataset_signature(self.dataset_path), signature)
+        self.assertNotEqual(dataset_signature(self.dataset_path, ["AIGLE"]), signature)
+        open(os.path.join(self.dataset_path, "train", "AIGLE", "3.jpg"), "w").close()
+        self.assertNotEqual(dataset_signature(self.dataset_path), signature)
+
+    def test_interrupted_run_is_resumed(self):
+        signature = dataset_signature(self.dataset_path)
+        manifest = PreprocessingManifest(self.manifest_path, signature)
+        self.assertFalse(manifest.resuming)
+        manifest.mark_done("copy")
+        self.assertEqual(manifest.get_param("seed", lambda: 42), 42)
+
+        # Après un arrêt, les étapes terminées et les paramètres sont retrouvés
+        resumed = PreprocessingManifest(self.manifest_path, signature)
+        self.assertTrue(resumed.resuming)
+        self.assertTrue(resumed.is_done("copy"))
+        self.assertFalse(resumed.is_done("size"))
+        self.assertEqual(resumed.get_param("seed", lambda: 7), 42)
+
+    def test_finished_or_different_run_starts_over(self):
+        signature = dataset_signature(self.dataset_path)
+        manifest = PreprocessingManifest(self.manifest_path, signature)
+        manifest.mark_done("copy")
+        self.assertFalse(PreprocessingManifest(self.manifest_path, "autre").resuming)
+
+        manifest.finish()
+        restarted = PreprocessingManifest(self.manifest_path, signature)
+        self.assertFalse(restarted.resuming)
+        self.assertEqual(restarted.get_param("seed", lambda: 7), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "docker", "preprocessing"))
+from RawManifest import RawManifest
+
+
+class TestRawManifest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.dataset_path = os.path.join(self.folder, "dataset_raw")
+        self.manifest_path = os.path.join(self.folder, "manifest.json")
+        for set_name, class_name, index in (("train", "AIGLE", 0), ("train", "AIGLE", 1), ("test", "AIGLE ", 2),
+                                            ("train", "MOINEAU", 3)):
+            self.save_image(set_name, class_name, f"{index}.jpg", (index * 50, 0, 0))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def save_image(self, set_name, class_name, file_name, color, size=(32, 24)):
+        class_path = os.path.join(self.dataset_path, set_name, class_name)
+        os.makedirs(class_path, exist_ok=True)
+        Image.new("RGB", size, color).save(os.path.join(class_path, file_name))
+
+    def test_scan_only_describes_new_or_changed_files(self):
+        manifest = RawManifest(self.dataset_path, self.manifest_path)
+        self.assertEqual(manifest.scan(), 4)
+        manifest.save()
+        self.assertEqual(manifest.files["train/AIGLE/0.jpg"]["width"], 32)
+
+        # Un nouveau manifeste reprend les hashes enregistrés
+        manifest = RawManifest(self.dataset_path, self.manifest_path)
+        self.assertEqual(manifest.scan(), 0)
+
+        # Image modifiée, ajoutée et supprimée
+        previous_hash = manifest.files["train/AIGLE/0.jpg"]["hash"]
+        self.save_image("train", "AIGLE", "0.jpg", (200, 200, 200), size=(64, 48))
+        self.save_image("train", "MOINEAU", "4.jpg", (0, 200, 0))
+        os.remove(os.path.join(self.dataset_path, "train", "AIGLE", "1.jpg"))
+        self.assertEqual(manifest.scan(), 2)
+        self.assertNotEqual(manifest.files["train/AIGLE/0.jpg"]["hash"], previous_hash)
+        self.assertNotIn("train/AIGLE/1.jpg", manifest.files)
+
+    def test_classes_merge_sets_and_skip_duplicates_and_unreadable_files(self):
+        # Doublon d'une image dans un autre set et fichier illisible
+        shutil.copy(os.path.join(self.dataset_path, "train", "AIGLE", "0.jpg"),
+                    os.path.join(self.dataset_path, "test", "AIGLE ", "5.jpg"))
+        with open(os.path.join(self.dataset_path, "train", "MOINEAU", "6.jpg"), "w") as file:
+            file.write("pas une image")
+        manifest = RawManifest(self.dataset_path, self.manifest_path)
+        manifest.scan()
+
+        classes = manifest.classes()
+        self.assertEqual(sorted(classes), ["AIGLE", "MOINEAU"])
+        self.assertEqual(len(classes["AIGLE"]), 3)
+        self.assertEqual(len(classes["MOINEAU"]), 1)
+        self.assertEqual(next(iter(classes["MOINEAU"].values())), ("train/MOINEAU/3.jpg", 32, 24))
+
+        # Une classe exclue n'est ignorée que dans train
+        classes = manifest.classes(excluded_classes=["AIGLE"])
+        self.assertEqual(
+            sorted(path for path, _, _ in classes["AIGLE"].values()), ["test/AIGLE /2.jpg", "test/AIGLE /5.jpg"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
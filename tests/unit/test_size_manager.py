@@ -0,0 +1,60 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "docker", "preprocessing"))
+from SizeManager import resize_image
+
+
+class TestResizeImage(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_image_at_target_size_is_copied_without_resize(self):
+        image_path = os.path.join(self.folder, "source.jpg")
+        destination = os.path.join(self.folder, "destination.jpg")
+        Image.new("RGB", (224, 224), (200, 30, 30)).save(image_path)
+
+        self.assertFalse(resize_image(image_path, (224, 224), destination))
+        with open(image_path, "rb") as source, open(destination, "rb") as copy:
+            self.assertEqual(source.read(), copy.read())
+        # Sans destination, l'image n'est pas réécrite
+        mtime = os.stat(image_path).st_mtime_ns
+        self.assertFalse(resize_image(image_path, [224, 224]))
+        self.assertEqual(os.stat(image_path).st_mtime_ns, mtime)
+
+    def test_large_jpeg_is_resized_to_target_size(self):
+        image_path = os.path.join(self.folder, "large.jpg")
+        # Assez grande pour être décodée en mode draft (1/8)
+        Image.new("RGB", (2000, 1600), (30, 120, 200)).save(image_path, quality=90)
+
+        self.assertTrue(resize_image(image_path, (224, 224)))
+        with Image.open(image_path) as image:
+            self.assertEqual(image.size, (224, 224))
+            self.assertEqual(image.format, "JPEG")
+            red, green, blue = image.getpixel((112, 112))
+        self.assertLess(abs(red - 30) + abs(green - 120) + abs(blue - 200), 15)
+
+    def test_non_rgb_image_is_converted_before_jpeg(self):
+        image_path = os.path.join(self.folder, "transparent.png")
+        destination = os.path.join(self.folder, "transparent.jpg")
+        Image.new("RGBA", (64, 48), (10, 200, 10, 128)).save(image_path)
+        palette_path = os.path.join(self.folder, "palette.png")
+        Image.new("RGB", (64, 48), (200, 10, 10)).convert("P").save(palette_path)
+
+        self.assertTrue(resize_image(image_path, (32, 32), destination, format="JPEG"))
+        self.assertTrue(resize_image(palette_path, (32, 32), palette_path + ".jpg", format="JPEG"))
+        for path in (destination, palette_path + ".jpg"):
+            with Image.open(path) as image:
+                self.assertEqual((image.format, image.mode, image.size), ("JPEG", "RGB", (32, 32)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+import os
+import json
+import shutil
+import logging
+import numpy as np
+from PIL import Image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif")
+SPLITS = ("train", "valid", "test")
+
+
+def list_split_images(split_path):
+    """
+    Liste les images d'un set (un sous-dossier par classe), dans le même ordre que flow_from_directory
+    Renvoie les chemins relatifs (classe/fichier), les index des classes et le dictionnaire {classe: index}
+    """
+    class_names = sorted(
+        folder for folder in os.listdir(split_path) if os.path.isdir(os.path.join(split_path, folder))
+    )
+    files, labels = [], []
+    for index, class_name in enumerate(class_names):
+        for file_name in sorted(os.listdir(os.path.join(split_path, class_name))):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                files.append(f"{class_name}/{file_name}")
+                labels.append(index)
+    return files, np.array(labels, dtype=np.int32), {name: index for index, name in enumerate(class_names)}
+
+
+def load_image(path, img_size):
+    """
+    Lit une image en RGB à la taille du modèle (interpolation au plus proche, comme load_img)
+    """
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        if img.size != (img_size[1], img_size[0]):
+            img = img.resize((img_size[1], img_size[0]), Image.NEAREST)
+        return np.asarray(img, dtype=np.uint8)
+
+
+def file_stamps(split_path, files):
+    """
+    Taille et date de modification de chaque fichier : une image dont ni la taille ni la date n'ont changé
+    n'est pas décodée à nouveau
+    """
+    stamps = []
+    for file in files:
+        stat = os.stat(os.path.join(split_path, file))
+        stamps.append([stat.st_size, stat.st_mtime_ns])
+    return stamps
+
+
+def load_index(output_path):
+    """
+    Index d'un set déjà écrit, None s'il n'existe pas
+    """
+    index_path = os.path.join(output_path, "index.json")
+    if not os.path.isfile(index_path):
+        return None
+    with open(index_path, "r") as file:
+        return json.load(file)
+
+
+def write_split(split_path, output_path, img_size, previous_path=None):
+    """
+    Décode toutes les images d'un set dans un tableau uint8 (N, H, W, 3) enregistré au format .npy,
+    avec les étiquettes et un index (fichiers, classes, taille des images, taille et date des fichiers).
+    Les images inchangées depuis l'écriture précédente (previous_path) sont recopiées sans être décodées.
+    """
+    files, labels, class_indices = list_split_images(split_path)
+    stamps = file_stamps(split_path, files)
+    previous = load_index(previous_path) if previous_path else None
+    reusable = dict()
+    if previous is not None and previous["img_size"] == list(img_size) and "stamps" in previous:
+        previous_images = np.load(os.path.join(previous_path, "images.npy"), mmap_mode="r")
+        reusable = {
+            file: (position, stamp) for position, (file, stamp) in enumerate(zip(previous["files"], previous["stamps"]))
+        }
+    os.makedirs(output_path, exist_ok=True)
+    images = np.lib.format.open_memmap(
+        os.path.join(output_path, "images.npy"), mode="w+", dtype=np.uint8, shape=(len(files), *img_size, 3)
+    )
+    decoded = 0
+    for position, (file, stamp) in enumerate(zip(files, stamps)):
+        previous_position, previous_stamp = reusable.get(file, (None, None))
+        if previous_stamp == stamp:
+            images[position] = previous_images[previous_position]
+        else:
+            images[position] = load_image(os.path.join(split_path, file), img_size)
+            decoded += 1
+    images.flush()
+    del images
+    np.save(os.path.join(output_path, "labels.npy"), labels)
+    index = {
+        "img_size": list(img_size), "samples": len(files), "class_indices": class_indices, "files": files,
+        "stamps": stamps,
+    }
+    with open(os.path.join(output_path, "index.json"), "w") as file:
+        json.dump(index, file)
+    logging.info(f"{split_path} : {decoded} image(s) décodée(s), {len(files) - decoded} reprise(s)")
+    return index
+
+
+def is_split_up_to_date(split_path, output_path, img_size):
+    """
+    Vérifie que les images décodées d'un set correspondent encore à ses fichiers (noms, tailles et dates)
+    """
+    index = load_index(output_path)
+    if index is None or index["img_size"] != list(img_size) or "stamps" not in index:
+        return False
+    files, _, class_indices = list_split_images(split_path)
+    return (
+        files == index["files"] and class_indices == index["class_indices"]
+        and file_stamps(split_path, files) == index["stamps"]
+    )
+
+
+def link_split(source_path, output_path):
+    """
+    Reprend les fichiers d'un set inchangé dans le nouveau dossier (lien, ou copie si le lien est impossible)
+    """
+    os.makedirs(output_path, exist_ok=True)
+    for file in os.listdir(source_path):
+        try:
+            os.link(os.path.join(source_path, file), os.path.join(output_path, file))
+        except OSError:
+            shutil.copy2(os.path.join(source_path, file), os.path.join(output_path, file))
+
+
+def write_shards(dataset_path, shards_path, img_size=(224, 224)):
+    """
+    Écrit les images décodées de chaque set (train, valid, test) de dataset_path dans shards_path.
+    Un set dont les fichiers n'ont pas changé est repris tel quel, et seules les images nouvelles
+    ou modifiées d'un set sont décodées.
+    Les fichiers sont écrits dans un dossier temporaire puis remplacent les anciens d'un seul coup.
+    """
+    img_size = tuple(img_size)
+    temp_path = shards_path + ".tmp"
+    shutil.rmtree(temp_path, ignore_errors=True)
+    counts = {}
+    unchanged = []
+    for split in SPLITS:
+        split_path = os.path.join(dataset_path, split)
+        if not os.path.isdir(split_path):
+            continue
+        previous_path = os.path.join(shards_path, split)
+        output_path = os.path.join(temp_path, split)
+        if is_split_up_to_date(split_path, previous_path, img_size):
+            link_split(previous_path, output_path)
+            counts[split] = load_index(output_path)["samples"]
+            unchanged.append(split)
+        else:
+            counts[split] = write_split(split_path, output_path, img_size, previous_path)["samples"]
+    shutil.rmtree(shards_path, ignore_errors=True)
+    os.replace(temp_path, shards_path)
+    logging.info(f"Images décodées enregistrées dans {shards_path} : {counts} (sets inchangés : {unchanged})")
+    return counts
+
+
+class ImageShards:
+    """
+    Lecture d'un set d'images décodées : le tableau est projeté en mémoire (memmap),
+    seules les images demandées sont lues sur le disque, sans décodage.
+    """
+
+    def __init__(self, shards_path, split):
+        self.path = os.path.join(shards_path, split)
+        with open(os.path.join(self.path, "index.json"), "r") as file:
+            index = json.load(file)
+        self.img_size = tuple(index["img_size"])
+        self.samples = index["samples"]
+        self.class_indices = index["class_indices"]
+        self.num_classes = len(self.class_indices)
+        self.files = index["files"]
+        self.stamps = index.get("stamps")
+        self.images = np.load(os.path.join(self.path, "images.npy"), mmap_mode="r")
+        self.classes = np.load(os.path.join(self.path, "labels.npy"))
+
+    @staticmethod
+    def exists(shards_path, split):
+        return os.path.isfile(os.path.join(shards_path, split, "index.json"))
+
+    def is_up_to_date(self, split_path, files, img_size):
+        """
+        Vérifie que les images décodées correspondent encore aux fichiers (classe/fichier) du set :
+        mêmes noms, et même taille et date de modification que lors de l'écriture
+        """
+        if tuple(img_size) != self.img_size or list(files) != self.files or self.stamps is None:
+            return False
+        return file_stamps(split_path, files) == self.stamps
+
+    def get_batch(self, indices):
+        """
+        Renvoie les images et étiquettes des index demandés. Un lot d'index consécutifs
+        est une simple vue du tableau projeté, sans copie.
+        """
+        indices = np.asarray(indices)
+        if len(indices) and np.array_equal(indices, np.arange(indices[0], indices[0] + len(indices))):
+            batch = slice(int(indices[0]), int(indices[0]) + len(indices))
+            return self.images[batch], self.classes[batch]
+        # Les index triés sont lus dans l'ordre du fichier
+        indices = np.sort(indices)
+        return self.images[indices], self.classes[indices]
+
+    def batches(self, batch_size, shuffle=False, seed=None):
+        """
+        Parcourt le set par lots, dans l'ordre ou mélangé
+        """
+        order = np.arange(self.samples)
+        if shuffle:
+            np.random.default_rng(seed).shuffle(order)
+        for start in range(0, self.samples, batch_size):
+            yield self.get_batch(order[start:start + batch_size])
+
+    def __len__(self):
+        return self.samples
@@ -9,17 +9,21 @@ import tensorflow as tf
 from tensorflow.keras.applications import EfficientNetB0
 from tensorflow.keras.layers import Dropout, GlobalAveragePooling2D, Dense
 from tensorflow.keras.callbacks import ReduceLROnPlateau, EarlyStopping, Callback
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras import Model
 from tensorflow.keras.optimizers import Adam
 from timeit import default_timer as timer
 from monitoring.alert_system import AlertSystem
 from app.utils.logger import setup_logger
+from training.data_loader import ImageDataset
 from datetime import datetime
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 logger = setup_logger("train_model", f"logs/train_model_{timestamp}.log")
+# Images décodées par le preprocessing, lues à la place des fichiers si elles sont à jour
+SHARDS_DIR = os.path.join(BASE_DIR, "data_shards")
+# Dossier du cache des images décodées (désactivé si vide)
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", "")
 
 
 class TimingCallback(Callback):
@@ -82,31 +86,16 @@ def _train_model_internal(data_version, experiment_id):
         early_stopping = EarlyStopping(patience=5, min_delta=0.01, verbose=1, mode="min", monitor="val_loss")
         time_callback = TimingCallback()
 
-        train_datagen = ImageDataGenerator(
-            rotation_range=30,
-            width_shift_range=0.2,
-            height_shift_range=0.2,
-            horizontal_flip=True,
-            vertical_flip=True,
-            zoom_range=0.2,
-            shear_range=0.2,
-            fill_mode="nearest",
+        cache_dir = DATASET_CACHE_DIR or None
+        train_generator = ImageDataset(
+            train_path, img_size=(224, 224), batch_size=batch_size, augment=True, shuffle=True,
+            cache_dir=cache_dir, shards_dir=SHARDS_DIR
         )
-
-        train_generator = train_datagen.flow_from_directory(
-            train_path,
-            target_size=(224, 224),
-            batch_size=batch_size
-        )
-        valid_generator = ImageDataGenerator().flow_from_directory(
-            valid_path,
-            target_size=(224, 224),
-            batch_size=batch_size
+        valid_generator = ImageDataset(
+            valid_path, img_size=(224, 224), batch_size=batch_size, cache_dir=cache_dir, shards_dir=SHARDS_DIR
         )
-        test_generator = ImageDataGenerator().flow_from_directory(
-            test_path,
-            target_size=(224, 224),
-            batch_size=batch_size
+        test_generator = ImageDataset(
+            test_path, img_size=(224, 224), batch_size=batch_size, cache_dir=cache_dir, shards_dir=SHARDS_DIR
         )
 
         num_classes = train_generator.num_classes
@@ -137,16 +126,14 @@ def _train_model_internal(data_version, experiment_id):
         )
 
         training_history = model.fit(
-            train_generator,
+            train_generator.dataset,
             epochs=1,
-            steps_per_epoch=train_generator.samples // train_generator.batch_size,
-            validation_data=valid_generator,
-            validation_steps=valid_generator.samples // valid_generator.batch_size,
+            validation_data=valid_generator.dataset,
             callbacks=[reduce_learning_rate, early_stopping, time_callback],
             verbose=1,
         )
 
-        test_loss, test_accuracy, test_mae = model.evaluate(test_generator)
+        test_loss, test_accuracy, test_mae = model.evaluate(test_generator.dataset)
 
         logger.info(f"Test accuracy: {test_accuracy}")
         logger.info(f"Final validation accuracy: {training_history.history['val_acc'][-1]}")